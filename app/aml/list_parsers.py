@@ -0,0 +1,291 @@
+# app/aml/list_parsers.py
+"""
+Parsers por lista de sanciones → modelo unificado (SanctionEntity).
+
+  - SDN / CONS: CSV de OFAC (sdn.csv / cons_prim.csv + alt + add)
+  - UN:         consolidated list XML del Consejo de Seguridad
+  - EU:         Financial Sanctions Files (CSV ';')
+
+Todas leen vía `stream_source`, así que aceptan URLs, rutas locales,
+.gz o miembros de un zip, y parsean mientras leen.
+"""
+import csv
+import io
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from app.core.config import settings
+from app.infra.feeds.stream_source import abrir_fuente, leer_csv
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SanctionEntity:
+    lista: str                     # "SDN" | "CONS" | "UN" | "EU"
+    ref: int                       # id de la entidad dentro de su lista
+    nombre: str
+    aliases: List[str] = field(default_factory=list)
+    es_individuo: bool = False
+    paises: List[str] = field(default_factory=list)     # ISO2 o nombre
+    ciudades: List[str] = field(default_factory=list)
+
+
+# ==========================================================
+#  OFAC (SDN / consolidated non-SDN) — mismo layout CSV
+# ==========================================================
+
+def _col(row: list[str], i: int) -> str | None:
+    return row[i].strip() if len(row) > i and row[i] is not None else None
+
+
+def _ent_num(row: list[str]) -> int | None:
+    # Saltar header u otras filas no válidas
+    try:
+        return int(row[0])
+    except (ValueError, IndexError):
+        # Ej: "ent_num" (header) u otra cosa no numérica
+        return None
+
+
+def parse_sdn(rows: Iterable[list[str]]) -> dict[int, dict]:
+    """
+    SDN.CSV (esquema típico):
+      0 ENT_NUM, 1 SDN_NAME, 2 SDN_TYPE, 3 PROGRAM, 4 TITLE, ..., 11 REMARKS
+    """
+    entidades: dict[int, dict] = {}
+    for row in rows:
+        ent_num = _ent_num(row) if row else None
+        if ent_num is None:
+            continue
+
+        sdn_type = _col(row, 2)
+        entidades[ent_num] = {
+            "sdn_name": _col(row, 1),
+            "sdn_type": sdn_type,
+            "program": _col(row, 3),
+            "title": _col(row, 4),
+            "remarks": _col(row, 11),
+            "is_individual": (sdn_type or "").lower() == "individual",
+        }
+    return entidades
+
+
+def parse_add(rows: Iterable[list[str]]) -> dict[int, list[dict]]:
+    """
+    ADD.CSV típico:
+      0 ENT_NUM, 1 ADDRESS, 2 CITY, 3 STATE/PROVINCE, 4 ZIP, 5 COUNTRY
+    """
+    direcciones: dict[int, list[dict]] = {}
+    for row in rows:
+        ent_num = _ent_num(row) if row else None
+        if ent_num is None:
+            continue
+
+        direcciones.setdefault(ent_num, []).append({
+            "address1": _col(row, 1),
+            "city": _col(row, 2),
+            "state": _col(row, 3),
+            "postal_code": _col(row, 4),
+            "country": _col(row, 5),
+        })
+    return direcciones
+
+
+def parse_alt(rows: Iterable[list[str]]) -> dict[int, list[dict]]:
+    """
+    ALT.CSV típico:
+      0 ENT_NUM, 1 ALT_TYPE, 2 ALT_NAME, 3 ALT_REMARKS
+    """
+    aliases: dict[int, list[dict]] = {}
+    for row in rows:
+        ent_num = _ent_num(row) if row else None
+        if ent_num is None:
+            continue
+
+        aliases.setdefault(ent_num, []).append({
+            "alt_type": _col(row, 1),
+            "alt_name": _col(row, 2),
+            "remarks": _col(row, 3),
+        })
+    return aliases
+
+
+def parse_ofac_csv(lista: str, prim: str, alt: str | None, add: str | None) -> Iterator[SanctionEntity]:
+    """Lista OFAC en formato CSV (p. ej. consolidated non-SDN: cons_*.csv)."""
+    entidades = parse_sdn(leer_csv(prim))
+    aliases = parse_alt(leer_csv(alt)) if alt else {}
+    direcciones = parse_add(leer_csv(add)) if add else {}
+
+    for ent_num, ent in entidades.items():
+        if not ent["sdn_name"]:
+            continue
+        dirs = direcciones.get(ent_num, [])
+        yield SanctionEntity(
+            lista=lista,
+            ref=ent_num,
+            nombre=ent["sdn_name"],
+            aliases=[a["alt_name"] for a in aliases.get(ent_num, []) if a["alt_name"]],
+            es_individuo=ent["is_individual"],
+            paises=[d["country"] for d in dirs if d["country"]],
+            ciudades=[d["city"] for d in dirs if d["city"]],
+        )
+
+
+# ==========================================================
+#  UN (consolidated list XML)
+# ==========================================================
+
+def _texto(elem: ET.Element, tag: str) -> str | None:
+    val = elem.findtext(tag)
+    return val.strip() if val and val.strip() else None
+
+
+def parse_un_xml(fuente: str, lista: str = "UN") -> Iterator[SanctionEntity]:
+    """
+    <CONSOLIDATED_LIST><INDIVIDUALS><INDIVIDUAL>... / <ENTITIES><ENTITY>...
+    Se usa iterparse y se liberan los nodos procesados (memoria acotada).
+    """
+    with abrir_fuente(fuente) as raw:
+        for _, elem in ET.iterparse(raw, events=("end",)):
+            if elem.tag not in ("INDIVIDUAL", "ENTITY"):
+                continue
+
+            try:
+                ref = int(_texto(elem, "DATAID") or "")
+            except ValueError:
+                elem.clear()
+                continue
+
+            es_individuo = elem.tag == "INDIVIDUAL"
+            partes = [
+                _texto(elem, t)
+                for t in ("FIRST_NAME", "SECOND_NAME", "THIRD_NAME", "FOURTH_NAME")
+            ]
+            nombre = " ".join(p for p in partes if p)
+
+            alias_tag = "INDIVIDUAL_ALIAS" if es_individuo else "ENTITY_ALIAS"
+            aliases = [
+                a for a in (_texto(x, "ALIAS_NAME") for x in elem.iter(alias_tag)) if a
+            ]
+
+            addr_tag = "INDIVIDUAL_ADDRESS" if es_individuo else "ENTITY_ADDRESS"
+            paises, ciudades = [], []
+            for d in elem.iter(addr_tag):
+                if _texto(d, "COUNTRY"):
+                    paises.append(_texto(d, "COUNTRY"))
+                if _texto(d, "CITY"):
+                    ciudades.append(_texto(d, "CITY"))
+            for nac in elem.iter("NATIONALITY"):
+                paises += [v.text.strip() for v in nac.iter("VALUE") if v.text and v.text.strip()]
+
+            if nombre:
+                yield SanctionEntity(
+                    lista=lista,
+                    ref=ref,
+                    nombre=nombre,
+                    aliases=aliases,
+                    es_individuo=es_individuo,
+                    paises=paises,
+                    ciudades=ciudades,
+                )
+            elem.clear()
+
+
+# ==========================================================
+#  EU (Financial Sanctions Files, CSV con ';')
+# ==========================================================
+
+def parse_eu_csv(fuente: str, lista: str = "EU") -> Iterator[SanctionEntity]:
+    """
+    Una fila por (entidad × nombre × dirección × ...). Las filas de una
+    misma entidad vienen contiguas, así que se agrupa por Entity_LogicalId
+    sin cargar el archivo completo.
+    """
+    actual: SanctionEntity | None = None
+
+    with abrir_fuente(fuente) as raw:
+        texto = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        for row in csv.DictReader(texto, delimiter=";"):
+            try:
+                ref = int(row.get("Entity_LogicalId") or "")
+            except ValueError:
+                continue
+
+            if actual is None or actual.ref != ref:
+                if actual is not None and actual.nombre:
+                    yield actual
+                tipo = (row.get("Entity_SubjectType_ClassificationCode")
+                        or row.get("Entity_SubjectType") or "")
+                actual = SanctionEntity(
+                    lista=lista, ref=ref, nombre="", es_individuo=tipo.lower() == "person"
+                )
+
+            nombre = (row.get("NameAlias_WholeName") or "").strip()
+            if nombre:
+                if not actual.nombre:
+                    actual.nombre = nombre
+                elif nombre not in actual.aliases and nombre != actual.nombre:
+                    actual.aliases.append(nombre)
+
+            for col in ("Address_CountryIso2Code", "Citizenship_CountryIso2Code"):
+                pais = (row.get(col) or "").strip()
+                if pais and pais not in actual.paises:
+                    actual.paises.append(pais)
+            ciudad = (row.get("Address_City") or "").strip()
+            if ciudad and ciudad not in actual.ciudades:
+                actual.ciudades.append(ciudad)
+
+    if actual is not None and actual.nombre:
+        yield actual
+
+
+# ==========================================================
+#  LISTAS CONFIGURADAS (además de SDN, que vive en la BD)
+# ==========================================================
+
+def listas_configuradas() -> Dict[str, Callable[[], Iterator[SanctionEntity]]]:
+    """Listas adicionales con fuente configurada → generador de entidades."""
+    listas: Dict[str, Callable[[], Iterator[SanctionEntity]]] = {}
+    if settings.SANCTIONS_CONS_PRIM_SOURCE:
+        listas["CONS"] = lambda: parse_ofac_csv(
+            "CONS",
+            settings.SANCTIONS_CONS_PRIM_SOURCE,
+            settings.SANCTIONS_CONS_ALT_SOURCE,
+            settings.SANCTIONS_CONS_ADD_SOURCE,
+        )
+    if settings.SANCTIONS_UN_SOURCE:
+        listas["UN"] = lambda: parse_un_xml(settings.SANCTIONS_UN_SOURCE)
+    if settings.SANCTIONS_EU_SOURCE:
+        listas["EU"] = lambda: parse_eu_csv(settings.SANCTIONS_EU_SOURCE)
+    return listas
+
+
+def fuentes_adicionales() -> List[str]:
+    """Fuentes configuradas de las listas adicionales, en orden fijo."""
+    return [
+        fuente
+        for fuente in (
+            settings.SANCTIONS_CONS_PRIM_SOURCE,
+            settings.SANCTIONS_CONS_ALT_SOURCE,
+            settings.SANCTIONS_CONS_ADD_SOURCE,
+            settings.SANCTIONS_UN_SOURCE,
+            settings.SANCTIONS_EU_SOURCE,
+        )
+        if fuente
+    ]
+
+
+def cargar_listas_adicionales(solo_individuos: bool = True) -> List[SanctionEntity]:
+    entidades: List[SanctionEntity] = []
+    for lista, cargar in listas_configuradas().items():
+        n = 0
+        for ent in cargar():
+            if solo_individuos and not ent.es_individuo:
+                continue
+            entidades.append(ent)
+            n += 1
+        logger.info(f"Lista {lista}: {n} entidades cargadas")
+    return entidades
@@ -0,0 +1,28 @@
+# app/aml/ofac_changes.py
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class OfacChangeSet:
+    """
+    Conjunto de cambios producido por una sincronización OFAC.
+    Lo consumen los caches de screening y los procesos de re-screening
+    para invalidar / re-evaluar únicamente las entidades afectadas.
+    """
+    source_hash: str
+    inserted: List[int] = field(default_factory=list)
+    updated: List[int] = field(default_factory=list)
+    deleted: List[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+    @property
+    def vacio(self) -> bool:
+        return self.total == 0
+
+    def afectados(self) -> set[int]:
+        """ent_num cuyo screening previo pudo haber cambiado."""
+        return set(self.inserted) | set(self.updated) | set(self.deleted)
@@ -0,0 +1,626 @@
+# app/aml/ofac_index.py
+"""
+Índice en memoria para screening de sanciones (OFAC SDN + listas adicionales).
+
+Los nombres (entidad + aliases de individuos) se normalizan y se indexan por
+trigramas: para cada consulta sólo se compara con SequenceMatcher contra los
+candidatos que comparten suficientes trigramas, en lugar de barrer la tabla.
+
+Todas las listas comparten un único índice; cada nombre lleva la lista de
+origen, de modo que el costo por consulta depende de los candidatos y no
+de cuántas listas haya cargadas.
+"""
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.aml.list_parsers import SanctionEntity, cargar_listas_adicionales
+from app.core.config import settings
+from app.infra.db.models.country import Country
+from app.infra.db.models.ofac_address import OfacAddress
+from app.infra.db.models.ofac_alias import OfacAlias
+from app.infra.db.models.ofac_change_log import OfacChangeLog
+from app.infra.db.models.ofac_entity import OfacEntity
+
+logger = logging.getLogger(__name__)
+
+FULL_MATCH_SCORE = 0.95
+PARTIAL_MATCH_SCORE = 0.80
+
+# Filtro de candidatos: coeficiente Dice mínimo de trigramas y máximo a puntuar
+MIN_TRIGRAM_DICE = 0.25
+MAX_CANDIDATOS = 50
+
+# Contexto geográfico (ofac_address): boost de score y umbral Dice a partir
+# del cual un candidato nunca se descarta por país (nombre casi idéntico).
+PAIS_BOOST = 0.05
+CIUDAD_BOOST = 0.03
+DICE_SIN_FILTRO_PAIS = 0.9
+
+# Lista de la BD (ofac_entity). Sus claves de entidad son el ent_num tal cual.
+LISTA_SDN = "SDN"
+
+_RANGO_MATCH = {"none": 0, "partial": 1, "full": 2}
+
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar_nombre(nombre: str | None) -> str:
+    """Minúsculas, sin acentos ni puntuación, espacios colapsados."""
+    if not nombre:
+        return ""
+    sin_acentos = (
+        unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    )
+    return _NO_ALNUM.sub(" ", sin_acentos.lower()).strip()
+
+
+def trigramas(norm: str) -> set[str]:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def clave_entidad(lista_id: int, ref: int) -> int:
+    """Clave única (lista, ref) en un entero; para SDN (id 0) es el ent_num."""
+    return (lista_id << 32) | (ref & 0xFFFFFFFF)
+
+
+def umbrales_lista(lista: str | None) -> Tuple[float, float]:
+    full, partial = settings.SANCTIONS_THRESHOLDS.get(
+        lista or LISTA_SDN, (FULL_MATCH_SCORE, PARTIAL_MATCH_SCORE)
+    )
+    return full, partial
+
+
+def clasificar_match(score: float, lista: str | None = None) -> str:
+    full, partial = umbrales_lista(lista)
+    if score >= full:
+        return "full"
+    if score >= partial:
+        return "partial"
+    return "none"
+
+
+class IndiceBase(ABC):
+    """
+    Lógica de screening común. Las subclases exponen los datos del índice
+    (nombres, trigramas, entidades, listas, direcciones) a través de
+    accesores, ya sea desde estructuras en memoria o desde un snapshot
+    mapeado (mmap). Las direcciones se consultan por `clave_entidad`.
+    """
+
+    @abstractmethod
+    def _postings(self, tri: str) -> Sequence[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _ntri(self, i: int) -> int:
+        raise NotImplementedError
+
+    def _vivo(self, i: int) -> bool:
+        return True
+
+    @abstractmethod
+    def _nombre(self, i: int) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _norm_de(self, i: int) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _ent_num(self, i: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _lista(self, i: int) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _clave(self, i: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _paises_de(self, clave: int) -> frozenset[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _ciudades_de(self, clave: int) -> frozenset[str]:
+        raise NotImplementedError
+
+    def _pais_compatible(self, clave: int, pais: str) -> bool:
+        """Sin direcciones conocidas → compatible (no se puede descartar)."""
+        paises = self._paises_de(clave)
+        return not paises or pais in paises
+
+    def candidatos(self, norm: str, pais: str | None = None) -> List[int]:
+        """
+        Ids cuyo Dice de trigramas con `norm` supera el umbral (top N).
+        Con `pais`, se descartan entidades cuyas direcciones conocidas son
+        todas de otros países, salvo nombres casi idénticos.
+        """
+        tris = trigramas(norm)
+        hits: Dict[int, int] = defaultdict(int)
+        for t in tris:
+            for i in self._postings(t):
+                hits[i] += 1
+
+        n = len(tris)
+        elegidos = [
+            (2.0 * h / (n + self._ntri(i)), i)
+            for i, h in hits.items()
+            if self._vivo(i)
+        ]
+        elegidos = [c for c in elegidos if c[0] >= MIN_TRIGRAM_DICE]
+        if pais:
+            elegidos = [
+                c for c in elegidos
+                if c[0] >= DICE_SIN_FILTRO_PAIS
+                or self._pais_compatible(self._clave(c[1]), pais)
+            ]
+        elegidos.sort(reverse=True)
+        return [i for _, i in elegidos[:MAX_CANDIDATOS]]
+
+    def screen(
+        self,
+        full_name: str,
+        pais: str | None = None,
+        ciudad: str | None = None,
+    ) -> Dict[str, Any]:
+        """
+        `pais` (ISO2) / `ciudad` del cliente o de la transacción, si se
+        conocen: filtran candidatos y suman un pequeño boost al coincidir.
+
+        Cada candidato se clasifica con los umbrales de su lista; gana el de
+        mejor clasificación y, a igual clasificación, el de mayor score.
+        """
+        norm = normalizar_nombre(full_name)
+        pais = (pais or "").strip().upper() or None
+        ciudad = normalizar_nombre(ciudad) or None
+        filtro = pais if settings.OFAC_COUNTRY_PREFILTER else None
+
+        best = (0, 0.0)
+        best_tipo = "none"
+        best_i = None
+        best_geo = False
+
+        for i in self.candidatos(norm, filtro) if norm else ():
+            score = SequenceMatcher(None, norm, self._norm_de(i)).ratio()
+            clave = self._clave(i)
+            geo = False
+            if pais and pais in self._paises_de(clave):
+                score += PAIS_BOOST
+                geo = True
+            if ciudad and ciudad in self._ciudades_de(clave):
+                score += CIUDAD_BOOST
+                geo = True
+            score = min(score, 1.0)
+            tipo = clasificar_match(score, self._lista(i))
+            if (_RANGO_MATCH[tipo], score) > best:
+                best = (_RANGO_MATCH[tipo], score)
+                best_tipo = tipo
+                best_i = i
+                best_geo = geo
+
+        return {
+            "match_type": best_tipo,
+            "best_score": best[1],
+            "best_name": self._nombre(best_i) if best_i is not None else None,
+            "ent_num": self._ent_num(best_i) if best_i is not None else None,
+            "list": self._lista(best_i) if best_i is not None else None,
+            "geo_match": best_geo,
+        }
+
+
+class OfacIndex(IndiceBase):
+    """
+    Nombres indexados por trigramas. Cada nombre tiene un id interno;
+    las entidades eliminadas/modificadas se marcan como borradas (None)
+    y se compacta el índice cuando la basura supera un umbral.
+
+    Cada nombre guarda su lista de origen (id en `codigos`) y el id de la
+    entidad dentro de esa lista (ent_num para SDN). Opcionalmente guarda,
+    por `clave_entidad`, los países (ISO2) y ciudades de sus direcciones
+    para filtrar candidatos y ajustar el score.
+    """
+
+    def __init__(self) -> None:
+        self.nombres: List[str | None] = []
+        self.norm: List[str] = []
+        self.ntri: List[int] = []
+        self.ent_nums: List[int] = []
+        self.listas: List[int] = []
+        self.codigos: List[str] = [LISTA_SDN]
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.paises: Dict[int, frozenset[str]] = {}
+        self.ciudades: Dict[int, frozenset[str]] = {}
+        self._por_ent: Dict[int, List[int]] = defaultdict(list)
+        self._borrados = 0
+
+    @classmethod
+    def desde_filas(cls, filas: Iterable[Tuple[int, str]]) -> "OfacIndex":
+        idx = cls()
+        idx.agregar(filas)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.nombres) - self._borrados
+
+    def lista_id(self, lista: str) -> int:
+        if lista not in self.codigos:
+            self.codigos.append(lista)
+        return self.codigos.index(lista)
+
+    # Accesores para IndiceBase
+    def _postings(self, tri: str) -> Sequence[int]:
+        return self.postings.get(tri, ())
+
+    def _ntri(self, i: int) -> int:
+        return self.ntri[i]
+
+    def _vivo(self, i: int) -> bool:
+        return self.nombres[i] is not None
+
+    def _nombre(self, i: int) -> str:
+        return self.nombres[i]
+
+    def _norm_de(self, i: int) -> str:
+        return self.norm[i]
+
+    def _ent_num(self, i: int) -> int:
+        return self.ent_nums[i]
+
+    def _lista(self, i: int) -> str:
+        return self.codigos[self.listas[i]]
+
+    def _clave(self, i: int) -> int:
+        return clave_entidad(self.listas[i], self.ent_nums[i])
+
+    def _paises_de(self, clave: int) -> frozenset[str]:
+        return self.paises.get(clave, frozenset())
+
+    def _ciudades_de(self, clave: int) -> frozenset[str]:
+        return self.ciudades.get(clave, frozenset())
+
+    # Mutación
+    def agregar(self, filas: Iterable[Tuple[int, str]], lista: str = LISTA_SDN) -> None:
+        lid = self.lista_id(lista)
+        for ent_num, nombre in filas:
+            norm = normalizar_nombre(nombre)
+            if not norm:
+                continue
+            i = len(self.nombres)
+            tris = trigramas(norm)
+            self.nombres.append(nombre)
+            self.norm.append(norm)
+            self.ntri.append(len(tris))
+            self.ent_nums.append(ent_num)
+            self.listas.append(lid)
+            self._por_ent[clave_entidad(lid, ent_num)].append(i)
+            for t in tris:
+                self.postings[t].append(i)
+
+    def agregar_direcciones(
+        self,
+        filas: Iterable[Tuple[int, str | None, str | None]],
+        lista: str = LISTA_SDN,
+    ) -> None:
+        """Filas (ent_num, pais_iso2, ciudad); reemplaza las del ent_num."""
+        lid = self.lista_id(lista)
+        paises: Dict[int, set[str]] = defaultdict(set)
+        ciudades: Dict[int, set[str]] = defaultdict(set)
+        for ent_num, pais, ciudad in filas:
+            clave = clave_entidad(lid, ent_num)
+            ps = paises[clave]
+            if pais:
+                ps.add(pais.upper())
+            ciudad = normalizar_nombre(ciudad)
+            if ciudad:
+                ciudades[clave].add(ciudad)
+        for clave, ps in paises.items():
+            self.paises[clave] = frozenset(ps)
+            self.ciudades[clave] = frozenset(ciudades.get(clave, ()))
+
+    def agregar_entidades(
+        self,
+        entidades: Iterable[SanctionEntity],
+        paises: Dict[str, str],
+    ) -> None:
+        """Entidades de listas adicionales (UN, EU, CONS...) ya parseadas."""
+        por_lista: Dict[str, Tuple[list, list]] = defaultdict(lambda: ([], []))
+        for ent in entidades:
+            nombres, dirs = por_lista[ent.lista]
+            nombres.append((ent.ref, ent.nombre))
+            nombres.extend((ent.ref, a) for a in ent.aliases)
+            dirs.extend((ent.ref, iso2_de(p, paises), None) for p in ent.paises)
+            dirs.extend((ent.ref, None, c) for c in ent.ciudades)
+        for lista, (nombres, dirs) in por_lista.items():
+            self.agregar(nombres, lista)
+            self.agregar_direcciones(dirs, lista)
+
+    def eliminar(self, ent_nums: Iterable[int], lista: str = LISTA_SDN) -> None:
+        lid = self.lista_id(lista)
+        for ent_num in ent_nums:
+            clave = clave_entidad(lid, ent_num)
+            self.paises.pop(clave, None)
+            self.ciudades.pop(clave, None)
+            for i in self._por_ent.pop(clave, []):
+                if self.nombres[i] is not None:
+                    self.nombres[i] = None
+                    self._borrados += 1
+
+        if self.nombres and self._borrados > len(self.nombres) // 4:
+            self.compactar()
+
+    def eliminar_lista(self, lista: str) -> None:
+        """Borra todas las entidades de una lista (para recargarla)."""
+        lid = self.lista_id(lista)
+        vivos = {
+            e for e, n, l in zip(self.ent_nums, self.nombres, self.listas)
+            if l == lid and n is not None
+        }
+        self.eliminar(vivos, lista)
+
+    def compactar(self) -> None:
+        """Reconstruye sin entradas borradas (ids consecutivos)."""
+        codigos = self.codigos
+        vivos: Dict[int, list] = defaultdict(list)
+        for e, n, l in zip(self.ent_nums, self.nombres, self.listas):
+            if n is not None:
+                vivos[l].append((e, n))
+        paises, ciudades = self.paises, self.ciudades
+        self.__init__()
+        for l, codigo in enumerate(codigos):
+            self.lista_id(codigo)
+            self.agregar(vivos.get(l, ()), codigo)
+        self.paises, self.ciudades = paises, ciudades
+
+
+# ==========================================================
+#  ÍNDICE COMPARTIDO DEL PROCESO
+# ==========================================================
+
+_INDICE_CACHE: Dict[str, Any] = {
+    "indice": None,
+    "change_log_id": 0,
+    "lists_hash": None,
+    "verificado": None,
+    "refresh_seconds": 60,
+}
+_lock = asyncio.Lock()
+
+
+def stmts_individuos(ent_nums: List[int] | None = None):
+    """SELECT (ent_num, nombre) de individuos SDN y de sus aliases."""
+    stmt_ent = select(OfacEntity.ent_num, OfacEntity.sdn_name).where(
+        OfacEntity.is_individual == True
+    )
+    stmt_alt = (
+        select(OfacAlias.ent_num, OfacAlias.alt_name)
+        .join(OfacEntity, OfacAlias.ent_num == OfacEntity.ent_num)
+        .where(OfacEntity.is_individual == True)
+    )
+    if ent_nums is not None:
+        stmt_ent = stmt_ent.where(OfacEntity.ent_num.in_(ent_nums))
+        stmt_alt = stmt_alt.where(OfacEntity.ent_num.in_(ent_nums))
+    return stmt_ent, stmt_alt
+
+
+def stmt_direcciones(ent_nums: List[int] | None = None):
+    stmt = (
+        select(OfacAddress.ent_num, OfacAddress.country, OfacAddress.city)
+        .join(OfacEntity, OfacAddress.ent_num == OfacEntity.ent_num)
+        .where(OfacEntity.is_individual == True)
+    )
+    if ent_nums is not None:
+        stmt = stmt.where(OfacEntity.ent_num.in_(ent_nums))
+    return stmt
+
+
+def stmt_paises():
+    return select(Country.iso2, Country.name)
+
+
+def mapa_paises(rows) -> Dict[str, str]:
+    """Nombre de país normalizado → ISO2 (ofac_address guarda el nombre)."""
+    return {normalizar_nombre(name): iso2.upper() for iso2, name in rows}
+
+
+def iso2_de(country: str | None, paises: Dict[str, str]) -> str | None:
+    norm = normalizar_nombre(country)
+    return paises.get(norm) or (norm.upper() if len(norm) == 2 else None)
+
+
+def filas_direcciones(rows, paises: Dict[str, str]):
+    return [(ent_num, iso2_de(country, paises), city) for ent_num, country, city in rows]
+
+
+async def _filas_individuos(db: AsyncSession, ent_nums: List[int] | None = None):
+    filas = []
+    for stmt in stmts_individuos(ent_nums):
+        filas += [(r[0], r[1]) for r in (await db.execute(stmt)).all()]
+    return filas
+
+
+async def _direcciones(db: AsyncSession, ent_nums: List[int] | None = None):
+    paises = mapa_paises((await db.execute(stmt_paises())).all())
+    return filas_direcciones((await db.execute(stmt_direcciones(ent_nums))).all(), paises)
+
+
+async def _ultimo_change_log(db: AsyncSession) -> Tuple[int, str | None]:
+    """(id, lists_hash) del último sync registrado."""
+    fila = (
+        await db.execute(
+            select(OfacChangeLog.id, OfacChangeLog.lists_hash)
+            .order_by(OfacChangeLog.id.desc())
+            .limit(1)
+        )
+    ).first()
+    return (fila.id, fila.lists_hash) if fila else (0, None)
+
+
+async def _aplicar_change_log(
+    db: AsyncSession, indice: OfacIndex, desde_id: int
+) -> Tuple[int, str | None]:
+    """
+    Re-indexa sólo las entidades SDN afectadas por syncs posteriores a
+    `desde_id`. Devuelve el último id y su lists_hash (None si no hubo syncs).
+    """
+    logs = (
+        await db.execute(
+            select(OfacChangeLog)
+            .where(OfacChangeLog.id > desde_id)
+            .order_by(OfacChangeLog.id)
+        )
+    ).scalars().all()
+    if not logs:
+        return desde_id, None
+
+    afectados: set[int] = set()
+    for log in logs:
+        afectados.update(log.inserted or [])
+        afectados.update(log.updated or [])
+        afectados.update(log.deleted or [])
+
+    if afectados:
+        indice.eliminar(afectados)
+        indice.agregar(await _filas_individuos(db, sorted(afectados)))
+        indice.agregar_direcciones(await _direcciones(db, sorted(afectados)))
+        logger.info(f"Índice OFAC: {len(afectados)} entidades re-indexadas")
+    return logs[-1].id, logs[-1].lists_hash
+
+
+async def _leer_listas_adicionales(
+    db: AsyncSession,
+) -> Tuple[List[SanctionEntity], Dict[str, str]]:
+    """Descarga y parsea UN / EU / CONS (fuera del event loop)."""
+    adicionales = await asyncio.to_thread(cargar_listas_adicionales)
+    paises = mapa_paises((await db.execute(stmt_paises())).all()) if adicionales else {}
+    return adicionales, paises
+
+
+def _reemplazar_listas_adicionales(
+    indice: OfacIndex, adicionales: List[SanctionEntity], paises: Dict[str, str]
+) -> None:
+    for lista in list(indice.codigos):
+        if lista != LISTA_SDN:
+            indice.eliminar_lista(lista)
+    if adicionales:
+        indice.agregar_entidades(adicionales, paises)
+
+
+async def _recargar_listas_adicionales(db: AsyncSession, previo: str | None) -> None:
+    """
+    UN / EU / CONS cambiaron (otro lists_hash en ofac_change_log): se
+    leen sin tener el lock y sólo el reemplazo en el índice lo toma. Si
+    la lectura falla se conservan las listas anteriores y se reintenta
+    en el próximo refresco.
+    """
+    cache = _INDICE_CACHE
+    try:
+        adicionales, paises = await _leer_listas_adicionales(db)
+    except Exception:
+        logger.exception(
+            "No se pudieron recargar las listas adicionales; se conservan las anteriores"
+        )
+        cache["lists_hash"] = previo
+        return
+    async with _lock:
+        _reemplazar_listas_adicionales(cache["indice"], adicionales, paises)
+    logger.info(f"Índice OFAC: listas adicionales recargadas ({len(adicionales)} entidades)")
+
+
+_SNAPSHOT_CACHE: Dict[str, Any] = {
+    "indice": None,
+    "ruta": None,
+    "verificado": 0.0,
+}
+
+
+def indice_snapshot() -> IndiceBase | None:
+    """
+    Índice mapeado desde el snapshot publicado por el job (si hay
+    OFAC_SNAPSHOT_DIR). Revisa el puntero cada pocos segundos y cambia de
+    versión sin reiniciar el worker.
+    """
+    from app.aml.ofac_snapshot import OfacSnapshot, ruta_snapshot_actual
+
+    cache = _SNAPSHOT_CACHE
+    ahora = time.monotonic()
+    if (
+        cache["indice"] is not None
+        and ahora - cache["verificado"] < settings.OFAC_SNAPSHOT_CHECK_SECONDS
+    ):
+        return cache["indice"]
+    cache["verificado"] = ahora
+
+    ruta = ruta_snapshot_actual(settings.OFAC_SNAPSHOT_DIR)
+    if ruta and ruta != cache["ruta"]:
+        try:
+            cache["indice"] = OfacSnapshot(ruta)
+            cache["ruta"] = ruta
+            logger.info(f"Snapshot OFAC mapeado: {ruta} ({len(cache['indice'])} nombres)")
+        except (OSError, ValueError) as e:
+            logger.error(f"No se pudo mapear el snapshot OFAC {ruta}: {e}")
+    return cache["indice"]
+
+
+async def obtener_indice(db: AsyncSession) -> IndiceBase:
+    """
+    Devuelve el índice del proceso. Con OFAC_SNAPSHOT_DIR se usa el
+    snapshot compartido; si no hay, se construye una vez desde la BD y
+    luego se actualiza incrementalmente desde ofac_change_log.
+    """
+    if settings.OFAC_SNAPSHOT_DIR:
+        snapshot = indice_snapshot()
+        if snapshot is not None:
+            return snapshot
+
+    ahora = datetime.now()
+    cache = _INDICE_CACHE
+    if (
+        cache["indice"] is not None
+        and cache["verificado"] is not None
+        and (ahora - cache["verificado"]).total_seconds() < cache["refresh_seconds"]
+    ):
+        return cache["indice"]
+
+    recargar_listas = False
+    async with _lock:
+        if cache["indice"] is None:
+            ultimo, lists_hash = await _ultimo_change_log(db)
+            indice = OfacIndex.desde_filas(await _filas_individuos(db))
+            indice.agregar_direcciones(await _direcciones(db))
+            _reemplazar_listas_adicionales(indice, *await _leer_listas_adicionales(db))
+            cache["indice"] = indice
+            cache["change_log_id"] = ultimo
+            cache["lists_hash"] = lists_hash
+            logger.info(f"Índice OFAC construido: {len(cache['indice'])} nombres")
+        elif (
+            cache["verificado"] is None
+            or (ahora - cache["verificado"]).total_seconds() >= cache["refresh_seconds"]
+        ):
+            previo = cache["lists_hash"]
+            cache["change_log_id"], lists_hash = await _aplicar_change_log(
+                db, cache["indice"], cache["change_log_id"]
+            )
+            # Sólo si cambió el hash de UN / EU / CONS (no en cada sync SDN).
+            # Se marca ya: una sola recarga en curso por proceso
+            if lists_hash is not None and lists_hash != previo:
+                cache["lists_hash"] = lists_hash
+                recargar_listas = True
+        cache["verificado"] = ahora
+
+    if recargar_listas:
+        await _recargar_listas_adicionales(db, previo)
+    return cache["indice"]
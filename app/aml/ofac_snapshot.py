@@ -0,0 +1,286 @@
+# app/aml/ofac_snapshot.py
+"""
+Snapshot binario versionado del índice de sanciones (SDN + listas adicionales).
+
+El job de sync serializa el índice (nombres normalizados, postings de
+trigramas, entidades, lista de origen y direcciones) en un archivo; cada worker lo mapea en
+memoria de sólo lectura (mmap), así N workers comparten una única copia
+física vía page cache y el arranque no depende del tamaño de la lista.
+
+Layout (little-endian, secciones alineadas a 8 bytes):
+  header:  MAGIC | u32 n_secciones | u64 version | (u64 offset, u64 len) * n
+  secciones: ver SECCIONES
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from app.aml.list_parsers import cargar_listas_adicionales
+from app.aml.ofac_index import (
+    IndiceBase,
+    OfacIndex,
+    clave_entidad,
+    filas_direcciones,
+    mapa_paises,
+    stmt_direcciones,
+    stmt_paises,
+    stmts_individuos,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"OFACIDX2"
+PUNTERO = "ofac_index.current"
+
+SECCIONES = (
+    "codigos",       # ascii      códigos de lista: "SDN,UN,EU"
+    "ent_nums",      # i32[n]     id de entidad (en su lista) por nombre
+    "listas",        # u8[n]      índice en codigos por nombre
+    "ntri",          # u16[n]     cantidad de trigramas por nombre
+    "nombre_off",    # u32[n+1]   offsets en nombres
+    "nombres",       # utf-8      nombres originales
+    "norm_off",      # u32[n+1]   offsets en norm
+    "norm",          # ascii      nombres normalizados
+    "tri_keys",      # u32[k]     trigramas codificados, ordenados
+    "tri_off",       # u32[k+1]   offsets en postings
+    "postings",      # u32[...]   ids de nombre
+    "geo_ents",      # i64[g]     clave_entidad con direcciones, ordenadas
+    "geo_off",       # u32[g+1]   offsets en geo
+    "geo",           # utf-8      "VE,CO|caracas;bogota"
+)
+
+_HEADER = struct.Struct("<8sIQ")
+_SECCION = struct.Struct("<QQ")
+
+
+def _tri_key(tri: str) -> int:
+    # normalizar_nombre deja sólo [0-9a-z ] → 3 bytes ASCII caben en un u32
+    return (ord(tri[0]) << 16) | (ord(tri[1]) << 8) | ord(tri[2])
+
+
+def _offsets(blobs: List[bytes]) -> Tuple[array, bytes]:
+    offs = array("I", [0])
+    for b in blobs:
+        offs.append(offs[-1] + len(b))
+    return offs, b"".join(blobs)
+
+
+# ==========================================================
+#  ESCRITURA (job de sync)
+# ==========================================================
+
+def serializar(indice: OfacIndex, version: int) -> bytes:
+    if sys.byteorder != "little":
+        raise RuntimeError("El snapshot OFAC asume arquitectura little-endian")
+
+    indice.compactar()
+    n = len(indice.nombres)
+
+    nombre_off, nombres = _offsets([x.encode("utf-8") for x in indice.nombres])
+    norm_off, norm = _offsets([x.encode("ascii") for x in indice.norm])
+
+    claves = sorted(indice.postings, key=_tri_key)
+    tri_keys = array("I", (_tri_key(t) for t in claves))
+    tri_off = array("I", [0])
+    postings = array("I")
+    for t in claves:
+        postings.extend(indice.postings[t])
+        tri_off.append(len(postings))
+
+    if len(indice.codigos) > 0xFF:
+        raise ValueError("El snapshot admite a lo sumo 255 listas")
+    geo_ents = array("q", sorted(indice.paises))
+    geo_off, geo = _offsets([
+        (
+            ",".join(sorted(indice.paises[e]))
+            + "|"
+            + ";".join(sorted(indice.ciudades.get(e, ())))
+        ).encode("utf-8")
+        for e in geo_ents
+    ])
+
+    datos: Dict[str, bytes] = {
+        "codigos": ",".join(indice.codigos).encode("ascii"),
+        "ent_nums": array("i", indice.ent_nums).tobytes(),
+        "listas": array("B", indice.listas).tobytes(),
+        "ntri": array("H", (min(x, 0xFFFF) for x in indice.ntri)).tobytes(),
+        "nombre_off": nombre_off.tobytes(),
+        "nombres": nombres,
+        "norm_off": norm_off.tobytes(),
+        "norm": norm,
+        "tri_keys": tri_keys.tobytes(),
+        "tri_off": tri_off.tobytes(),
+        "postings": postings.tobytes(),
+        "geo_ents": geo_ents.tobytes(),
+        "geo_off": geo_off.tobytes(),
+        "geo": geo,
+    }
+    assert len(datos["ent_nums"]) == 4 * n
+
+    cabecera = _HEADER.size + _SECCION.size * len(SECCIONES)
+    tabla = []
+    pos = cabecera
+    for nombre in SECCIONES:
+        pos += -pos % 8
+        tabla.append((pos, len(datos[nombre])))
+        pos += len(datos[nombre])
+
+    buf = bytearray(pos)
+    _HEADER.pack_into(buf, 0, MAGIC, len(SECCIONES), version)
+    for k, (off, ln) in enumerate(tabla):
+        _SECCION.pack_into(buf, _HEADER.size + k * _SECCION.size, off, ln)
+        buf[off:off + ln] = datos[SECCIONES[k]]
+    return bytes(buf)
+
+
+def escribir_snapshot(indice: OfacIndex, directorio: str, version: int, conservar: int = 3) -> str:
+    """
+    Escribe `ofac_index.<version>.<ts>.bin` de forma atómica y mueve el
+    puntero `ofac_index.current`. Los workers que aún mapean versiones
+    anteriores no se ven afectados (el archivo borrado sigue mapeado).
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"ofac_index.{version:012d}.{int(time.time())}.bin"
+    ruta = os.path.join(directorio, nombre)
+
+    tmp = ruta + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(serializar(indice, version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+    tmp_ptr = os.path.join(directorio, PUNTERO + ".tmp")
+    with open(tmp_ptr, "w") as f:
+        f.write(nombre)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_ptr, os.path.join(directorio, PUNTERO))
+
+    # Limpieza de versiones viejas
+    viejos = sorted(
+        x for x in os.listdir(directorio)
+        if x.startswith("ofac_index.") and x.endswith(".bin") and x != nombre
+    )
+    for x in viejos[:max(0, len(viejos) - (conservar - 1))]:
+        os.remove(os.path.join(directorio, x))
+
+    logger.info(f"Snapshot OFAC escrito: {ruta} ({len(indice)} nombres)")
+    return ruta
+
+
+def construir_indice_sync(conn) -> OfacIndex:
+    """
+    Construye el índice completo desde una conexión síncrona (job):
+    SDN desde la BD + listas adicionales configuradas (archivos).
+    """
+    filas = []
+    for stmt in stmts_individuos():
+        filas += [(r[0], r[1]) for r in conn.execute(stmt).all()]
+    indice = OfacIndex.desde_filas(filas)
+
+    paises = mapa_paises(conn.execute(stmt_paises()).all())
+    indice.agregar_direcciones(
+        filas_direcciones(conn.execute(stmt_direcciones()).all(), paises)
+    )
+    indice.agregar_entidades(cargar_listas_adicionales(), paises)
+    return indice
+
+
+# ==========================================================
+#  LECTURA (workers)
+# ==========================================================
+
+class OfacSnapshot(IndiceBase):
+    """Índice de sólo lectura sobre un archivo mapeado en memoria."""
+
+    def __init__(self, ruta: str) -> None:
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mv = memoryview(self._mm)
+
+        magic, n_secc, self.version = _HEADER.unpack_from(mv, 0)
+        if magic != MAGIC or n_secc != len(SECCIONES):
+            raise ValueError(f"Snapshot OFAC inválido: {ruta}")
+
+        s: Dict[str, memoryview] = {}
+        for k, nombre in enumerate(SECCIONES):
+            off, ln = _SECCION.unpack_from(mv, _HEADER.size + k * _SECCION.size)
+            s[nombre] = mv[off:off + ln]
+
+        self._codigos = bytes(s["codigos"]).decode("ascii").split(",")
+        self._ent_nums: Sequence[int] = s["ent_nums"].cast("i")
+        self._listas: Sequence[int] = s["listas"].cast("B")
+        self._ntris: Sequence[int] = s["ntri"].cast("H")
+        self._nombre_off: Sequence[int] = s["nombre_off"].cast("I")
+        self._nombres = s["nombres"]
+        self._norm_off: Sequence[int] = s["norm_off"].cast("I")
+        self._norm = s["norm"]
+        self._tri_keys: Sequence[int] = s["tri_keys"].cast("I")
+        self._tri_off: Sequence[int] = s["tri_off"].cast("I")
+        self._post: Sequence[int] = s["postings"].cast("I")
+        self._geo_ents: Sequence[int] = s["geo_ents"].cast("q")
+        self._geo_off: Sequence[int] = s["geo_off"].cast("I")
+        self._geo = s["geo"]
+
+    def __len__(self) -> int:
+        return len(self._ent_nums)
+
+    def _postings(self, tri: str) -> Sequence[int]:
+        key = _tri_key(tri)
+        k = bisect_left(self._tri_keys, key)
+        if k == len(self._tri_keys) or self._tri_keys[k] != key:
+            return ()
+        return self._post[self._tri_off[k]:self._tri_off[k + 1]]
+
+    def _ntri(self, i: int) -> int:
+        return self._ntris[i]
+
+    def _nombre(self, i: int) -> str:
+        return bytes(self._nombres[self._nombre_off[i]:self._nombre_off[i + 1]]).decode("utf-8")
+
+    def _norm_de(self, i: int) -> str:
+        return bytes(self._norm[self._norm_off[i]:self._norm_off[i + 1]]).decode("ascii")
+
+    def _ent_num(self, i: int) -> int:
+        return self._ent_nums[i]
+
+    def _lista(self, i: int) -> str:
+        return self._codigos[self._listas[i]]
+
+    def _clave(self, i: int) -> int:
+        return clave_entidad(self._listas[i], self._ent_nums[i])
+
+    def _geo_de(self, clave: int) -> Tuple[frozenset, frozenset]:
+        k = bisect_left(self._geo_ents, clave)
+        if k == len(self._geo_ents) or self._geo_ents[k] != clave:
+            return frozenset(), frozenset()
+        raw = bytes(self._geo[self._geo_off[k]:self._geo_off[k + 1]]).decode("utf-8")
+        paises, ciudades = raw.split("|", 1)
+        return (
+            frozenset(p for p in paises.split(",") if p),
+            frozenset(c for c in ciudades.split(";") if c),
+        )
+
+    def _paises_de(self, clave: int) -> frozenset[str]:
+        return self._geo_de(clave)[0]
+
+    def _ciudades_de(self, clave: int) -> frozenset[str]:
+        return self._geo_de(clave)[1]
+
+
+def ruta_snapshot_actual(directorio: str) -> str | None:
+    """Lee el puntero `ofac_index.current`; None si aún no hay snapshot."""
+    try:
+        with open(os.path.join(directorio, PUNTERO)) as f:
+            nombre = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(directorio, nombre) if nombre else None
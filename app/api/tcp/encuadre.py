@@ -0,0 +1,27 @@
+# app/api/tcp/encuadre.py
+"""
+Tramas ISO 8583 sobre TCP: largo del mensaje en 2 o 4 bytes (big endian)
+seguido del mensaje. Lo usan el listener y el simulador.
+"""
+import asyncio
+from typing import Optional
+
+from app.infra.detectors.iso_parser import MensajeIsoInvalido
+
+
+def enmarcar(mensaje: bytes, prefijo: int) -> bytes:
+    return len(mensaje).to_bytes(prefijo, "big") + mensaje
+
+
+async def leer_trama(reader: asyncio.StreamReader, prefijo: int, maximo: int) -> Optional[bytes]:
+    """Siguiente trama sin el prefijo; None si el otro extremo cerró limpio."""
+    try:
+        cabecera = await reader.readexactly(prefijo)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    largo = int.from_bytes(cabecera, "big")
+    if largo > maximo:
+        raise MensajeIsoInvalido(f"trama de {largo} bytes (máximo {maximo})")
+    return await reader.readexactly(largo)
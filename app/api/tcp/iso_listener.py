@@ -0,0 +1,253 @@
+# app/api/tcp/iso_listener.py
+"""
+Listener TCP de ISO 8583 crudo para las redes de tarjetas.
+
+Conexiones largas con tramas prefijadas por su largo (2 o 4 bytes, big
+endian; ISO_TCP_LENGTH_PREFIX_BYTES). Cada trama se parsea con
+iso_parser, se valida con ISO8583Rapido y se analiza en su propio task:
+una conexión tiene hasta ISO_TCP_MAX_INFLIGHT mensajes en vuelo y las
+respuestas salen en el orden en que terminan (el cliente las empareja
+por STAN, DE11).
+
+Backpressure: al llegar al máximo en vuelo la conexión deja de leer, el
+buffer del socket se llena y TCP frena al emisor. Del lado de escritura,
+drain() espera si el cliente no consume las respuestas.
+
+Respuesta: MTI + 10 (0100 → 0110), los DE del requerimiento que la red
+espera de vuelta, DE39 (00 aprobada, 59 sospecha de fraude, 30 error de
+formato, 96 error del sistema) y DE44 con nivel|probabilidad. Los 08xx
+(gestión de red: eco, sign-on) se contestan sin analizar; un MTI que no
+es requerimiento (función impar: 0110, 0190...) recibe 30 sin analizarse.
+
+Arranca con la app (ISO_TCP_ENABLED). Con varios workers (run_server
+prod) cada uno abre el puerto con SO_REUSEPORT y el kernel reparte las
+conexiones.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Set
+
+from app.api.tcp.encuadre import enmarcar, leer_trama
+from app.core.config import settings
+from app.domain.services.analizador_fraude import procesar_transaccion_iso
+from app.domain.services.idempotencia_service import idempotencia
+from app.infra.db.session import AsyncSessionLocal
+from app.infra.detectors.iso_parser import MensajeIsoInvalido, codificar, parsear
+from app.schemas.iso_rapido import ISO8583Rapido, MensajeInvalido
+
+logger = logging.getLogger(__name__)
+
+APROBADA = "00"
+ERROR_FORMATO = "30"
+SOSPECHA_FRAUDE = "59"
+ERROR_SISTEMA = "96"
+
+# DE del requerimiento que se devuelven en la respuesta
+_DE_ECO = (
+    "i_0002_pan",
+    "i_0003_processing_code",
+    "i_0004_amount_transaction",
+    "i_0007_transmission_datetime",
+    "i_0011_stan",
+    "i_0012_time_local",
+    "i_0013_date_local",
+    "i_0037_retrieval_reference_number",
+    "i_0041_card_acceptor_tid",
+    "i_0042_card_acceptor_mid",
+    "i_0049_currency_code_tx",
+    "i_0070_network_management_info_code",
+)
+
+
+# ==========================================================
+#  RESPUESTA
+# ==========================================================
+
+def es_requerimiento(mti: str) -> bool:
+    """Función (tercer dígito) par: requerimiento, advice, notificación o instrucción."""
+    return len(mti) == 4 and mti.isdigit() and mti[2] in "0246"
+
+
+def mti_respuesta(mti: str) -> str:
+    # Un MTI que no es requerimiento se devuelve tal cual (error de formato)
+    funcion = int(mti[2])
+    return f"{mti[:2]}{funcion | 1}{mti[3]}"
+
+
+def respuesta(campos: Dict[str, str], codigo: str, resultado: Dict[str, Any] | None = None) -> bytes:
+    resp: Dict[str, Any] = {c: campos.get(c) for c in _DE_ECO}
+    resp["mti"] = mti_respuesta(campos["mti"])
+    resp["i_0039_response_code"] = codigo
+    if resultado is not None:
+        risk = resultado["risk"]
+        resp["i_0044_additional_response_data"] = (
+            f"{risk['risk_level']}|{float(risk['fraud_prob']):.4f}"[:25]
+        )
+    return codificar(resp, settings.ISO_TCP_BITMAP_BINARY)
+
+
+# ==========================================================
+#  CONEXIÓN
+# ==========================================================
+
+class ConexionIso:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self._en_vuelo = asyncio.Semaphore(settings.ISO_TCP_MAX_INFLIGHT)
+        self._escritura = asyncio.Lock()
+        self._tareas: Set[asyncio.Task] = set()
+        self._cerrando = False
+
+    async def atender(self) -> None:
+        prefijo = settings.ISO_TCP_LENGTH_PREFIX_BYTES
+        try:
+            while not self._cerrando:
+                # Sin cupo no se lee la siguiente trama (backpressure TCP)
+                await self._en_vuelo.acquire()
+                if self._cerrando:
+                    self._en_vuelo.release()
+                    break
+                try:
+                    trama = await leer_trama(self.reader, prefijo, settings.ISO_TCP_MAX_FRAME_BYTES)
+                except (asyncio.IncompleteReadError, ConnectionError, MensajeIsoInvalido) as e:
+                    logger.warning(f"ISO TCP {self.peer}: conexión cortada ({e})")
+                    trama = None
+                if trama is None:
+                    self._en_vuelo.release()
+                    break
+                tarea = asyncio.create_task(self._procesar(trama))
+                self._tareas.add(tarea)
+                tarea.add_done_callback(self._tareas.discard)
+        finally:
+            # Lo que ya estaba en vuelo se contesta antes de cerrar
+            if self._tareas:
+                await asyncio.wait(self._tareas, timeout=settings.ISO_TCP_DRAIN_SECONDS)
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def dejar_de_leer(self) -> None:
+        """
+        Shutdown: el transporte deja de entregar datos (si el cliente sigue
+        enviando, nada llega al reader después del EOF) y la lectura en
+        curso termina como si el cliente hubiera cerrado. Lo que ya está en
+        vuelo se contesta.
+        """
+        self._cerrando = True
+        transporte = self.writer.transport
+        if not transporte.is_closing():
+            transporte.pause_reading()
+        self.reader.feed_eof()
+
+    async def _procesar(self, trama: bytes) -> None:
+        try:
+            try:
+                campos = parsear(trama, settings.ISO_TCP_BITMAP_BINARY)
+            except MensajeIsoInvalido as e:
+                # Sin parseo no hay STAN con qué emparejar una respuesta
+                logger.warning(f"ISO TCP {self.peer}: trama descartada ({e})")
+                return
+            if not campos["mti"].isdigit():
+                logger.warning(f"ISO TCP {self.peer}: MTI inválido {campos['mti']!r}")
+                return
+            try:
+                mensaje = await self._responder(campos)
+            except Exception:
+                logger.exception(f"ISO TCP {self.peer}: error respondiendo STAN {campos.get('i_0011_stan')}")
+                mensaje = respuesta(campos, ERROR_SISTEMA)
+            await self._enviar(mensaje)
+        except ConnectionError as e:
+            logger.warning(f"ISO TCP {self.peer}: respuesta no enviada ({e})")
+        except Exception:
+            # Nunca dejar el task con una excepción sin recuperar
+            logger.exception(f"ISO TCP {self.peer}: respuesta no enviada")
+        finally:
+            self._en_vuelo.release()
+
+    async def _responder(self, campos: Dict[str, str]) -> bytes:
+        if not es_requerimiento(campos["mti"]):
+            logger.warning(f"ISO TCP {self.peer}: MTI {campos['mti']} no es un requerimiento")
+            return respuesta(campos, ERROR_FORMATO)
+
+        if campos["mti"][1:2] == "8":
+            return respuesta(campos, APROBADA)
+
+        try:
+            tx = ISO8583Rapido.desde_campos(campos)
+        except MensajeInvalido as e:
+            logger.warning(f"ISO TCP {self.peer}: STAN {campos.get('i_0011_stan')} inválido ({e})")
+            return respuesta(campos, ERROR_FORMATO)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                resultado = await idempotencia.procesar(db, tx, procesar_transaccion_iso)
+        except Exception:
+            logger.exception(f"ISO TCP {self.peer}: error analizando STAN {tx.i_0011_stan}")
+            return respuesta(campos, ERROR_SISTEMA)
+
+        codigo = SOSPECHA_FRAUDE if resultado["risk"]["is_fraud"] else APROBADA
+        return respuesta(campos, codigo, resultado)
+
+    async def _enviar(self, mensaje: bytes) -> None:
+        async with self._escritura:
+            self.writer.write(enmarcar(mensaje, settings.ISO_TCP_LENGTH_PREFIX_BYTES))
+            await self.writer.drain()
+
+
+# ==========================================================
+#  SERVIDOR
+# ==========================================================
+
+class ListenerIso:
+    def __init__(self) -> None:
+        self._server: asyncio.AbstractServer | None = None
+        self._conexiones: Set[ConexionIso] = set()
+        self._tareas: Set[asyncio.Task] = set()
+
+    @property
+    def conexiones(self) -> int:
+        return len(self._conexiones)
+
+    async def start(self) -> None:
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(
+            self._atender,
+            settings.ISO_TCP_HOST,
+            settings.ISO_TCP_PORT,
+            reuse_port=True,
+        )
+        logger.info(f"Listener ISO 8583 en {settings.ISO_TCP_HOST}:{settings.ISO_TCP_PORT}")
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conexion = ConexionIso(reader, writer)
+        self._conexiones.add(conexion)
+        self._tareas.add(asyncio.current_task())
+        try:
+            await conexion.atender()
+        finally:
+            self._conexiones.discard(conexion)
+            self._tareas.discard(asyncio.current_task())
+
+    async def stop(self) -> None:
+        """Deja de aceptar, corta la lectura y espera los mensajes en vuelo."""
+        if self._server is None:
+            return
+        self._server.close()
+        for conexion in list(self._conexiones):
+            conexion.dejar_de_leer()
+        if self._tareas:
+            await asyncio.wait(self._tareas, timeout=settings.ISO_TCP_DRAIN_SECONDS)
+        await self._server.wait_closed()
+        self._server = None
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+iso_listener = ListenerIso()
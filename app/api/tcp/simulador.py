@@ -0,0 +1,181 @@
+# app/api/tcp/simulador.py
+"""
+Cliente ISO 8583 sobre TCP para probar el listener en local.
+
+ClienteIso mantiene una conexión, envía mensajes sin esperar la respuesta
+del anterior y empareja las respuestas por STAN (pueden volver en otro
+orden). run() dispara N mensajes 0100 con hasta `concurrencia` en vuelo y
+reporta throughput, latencias, códigos de respuesta y cuántas respuestas
+llegaron después de la de un mensaje enviado más tarde.
+
+    python -m app.api.tcp.simulador [--n 10000] [--concurrencia 64] [--conexiones 1]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.api.tcp.encuadre import enmarcar, leer_trama
+from app.core.config import settings
+from app.infra.detectors.iso_parser import codificar, parsear
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class ClienteIso:
+    def __init__(self, prefijo: int, bitmap_binario: bool):
+        self.prefijo = prefijo
+        self.bitmap_binario = bitmap_binario
+        self._pendientes: Dict[str, asyncio.Future] = {}
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lector: asyncio.Task | None = None
+        self.recibidas: List[str] = []  # STAN en orden de llegada
+
+    async def conectar(self, host: str, port: int) -> None:
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._lector = asyncio.create_task(self._leer())
+
+    async def _leer(self) -> None:
+        try:
+            while True:
+                trama = await leer_trama(self._reader, self.prefijo, 65536)
+                if trama is None:
+                    break
+                campos = parsear(trama, self.bitmap_binario)
+                stan = campos.get("i_0011_stan")
+                self.recibidas.append(stan)
+                futuro = self._pendientes.pop(stan, None)
+                if futuro is not None and not futuro.done():
+                    futuro.set_result(campos)
+        finally:
+            for futuro in self._pendientes.values():
+                if not futuro.done():
+                    futuro.set_exception(ConnectionError("conexión cerrada por el listener"))
+
+    async def enviar(self, campos: Dict[str, Any]) -> Dict[str, str]:
+        """Envía un mensaje y espera su respuesta (por STAN)."""
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes[campos["i_0011_stan"]] = futuro
+        self._writer.write(enmarcar(codificar(campos, self.bitmap_binario), self.prefijo))
+        await self._writer.drain()
+        return await futuro
+
+    async def cerrar(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        if self._lector is not None:
+            await self._lector
+
+
+def mensaje_0100(secuencia: int, tid: str = "SIM00001") -> Dict[str, str]:
+    ahora = datetime.now()
+    monto = 1000 + (secuencia * 7919) % 500000
+    return {
+        "mti": "0100",
+        "i_0002_pan": f"4{secuencia % 10**15:015d}",
+        "i_0003_processing_code": "000000",
+        "i_0004_amount_transaction": f"{monto:012d}",
+        "i_0007_transmission_datetime": ahora.strftime("%m%d%H%M%S"),
+        "i_0011_stan": f"{secuencia % 10**6:06d}",
+        "i_0012_time_local": ahora.strftime("%H%M%S"),
+        "i_0013_date_local": ahora.strftime("%m%d"),
+        "i_0041_card_acceptor_tid": tid,
+        "i_0042_card_acceptor_mid": "SIMMERCHANT0001",
+        "i_0043_card_acceptor_name_loc": f"{'COMERCIO SIMULADO':<25}{'SANTO DOMINGO':<13}DO",
+        "i_0049_currency_code_tx": "214" if secuencia % 4 else "840",
+    }
+
+
+async def _conexion(
+    host: str, port: int, n: int, concurrencia: int, inicio: int, tid: str,
+    latencias: List[float], codigos: Counter,
+) -> int:
+    """Una conexión; devuelve cuántas respuestas llegaron fuera de orden."""
+    cliente = ClienteIso(settings.ISO_TCP_LENGTH_PREFIX_BYTES, settings.ISO_TCP_BITMAP_BINARY)
+    await cliente.conectar(host, port)
+    cupo = asyncio.Semaphore(concurrencia)
+    enviadas: List[str] = []
+
+    async def una(i: int) -> None:
+        async with cupo:
+            campos = mensaje_0100(inicio + i, tid)
+            enviadas.append(campos["i_0011_stan"])
+            t0 = time.perf_counter()
+            resp = await cliente.enviar(campos)
+            latencias.append(time.perf_counter() - t0)
+            codigos[resp.get("i_0039_response_code")] += 1
+
+    try:
+        await asyncio.gather(*(una(i) for i in range(n)))
+    finally:
+        await cliente.cerrar()
+    # Fuera de orden: respuestas adelantadas por la de un mensaje enviado después
+    orden = {stan: i for i, stan in enumerate(enviadas)}
+    fuera_de_orden = 0
+    ultimo = -1
+    for stan in cliente.recibidas:
+        i = orden.get(stan, -1)
+        if i < ultimo:
+            fuera_de_orden += 1
+        ultimo = max(ultimo, i)
+    return fuera_de_orden
+
+
+async def run(
+    host: str = "127.0.0.1",
+    port: int = settings.ISO_TCP_PORT,
+    n: int = 10000,
+    concurrencia: int = 64,
+    conexiones: int = 1,
+) -> Dict[str, Any]:
+    latencias: List[float] = []
+    codigos: Counter = Counter()
+    por_conexion = n // conexiones
+    # STAN únicos por conexión y TID distinto por conexión: ningún mensaje
+    # cae en la idempotencia como retransmisión
+    base = int(time.time()) % 1000 * 1000
+
+    inicio = time.perf_counter()
+    fuera_de_orden = await asyncio.gather(*(
+        _conexion(host, port, por_conexion, concurrencia, base + c * por_conexion,
+                  f"SIM{c:05d}", latencias, codigos)
+        for c in range(conexiones)
+    ))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    resumen = {
+        "mensajes": len(latencias),
+        "msg_por_segundo": round(len(latencias) / total, 1),
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 2) if latencias else None,
+        "p99_ms": round(latencias[int(len(latencias) * 0.99)] * 1000, 2) if latencias else None,
+        "codigos": dict(codigos),
+        "fuera_de_orden": sum(fuera_de_orden),
+    }
+    logger.info(f"Simulador ISO TCP: {resumen}")
+    return resumen
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulador de red ISO 8583 sobre TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.ISO_TCP_PORT)
+    parser.add_argument("--n", type=int, default=10000, help="Mensajes en total")
+    parser.add_argument("--concurrencia", type=int, default=64, help="En vuelo por conexión")
+    parser.add_argument("--conexiones", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    asyncio.run(
+        run(args.host, args.port, args.n, args.concurrencia, args.conexiones)
+    )
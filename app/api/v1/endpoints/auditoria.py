@@ -1,32 +1,318 @@
 # app/api/v1/endpoints/auditoria.py
-from fastapi import APIRouter, Depends
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import exc, select
 
-from app.infra.db.session import get_db
+from app.core.config import settings
+from app.infra.cache.factor_catalog import CodigoDesconocido, catalogo_factores
+from app.infra.db.audit_queries import (
+    CAMPOS_EXPORTACION,
+    SET_TIMEOUT_LOCAL,
+    BusquedaNoAcotada,
+    CursorInvalido,
+    FiltrosBusqueda,
+    SELECT_ROLLUP_WATERMARK,
+    codificar_cursor,
+    consulta_exportacion,
+    consulta_conteo_factores,
+    consulta_pagina,
+    consulta_serie,
+    consulta_stats_monedas,
+    consulta_stats_riesgo,
+    consulta_top_factores,
+    fila_listado,
+    planificar_busqueda,
+    segmentos_rollup,
+)
+from app.infra.db.session import ReadSessionLocal, get_read_db
 from app.infra.db.models.transaction import Transaction
+from app.infra.db.tx_statements import COLUMNAS_ISO, SELECT_TX_ISO, columnas_desde_des
 
 router = APIRouter(tags=["auditoria"])
 
 
 @router.get("/auditoria/transactions")
-async def listar_transacciones(limit: int = 50, db: AsyncSession = Depends(get_db)):
-    stmt = (
-        select(Transaction)
-        .order_by(desc(Transaction.tx_timestamp_utc))
-        .limit(limit)
+async def listar_transacciones(
+    response: Response,
+    limit: int = Query(50, ge=1, le=settings.AUDIT_PAGE_MAX_ROWS),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Transacciones más recientes primero, paginadas por cursor keyset.
+    Si hay más filas, el header X-Next-Cursor trae el cursor siguiente.
+    """
+    try:
+        stmt = consulta_pagina(limit, cursor)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filas = (await db.execute(stmt)).all()
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        response.headers["X-Next-Cursor"] = codificar_cursor(ultima.timestamp, ultima.id)
+
+    return [fila_listado(r) for r in filas]
+
+
+async def _ids_factores(db: AsyncSession, factores: str) -> list[int]:
+    codigos = [c.strip().upper() for c in factores.split(",") if c.strip()]
+    await catalogo_factores.asegurar(db, codigos)
+    try:
+        return catalogo_factores.a_ids(codigos, estricto=True)
+    except CodigoDesconocido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/auditoria/factores/conteo")
+async def conteo_por_factores(
+    factores: str = Query(..., description="Códigos separados por coma, p. ej. HIGH_RISK_COUNTRY,NIGHT_TIME"),
+    modo: str = Query("all", pattern="^(all|any)$"),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Cuántas transacciones tienen todos (all) o alguno (any) de los factores
+    en el rango (por defecto, los últimos 7 días).
+    """
+    hasta = hasta or datetime.utcnow()
+    desde = desde or hasta - timedelta(days=7)
+    if hasta <= desde:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser posterior a 'desde'")
+
+    ids = await _ids_factores(db, factores)
+    fila = (
+        await db.execute(consulta_conteo_factores(ids, desde, hasta, todos=modo == "all"))
+    ).one()
+    return {
+        "factores": catalogo_factores.a_codigos(ids),
+        "modo": modo,
+        "desde": desde,
+        "hasta": hasta,
+        "n": fila.n,
+        "fraude": fila.fraude,
+    }
+
+
+@router.get("/auditoria/transactions/search")
+async def buscar_transacciones(
+    response: Response,
+    pan: Optional[str] = Query(None, max_length=19),
+    tid: Optional[str] = Query(None, max_length=8),
+    mid: Optional[str] = Query(None, max_length=15),
+    nivel_riesgo: Optional[str] = Query(None, max_length=10),
+    es_fraude: Optional[bool] = None,
+    monto_min: Optional[Decimal] = Query(None, ge=0),
+    monto_max: Optional[Decimal] = Query(None, ge=0),
+    factores: Optional[str] = Query(None, description="Códigos separados por coma (todos presentes)"),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=settings.AUDIT_PAGE_MAX_ROWS),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Búsqueda combinable por PAN, TID, MID, nivel de riesgo, fraude, monto
+    (DOP), factores de riesgo y fechas. Mismo formato y cursor (X-Next-Cursor) que el listado;
+    X-Search-Index indica el índice que el plan puede usar. Cada consulta
+    tiene un tope de filas (limit) y de tiempo (AUDIT_SEARCH_TIMEOUT_MS).
+    """
+    factores_ids = await _ids_factores(db, factores) if factores else None
+    filtros = FiltrosBusqueda(
+        pan=pan, tid=tid, mid=mid, nivel_riesgo=nivel_riesgo, es_fraude=es_fraude,
+        monto_min=monto_min, monto_max=monto_max, desde=desde, hasta=hasta,
+        factores_ids=factores_ids,
+    )
+    try:
+        plan = planificar_busqueda(
+            filtros,
+            limit,
+            cursor,
+            dias_por_defecto=settings.AUDIT_SEARCH_DEFAULT_DAYS,
+            dias_max_sin_indice=settings.AUDIT_SEARCH_MAX_DAYS_UNINDEXED,
+        )
+    except (CursorInvalido, BusquedaNoAcotada) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # set_config(..., true) = SET LOCAL: sólo para esta transacción
+        await db.execute(SET_TIMEOUT_LOCAL, {"timeout": str(settings.AUDIT_SEARCH_TIMEOUT_MS)})
+        filas = (await db.execute(plan.stmt)).all()
+    except exc.DBAPIError as e:
+        if "statement timeout" in str(e.orig):
+            raise HTTPException(
+                status_code=422,
+                detail="La búsqueda excede el presupuesto de tiempo; acote el rango o agregue filtros",
+            )
+        raise
+
+    response.headers["X-Search-Index"] = plan.indice
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        response.headers["X-Next-Cursor"] = codificar_cursor(ultima.timestamp, ultima.id)
+
+    return [fila_listado(r) for r in filas]
+
+
+@router.get("/auditoria/stats")
+async def estadisticas(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    granularidad: Optional[str] = Query(None, alias="granularity", pattern="^(hour|day)$"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Dashboard: conteos por nivel de riesgo × fraude, montos por moneda, top
+    de factores y serie temporal, leídos de los rollups (rango alineado a
+    horas, UTC). `watermark` indica hasta dónde están agregados.
+    """
+    hasta = hasta or datetime.utcnow()
+    desde = desde or hasta - timedelta(hours=24)
+    if hasta <= desde:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser posterior a 'desde'")
+
+    granularidad = granularidad or ("hour" if hasta - desde <= timedelta(hours=48) else "day")
+    if granularidad == "hour" and hasta - desde > timedelta(days=settings.ROLLUP_MAX_HOURLY_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Serie horaria limitada a {settings.ROLLUP_MAX_HOURLY_DAYS} días; use granularity=day",
+        )
+
+    segmentos = segmentos_rollup(desde, hasta)
+    por_riesgo, por_moneda, factores, serie = [], [], [], []
+    if segmentos:
+        por_riesgo = (await db.execute(consulta_stats_riesgo(segmentos))).all()
+        por_moneda = (await db.execute(consulta_stats_monedas(segmentos))).all()
+        factores = (
+            await db.execute(consulta_top_factores(segmentos, settings.ROLLUP_TOP_FACTORS))
+        ).all()
+        serie = (
+            await db.execute(consulta_serie("H" if granularidad == "hour" else "D", desde, hasta))
+        ).all()
+    watermark = (await db.execute(SELECT_ROLLUP_WATERMARK)).scalar()
+
+    return {
+        "desde": segmentos[0][1] if segmentos else desde,
+        "hasta": segmentos[-1][2] if segmentos else hasta,
+        "granularity": granularidad,
+        "watermark": watermark,
+        "totales": {
+            "n": sum(r.n for r in por_riesgo),
+            "fraude": sum(r.n for r in por_riesgo if r.es_fraude),
+        },
+        "por_riesgo": [
+            {"nivel_riesgo": r.nivel_riesgo or None, "es_fraude": r.es_fraude, "n": r.n}
+            for r in por_riesgo
+        ],
+        "por_moneda": [
+            {
+                "moneda": r.moneda or None,
+                "n": r.n,
+                "monto_src": float(r.monto_src),
+                "monto_dop": float(r.monto_dop),
+            }
+            for r in por_moneda
+        ],
+        "top_factores": [{"factor": r.factor, "n": r.n} for r in factores],
+        "serie": [
+            {"bucket": r.bucket, "nivel_riesgo": r.nivel_riesgo or None, "es_fraude": r.es_fraude, "n": r.n}
+            for r in serie
+        ],
+    }
+
+
+def _json_default(v: Any):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    raise TypeError(f"No serializable: {type(v)}")
+
+
+def _bloque_ndjson(filas) -> str:
+    return "".join(json.dumps(dict(r._mapping), default=_json_default) + "\n" for r in filas)
+
+
+def _bloque_csv(filas) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(
+        [v.isoformat() if isinstance(v, datetime) else v for v in r] for r in filas
+    )
+    return buf.getvalue()
+
+
+@router.get("/auditoria/transactions/export")
+async def exportar_transacciones(
+    desde: datetime,
+    hasta: datetime,
+    formato: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+):
+    """
+    Exporta [desde, hasta) en orden cronológico (NDJSON o CSV). Las filas se
+    leen con un cursor del lado del servidor y se emiten por bloques de
+    AUDIT_EXPORT_CHUNK_ROWS: la memoria no depende del tamaño del rango.
+    """
+    if hasta <= desde:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser posterior a 'desde'")
+
+    stmt = consulta_exportacion(desde, hasta).execution_options(
+        yield_per=settings.AUDIT_EXPORT_CHUNK_ROWS
     )
-    res = await db.execute(stmt)
-    txs = res.scalars().all()
-
-    return [
-        {
-            "id": t.id,
-            "timestamp": t.tx_timestamp_utc,
-            "pan": t.i_0002_pan,
-            "monto_dop": float(t.monto_dop_calculado or 0),
-            "nivel_riesgo": t.nivel_riesgo,
-            "es_fraude": t.es_fraude,
-        }
-        for t in txs
-    ]
+    bloque = _bloque_csv if formato == "csv" else _bloque_ndjson
+
+    async def generar():
+        # Sesión propia: la respuesta se sigue emitiendo después del endpoint
+        async with ReadSessionLocal() as db:
+            if formato == "csv":
+                yield ",".join(CAMPOS_EXPORTACION) + "\r\n"
+            resultado = await db.stream(stmt)
+            async for filas in resultado.partitions():
+                yield bloque(filas)
+
+    if formato == "csv":
+        nombre = f"transactions_{desde:%Y%m%d}_{hasta:%Y%m%d}.csv"
+        return StreamingResponse(
+            generar(),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+        )
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
+
+
+@router.get("/auditoria/transactions/{tx_id}/iso")
+async def detalle_iso_transaccion(tx_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Mensaje ISO 8583 completo: campos calientes + DE de ctransactions_iso."""
+    t = (
+        await db.execute(select(Transaction).where(Transaction.id == tx_id).limit(1))
+    ).scalars().first()
+    if t is None:
+        raise HTTPException(status_code=404, detail="Transacción no encontrada")
+
+    des = (
+        await db.execute(
+            SELECT_TX_ISO, {"tx_id": t.id, "tx_timestamp_utc": t.tx_timestamp_utc}
+        )
+    ).scalar()
+
+    await catalogo_factores.asegurar(db, [])
+
+    return {
+        "id": t.id,
+        "timestamp": t.tx_timestamp_utc,
+        "factores": catalogo_factores.a_codigos(t.factores_ids),
+        "mti": t.mti,
+        "bitmap": t.bitmap,
+        **{c: getattr(t, c) for c in COLUMNAS_ISO},
+        **columnas_desde_des(des),
+    }
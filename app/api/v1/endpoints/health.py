@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from app.infra.db.session import get_db
+from app.infra.db.session import get_db, metricas_pools
 from app.infra.detectors.tasas import obtener_estado_tasas
 from app.schemas.health_schemas import HealthResponse, PageInfo, StatusObject, ComponentStatus
 
@@ -23,6 +23,16 @@ async def health_check(db: AsyncSession = Depends(get_db)):
     except Exception as e:
         db_status = ComponentStatus(status="major_outage", detail=f"Database error: {e}")
 
+    # Pool de conexiones del primario (saturado → requests esperando conexión)
+    pool = metricas_pools()["primary"]
+    pool_status = ComponentStatus(
+        status="operational" if pool["saturation"] < 1 else "degraded_performance",
+        detail=(
+            f"{pool['checked_out']} en uso, saturación {pool['saturation']:.0%}, "
+            f"espera máx {pool['wait_max_ms']} ms, {pool['timeouts']} timeouts"
+        ),
+    )
+
     # Tasas
     tasas_estado = obtener_estado_tasas()
     tasas_status = ComponentStatus(
@@ -35,6 +45,9 @@ async def health_check(db: AsyncSession = Depends(get_db)):
     if db_status.status != "operational":
         indicator = "major_outage"
         desc = "Database unavailable."
+    elif pool_status.status != "operational":
+        indicator = "degraded_performance"
+        desc = "Database connection pool saturated."
     elif tasas_status.status != "operational":
         indicator = "degraded_performance"
         desc = "Exchange rate source degraded."
@@ -54,6 +67,13 @@ async def health_check(db: AsyncSession = Depends(get_db)):
         ),
         components={
             "database": db_status,
+            "database_pool": pool_status,
             "exchange": tasas_status,
         },
     )
+
+
+@router.get("/health/db-pool")
+async def estado_pool_db():
+    """Métricas de los pools (primario y lectura): uso, saturación y esperas."""
+    return metricas_pools()
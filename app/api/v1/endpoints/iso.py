@@ -7,15 +7,31 @@ from slowapi.errors import RateLimitExceeded
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.security import require_trusted_api_key
 from app.infra.db.session import get_db
 from app.domain.services.analizador_fraude import procesar_transaccion_iso
+from app.domain.services.idempotencia_service import idempotencia
+from app.domain.services.ingesta_service import veredictos_ndjson
+from app.schemas.iso_rapido import ISO8583Rapido, MensajeInvalido
 from app.schemas.iso_schemas import ISO8583Transaction, TransaccionResponse
+from app.schemas.veredicto import NdjsonStreamingResponse, respuesta_veredicto
 
 limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter(tags=["iso"])
 
 
+async def _analizar(db: AsyncSession, tx):
+    try:
+        # Retransmisiones (mismo STAN/TID/DE7) devuelven el veredicto original
+        resultado = await idempotencia.procesar(db, tx, procesar_transaccion_iso)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analizando transacción: {e}")
+
+    # Resultado interno: sin re-validar, directo a JSON (orjson)
+    return respuesta_veredicto(resultado, tx)
+
+
 @router.post("/analyze-trnx", response_model=TransaccionResponse)
 @limiter.limit(settings.RATE_LIMIT)
 async def analizar_iso(
@@ -23,32 +39,60 @@ async def analizar_iso(
     tx: ISO8583Transaction,
     db: AsyncSession = Depends(get_db),
 ):
+    return await _analizar(db, tx)
+
+
+async def transaccion_confiable(request: Request) -> ISO8583Rapido:
+    """Cuerpo parseado sin el modelo Pydantic (sólo campos que lee el motor)."""
     try:
-        resultado = await procesar_transaccion_iso(db, tx)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analizando transacción: {e}")
+        return ISO8583Rapido.desde_json(await request.body())
+    except MensajeInvalido as e:
+        loc = ["body", e.campo] if e.campo else ["body"]
+        raise HTTPException(status_code=422, detail=[{"loc": loc, "msg": e.mensaje}])
+
 
-    db_tx = resultado["db_tx"]
-    risk = resultado["risk"]
-    ofac = resultado["ofac"]
-
-    return TransaccionResponse(
-        is_fraud=risk["is_fraud"],
-        fraud_prob=risk["fraud_prob"],
-        risk_level=risk["risk_level"],
-        risk_factor=risk["risk_factor"],
-        message=risk["message"],
-        advice=risk["advice"],
-        customer_hash=risk["customer_hash"],
-        anomaly_score=risk["anomaly_score"],
-        timestamp=risk["timestamp"],
-        data_analyzed={
-            "src_amount": float(db_tx.i_0004_amount_transaction) / 100 if db_tx.i_0004_amount_transaction else 0.0,
-            "tar_amount": float(db_tx.monto_dop_calculado or 0),
-            "currency_tx": tx.i_0049_currency_code_tx,
-            "time_local": tx.i_0012_time_local,
-        },
-        exchange=resultado["exchange"],
-        ofac=resultado["ofac"],
-        trnx_db_id=db_tx.id,
-    )
+@router.post(
+    "/analyze-trnx/trusted",
+    response_model=TransaccionResponse,
+    dependencies=[Depends(require_trusted_api_key)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/ISO8583Transaction"}}
+            },
+        }
+    },
+)
+@limiter.limit(settings.RATE_LIMIT)
+async def analizar_iso_confiable(
+    request: Request,
+    tx: ISO8583Rapido = Depends(transaccion_confiable),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Igual que /analyze-trnx para emisores confiables (ISO_TRUSTED_API_KEYS)
+    cuyo switch ya validó el mensaje: sólo se validan los campos que usa
+    el motor.
+    """
+    return await _analizar(db, tx)
+
+
+@router.post(
+    "/analyze-trnx/stream",
+    response_class=NdjsonStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+@limiter.limit(settings.RATE_LIMIT)
+async def analizar_iso_stream(request: Request):
+    """
+    Re-análisis de archivos: cuerpo NDJSON (un ISO8583Transaction por
+    línea), respuesta NDJSON con un veredicto o error por línea ("linea"
+    indica cuál), en el orden en que terminan. Ver ingesta_service.
+    """
+    return NdjsonStreamingResponse(veredictos_ndjson(request.stream()))
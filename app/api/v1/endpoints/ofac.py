@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.aml.ofac_matcher import screen_person_ofac
-from app.infra.db.session import get_db
-from app.infra.db.models.ofac_audit import OfacAudit
+from app.aml.ofac_index import obtener_indice
+from app.aml.ofac_matcher import screen_batch, screen_person_ofac
+from app.core.config import settings
+from app.infra.db.session import AsyncSessionLocal, get_db
+from app.infra.db.buffered_writer import ofac_audit_writer
 
 router = APIRouter(prefix="/ofac", tags=["OFAC"])
 
@@ -12,6 +20,24 @@ router = APIRouter(prefix="/ofac", tags=["OFAC"])
 class OfacQuery(BaseModel):
     first_name: str
     last_name: str
+    country: Optional[str] = Field(None, max_length=2, description="País ISO2 del cliente")
+    city: Optional[str] = None
+
+
+class OfacBatchQuery(BaseModel):
+    names: List[OfacQuery] = Field(..., min_length=1, max_length=settings.OFAC_BATCH_MAX_NAMES)
+
+
+def _fila_auditoria(full_name: str, resultado: dict) -> dict:
+    return {
+        "full_name": full_name,
+        "match_type": resultado["match_type"],
+        "best_score": resultado["best_score"],
+        "best_name": resultado["best_name"],
+        "ent_num": resultado["ent_num"],
+        "list_code": resultado.get("list"),
+        "created_at": datetime.utcnow(),
+    }
 
 
 @router.post("/check")
@@ -21,20 +47,47 @@ async def consultar_ofac(
 ):
     full_name = f"{data.first_name} {data.last_name}".strip()
 
-    resultado = await screen_person_ofac(db, full_name)
+    resultado = await screen_person_ofac(db, full_name, pais=data.country, ciudad=data.city)
 
-    # Guardar auditoría (importante para cumplimiento AML)
-    audit = OfacAudit(
-        full_name=full_name,
-        match_type=resultado["match_type"],
-        best_score=resultado["best_score"],
-        best_name=resultado["best_name"],
-        ent_num=resultado["ent_num"],
-    )
-    db.add(audit)
-    await db.commit()
+    # Auditoría (importante para cumplimiento AML): se encola y se
+    # persiste en bloque en segundo plano, sin commit en la respuesta.
+    await ofac_audit_writer.put(_fila_auditoria(full_name, resultado))
 
     return {
         "request": full_name,
         "result": resultado,
     }
+
+
+@router.post("/check/batch")
+async def consultar_ofac_batch(data: OfacBatchQuery):
+    """
+    Screening masivo (onboarding / revisiones KYC).
+    Devuelve NDJSON: una línea por nombre, emitidas por chunk a medida que
+    se completan. La auditoría se encola al writer por chunk.
+    """
+    consultas = [
+        (f"{q.first_name} {q.last_name}".strip(), q.country, q.city) for q in data.names
+    ]
+    chunk = settings.OFAC_BATCH_CHUNK_SIZE
+
+    async def generar():
+        # Sesión propia: la respuesta se sigue emitiendo después del endpoint
+        async with AsyncSessionLocal() as db:
+            indice = await obtener_indice(db)
+
+        for inicio in range(0, len(consultas), chunk):
+            lote = consultas[inicio:inicio + chunk]
+            nombres = [c[0] for c in lote]
+            # CPU-bound: fuera del event loop para no bloquear otras peticiones
+            resultados = await asyncio.to_thread(screen_batch, indice, lote)
+
+            await ofac_audit_writer.put_many(
+                _fila_auditoria(n, r) for n, r in zip(nombres, resultados)
+            )
+            yield "".join(
+                json.dumps({"index": inicio + k, "request": n, "result": r}) + "\n"
+                for k, (n, r) in enumerate(zip(nombres, resultados))
+            )
+
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
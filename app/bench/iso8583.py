@@ -0,0 +1,83 @@
+# app/bench/iso8583.py
+"""
+Throughput del parser ISO 8583 crudo (app.infra.detectors.iso_parser),
+en mensajes por segundo:
+
+  parsear:           bytes → dict de campos
+  parsear+confiable: + ISO8583Rapido (camino del listener TCP)
+  parsear+pydantic:  + ISO8583Transaction (validación completa)
+  codificar:         dict de campos → bytes
+
+    python -m app.bench.iso8583 [--n 100000] [--bitmap-hex]
+"""
+import argparse
+import logging
+import time
+from typing import Callable, Dict
+
+from app.bench.serializacion import transaccion_ejemplo
+from app.infra.detectors.iso_parser import codificar, parsear
+from app.schemas.iso_rapido import ISO8583Rapido
+from app.schemas.iso_schemas import ISO8583Transaction
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def campos_ejemplo() -> Dict[str, str]:
+    """0100 típico: DE obligatorios + POS, RRN, MID, EMV (bitmap secundario por DE102)."""
+    campos = {k: v for k, v in vars(transaccion_ejemplo()).items() if v is not None}
+    campos.pop("bitmap", None)
+    campos.update(
+        i_0018_merchant_type_mcc="5411",
+        i_0022_pos_entry_mode="051",
+        i_0032_acquiring_inst_id="123456",
+        i_0037_retrieval_reference_number="000000123456",
+        i_0042_card_acceptor_mid="INDBANK00012345",
+        i_0055_icc_data_emv="9F2608A1B2C3D4E5F60718" * 4,
+        i_0102_account_id_1="0012345678",
+    )
+    return campos
+
+
+def _medir(fn: Callable[[], object], n: int) -> float:
+    """Llamadas por segundo."""
+    for _ in range(min(n, 1000)):
+        fn()
+    inicio = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - inicio)
+
+
+def run(n: int = 100000, bitmap_binario: bool = True) -> Dict[str, float]:
+    campos = campos_ejemplo()
+    mensaje = codificar(campos, bitmap_binario)
+
+    parseado = parsear(mensaje, bitmap_binario)
+    parseado.pop("bitmap")
+    if parseado != campos:
+        raise RuntimeError("parsear(codificar(campos)) no devuelve los mismos campos")
+
+    tasas = {
+        "parsear": _medir(lambda: parsear(mensaje, bitmap_binario), n),
+        "parsear+confiable": _medir(lambda: ISO8583Rapido(parsear(mensaje, bitmap_binario)), n),
+        "parsear+pydantic": _medir(lambda: ISO8583Transaction(**parsear(mensaje, bitmap_binario)), n),
+        "codificar": _medir(lambda: codificar(campos, bitmap_binario), n),
+    }
+    logger.info(f"Mensaje de {len(mensaje)} bytes, {len(campos) - 1} DE")
+    for camino, tasa in tasas.items():
+        logger.info(f"{camino:>18}: {tasa:12,.0f} msg/s ({1e6 / tasa:6.2f} µs/msg)")
+    return tasas
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark del parser ISO 8583")
+    parser.add_argument("--n", type=int, default=100000, help="Mensajes por camino")
+    parser.add_argument("--bitmap-hex", action="store_true", help="Bitmap en hex ASCII")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(n=args.n, bitmap_binario=not args.bitmap_hex)
@@ -0,0 +1,76 @@
+# app/bench/parseo.py
+"""
+Costo de parsear el cuerpo de /analyze-trnx, por camino:
+
+  pydantic:  ISO8583Transaction.model_validate_json (modo por defecto)
+  confiable: ISO8583Rapido.desde_json (/analyze-trnx/trusted)
+
+    python -m app.bench.parseo [--n 20000]
+"""
+import argparse
+import logging
+import time
+from typing import Callable, Dict
+
+import orjson
+
+from app.bench.serializacion import transaccion_ejemplo
+from app.infra.db.tx_statements import columnas_iso, des_frios
+from app.schemas.iso_rapido import ISO8583Rapido
+from app.schemas.iso_schemas import ISO8583Transaction
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def cuerpo_ejemplo() -> bytes:
+    """Mensaje típico del switch: los DE obligatorios más algunos opcionales."""
+    datos = {k: v for k, v in vars(transaccion_ejemplo()).items() if v is not None}
+    datos.update(
+        bitmap="723820300180C000",
+        i_0018_merchant_type_mcc="5411",
+        i_0022_pos_entry_mode="051",
+        i_0032_acquiring_inst_id="123456",
+        i_0037_retrieval_reference_number="000000123456",
+        i_0042_card_acceptor_mid="INDBANK00012345",
+    )
+    return orjson.dumps(datos)
+
+
+def _medir(fn: Callable[[], object], n: int) -> float:
+    """µs por llamada."""
+    for _ in range(min(n, 1000)):
+        fn()
+    inicio = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def run(n: int = 20000) -> Dict[str, float]:
+    cuerpo = cuerpo_ejemplo()
+
+    completo = ISO8583Transaction.model_validate_json(cuerpo)
+    rapido = ISO8583Rapido.desde_json(cuerpo)
+    if columnas_iso(completo) != columnas_iso(rapido) or des_frios(completo) != des_frios(rapido):
+        raise RuntimeError("Los dos caminos no producen la misma fila")
+
+    tiempos = {
+        "pydantic": _medir(lambda: ISO8583Transaction.model_validate_json(cuerpo), n),
+        "confiable": _medir(lambda: ISO8583Rapido.desde_json(cuerpo), n),
+    }
+    for camino, us in tiempos.items():
+        logger.info(f"{camino:>9}: {us:8.2f} µs/mensaje")
+    logger.info(f"  mejora: x{tiempos['pydantic'] / tiempos['confiable']:.1f}")
+    return tiempos
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de parseo del mensaje ISO")
+    parser.add_argument("--n", type=int, default=20000, help="Mensajes por camino")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(n=args.n)
@@ -0,0 +1,123 @@
+# app/bench/serializacion.py
+"""
+Costo de serializar la respuesta de /analyze-trnx, por camino:
+
+  pydantic: TransaccionResponse(...) + lo que hace FastAPI con
+            response_model (model_dump, validación, dump JSON, json.dumps)
+  orjson:   app.schemas.veredicto.serializar_veredicto
+
+No toca la BD: usa un resultado sintético con los tipos que produce el
+motor (escalares numpy incluidos).
+
+    python -m app.bench.serializacion [--n 20000]
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from app.schemas.iso_schemas import ISO8583Transaction, TransaccionResponse
+from app.schemas.veredicto import serializar_veredicto, veredicto
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+_ADAPTER = TypeAdapter(TransaccionResponse)
+
+
+def transaccion_ejemplo() -> ISO8583Transaction:
+    return ISO8583Transaction(
+        mti="0100",
+        i_0002_pan="4111111111111111",
+        i_0003_processing_code="000000",
+        i_0004_amount_transaction="000000125000",
+        i_0007_transmission_datetime="0101120000",
+        i_0011_stan="123456",
+        i_0012_time_local="120000",
+        i_0013_date_local="0101",
+        i_0041_card_acceptor_tid="TERM0001",
+        i_0043_card_acceptor_name_loc=f"{'COMERCIO DE PRUEBA':<25}{'SANTO DOMINGO':<13}DO",
+        i_0049_currency_code_tx="840",
+    )
+
+
+def resultado_ejemplo() -> Dict[str, Any]:
+    return {
+        "trnx_db_id": 123456789,
+        "monto_dop": 73750.0,
+        "risk": {
+            "is_fraud": np.bool_(False),
+            "fraud_prob": 0.4167,
+            "risk_level": "MEDIUM",
+            "risk_factor": ["HIGH_AMOUNT", "FOREIGN_CURRENCY"],
+            "message": "Medium risk transaction.",
+            "advice": "Allow but closely monitor future activity.",
+            "anomaly_score": np.float64(0.0421),
+            "anomaly_flag": False,
+            "customer_hash": "9f86d081884c7d65",
+            "timestamp": "2025-01-01T12:00:00.000000Z",
+        },
+        "history": {"tx_24h": 3, "tx_7d": 11, "promedio_30d": 4200.0},
+        "merchant_ctx": {"merchant_permitido": True, "mcc_permitido": True},
+        "exchange": {
+            "monto_original": 1250.0,
+            "moneda_original": "USD",
+            "monto_dop": 73750.0,
+            "tasa_aplicada": 59.0,
+            "tipo_tasa": "venta",
+            "conversion_requerida": True,
+        },
+        "ofac": {"score": 0.0, "factors": [{"code": "OFAC_CLEAR", "score": 0.0}]},
+    }
+
+
+def via_pydantic(resultado: Dict[str, Any], tx: ISO8583Transaction) -> bytes:
+    """Camino anterior: modelo + validación y serialización de response_model."""
+    modelo = TransaccionResponse(**veredicto(resultado, tx))
+    validado = _ADAPTER.validate_python(modelo.model_dump())
+    contenido = _ADAPTER.dump_python(validado, mode="json")
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _medir(fn: Callable[[], bytes], n: int) -> float:
+    """µs por llamada."""
+    for _ in range(min(n, 1000)):
+        fn()
+    inicio = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def run(n: int = 20000) -> Dict[str, float]:
+    tx = transaccion_ejemplo()
+    resultado = resultado_ejemplo()
+
+    if json.loads(via_pydantic(resultado, tx)) != json.loads(serializar_veredicto(resultado, tx)):
+        raise RuntimeError("Los dos caminos no producen el mismo JSON")
+
+    tiempos = {
+        "pydantic": _medir(lambda: via_pydantic(resultado, tx), n),
+        "orjson": _medir(lambda: serializar_veredicto(resultado, tx), n),
+    }
+    for camino, us in tiempos.items():
+        logger.info(f"{camino:>9}: {us:8.2f} µs/respuesta")
+    logger.info(f"  mejora: x{tiempos['pydantic'] / tiempos['orjson']:.1f}")
+    return tiempos
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de serialización del veredicto")
+    parser.add_argument("--n", type=int, default=20000, help="Respuestas por camino")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(n=args.n)
@@ -1,7 +1,11 @@
 # app/core/security.py
+import hmac
+
 from fastapi import Header, HTTPException, status
 from typing import Optional
 
+from app.core.config import settings
+
 
 async def get_api_key(x_api_key: Optional[str] = Header(None)) -> None:
     """
@@ -10,3 +14,15 @@ async def get_api_key(x_api_key: Optional[str] = Header(None)) -> None:
     """
     # Aquí podrías validar la API key contra BD o config.
     return
+
+
+async def require_trusted_api_key(x_api_key: Optional[str] = Header(None)) -> str:
+    """API key de un emisor confiable (ISO_TRUSTED_API_KEYS) o 403."""
+    if x_api_key and any(
+        hmac.compare_digest(x_api_key.encode(), k.encode()) for k in settings.ISO_TRUSTED_API_KEYS
+    ):
+        return x_api_key
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="API key no habilitada para el parseo confiable",
+    )
@@ -1,31 +1,46 @@
 # app/domain/services/analizador_fraude.py
+import time
 from datetime import datetime
-from sqlalchemy import select
+from typing import Any, Dict, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from app.infra.cache.risk_factor_cache import risk_config
-from app.infra.db.models.card import Card
-from app.infra.db.models.account import Account
-from app.infra.db.models.customer import Customer
-from app.infra.db.models.transaction import Transaction
-from app.infra.db.models.country import Country
-from app.infra.db.models.risk_factors import RiskFactor, RiskFactorRule, RiskFactorCritical
+from app.core.config import settings
+from app.infra.cache.factor_catalog import catalogo_factores
+from app.infra.cache.risk_factor_cache import RiskConfig, risk_config
+from app.infra.db.buffered_writer import tx_writer
+from app.infra.db.id_allocator import tx_ids
+from app.infra.db.session import engine
+from app.infra.db.tx_statements import (
+    SELECT_CONTEXTO_TARJETA,
+    SELECT_PAISES_RIESGO,
+    SELECT_RISK_CRITICAL,
+    SELECT_RISK_FACTORS,
+    SELECT_RISK_RULES,
+    columnas_iso,
+    des_frios,
+    insertar_transacciones,
+)
 from app.infra.detectors.fraude_model import analizar as analizar_core
 from app.domain.services.historial_service import obtener_historial_cliente
+from app.domain.services.idempotencia_service import (
+    ClaveMensaje,
+    buscar_veredicto,
+    fila_replay,
+    serializar_resultado,
+)
 from app.domain.services.merchant_service import obtener_contexto_merchant
 from app.domain.services.moneda_service import convertir_monto
 from app.schemas.iso_schemas import ISO8583Transaction
 from app.infra.detectors.ofac_factor import aplicar_factor_ofac
 
 async def obtener_listas_riesgo(db):
-    result = await db.execute(
-        select(Country.iso2, Country.risk_level)
-    )
+    result = await db.execute(SELECT_PAISES_RIESGO)
     rows = result.all()
 
-    high = {r.iso2 for r in rows if r.risk_level.upper() == "HIGH"}
-    medium = {r.iso2 for r in rows if r.risk_level.upper() == "MEDIUM"}
+    high = {r.iso2 for r in rows if (r.risk_level or "").upper() == "HIGH"}
+    medium = {r.iso2 for r in rows if (r.risk_level or "").upper() == "MEDIUM"}
 
     return high, medium
 
@@ -60,29 +75,73 @@ def normalizar_lista_paises(valor) -> set[str]:
     return limpio
 
 async def cargar_risk_config(db: AsyncSession):
-    # Pesos base
-    rows = (await db.execute(select(RiskFactor))).scalars().all()
-    risk_config.weights = {r.code: r.weight for r in rows if r.enabled}
+    # Pesos base (sólo habilitados)
+    rows = (await db.execute(SELECT_RISK_FACTORS)).all()
+    risk_config.weights = {r.code: r.weight for r in rows}
 
     # Factores críticos
-    rows = (await db.execute(select(RiskFactorCritical))).scalars().all()
+    rows = (await db.execute(SELECT_RISK_CRITICAL)).all()
     risk_config.critical = {r.factor_code for r in rows}
 
     # Reglas combinadas
-    rows = (await db.execute(select(RiskFactorRule))).scalars().all()
+    rows = (await db.execute(SELECT_RISK_RULES)).all()
     risk_config.rules = rows
 
     return risk_config
 
+
+_CACHE_RIESGO: Dict[str, Any] = {
+    "hrc": None,
+    "mrc": None,
+    "cargado": 0.0,
+}
+
+
+async def obtener_config_riesgo(db: AsyncSession):
+    """
+    Países de riesgo + RiskConfig, recargados desde la BD cada
+    RISK_CONFIG_TTL_SECONDS (no en cada transacción).
+
+    Devuelve una copia de los pesos por request: las reglas combinadas
+    pueden sobrescribir pesos y no deben filtrarse a otras transacciones.
+    """
+    cache = _CACHE_RIESGO
+    ahora = time.monotonic()
+    if cache["hrc"] is None or ahora - cache["cargado"] >= settings.RISK_CONFIG_TTL_SECONDS:
+        hrc, mrc = await obtener_listas_riesgo(db)
+        cache["hrc"] = normalizar_lista_paises(hrc)
+        cache["mrc"] = normalizar_lista_paises(mrc)
+        await cargar_risk_config(db)
+        await catalogo_factores.cargar(db)
+        cache["cargado"] = ahora
+
+    config = RiskConfig()
+    config.weights = dict(risk_config.weights)
+    config.critical = risk_config.critical
+    config.rules = risk_config.rules
+    return cache["hrc"], cache["mrc"], config
+
 def extraer_pais_de_locator(de43: str | None) -> str:
     val = (de43 or "").strip()
     return val[-2:]
 
 
+def extraer_ciudad_de_locator(de43: str | None) -> str | None:
+    # DE43: 1–25 nombre, 26–38 ciudad, 39–40 país
+    val = (de43 or "")[25:38].strip()
+    return val or None
+
+
 async def procesar_transaccion_iso(
     db: AsyncSession,
     tx: ISO8583Transaction,
+    clave: Optional[ClaveMensaje] = None,
 ) -> dict:
+    """
+    Analiza y persiste una transacción. Con `clave` (STAN, TID, DE7) el
+    veredicto se registra en ctransactions_replay junto con la fila y se
+    devuelve ya serializado a JSON (ver idempotencia_service).
+    """
     ahora = datetime.utcnow()
 
     # 1) Convertir monto a DOP
@@ -91,26 +150,17 @@ async def procesar_transaccion_iso(
         tx.i_0049_currency_code_tx,
     )
 
-    # 2) Obtener tarjeta/cuenta/cliente por pan
-    stmt_card = select(Card).where(Card.pan == tx.i_0002_pan)
-    res_card = await db.execute(stmt_card)
-    card = res_card.scalars().first()
-    
+    # 2) Obtener tarjeta/cuenta/cliente por pan (una sola consulta)
+    res_card = await db.execute(SELECT_CONTEXTO_TARJETA, {"pan": tx.i_0002_pan})
+    contexto = res_card.first()
+
+    card_id = contexto.card_id if contexto else None
+    customer = contexto if contexto and contexto.customer_id else None
     customer_id = None
     pais = None
-    if card:
-        stmt_account = select(Account).where(Account.id == card.account_id)
-        res_account = await db.execute(stmt_account)
-        account = res_account.scalars().first()
-        if account:
-            card.account = account
-            stmt_customer = select(Customer).where(Customer.id == account.customer_id)
-            res_customer = await db.execute(stmt_customer)
-            customer = res_customer.scalars().first()
-            if customer:
-                card.account.customer = customer
-                customer_id = customer.id
-                pais = extraer_pais_de_locator(tx.i_0043_card_acceptor_name_loc)
+    if customer:
+        customer_id = customer.customer_id
+        pais = extraer_pais_de_locator(tx.i_0043_card_acceptor_name_loc)
 
     # Hora local para el modelo
     hora_local = int(tx.i_0012_time_local[:2]) if tx.i_0012_time_local else 0
@@ -121,16 +171,18 @@ async def procesar_transaccion_iso(
     ofac_ctx = None
     if customer_id:
         ofac_ctx = {"score": 0.0, "factors": []}
-        await aplicar_factor_ofac(db, customer, ofac_ctx)
+        await aplicar_factor_ofac(
+            db,
+            customer,
+            ofac_ctx,
+            pais=pais,
+            ciudad=extraer_ciudad_de_locator(tx.i_0043_card_acceptor_name_loc),
+        )
     else:
         ofac_ctx = {"score": 0.0, "factors": []}
 
-    # Risk countries
-    hrc, mrc = await obtener_listas_riesgo(db)
-    high_risk_countries = normalizar_lista_paises(hrc)
-    medium_risk_countries = normalizar_lista_paises(mrc)
-
-    risk_config = await cargar_risk_config(db)
+    # Risk countries + configuración de factores (cache con TTL)
+    high_risk_countries, medium_risk_countries, config = await obtener_config_riesgo(db)
 
     # 3) Ejecutar modelo de fraude
     riesgo = analizar_core(
@@ -142,7 +194,7 @@ async def procesar_transaccion_iso(
         customer_id=customer_id,
         hrc=high_risk_countries, 
         mrc=medium_risk_countries,
-        risk_config=risk_config,
+        risk_config=config,
     )
 
     # 3.1) Merge OFAC al analisis de riesgo final
@@ -170,20 +222,24 @@ async def procesar_transaccion_iso(
     # 5) Contexto merchant
     merchant_ctx = await obtener_contexto_merchant(db, tx.i_0042_card_acceptor_mid)
 
-    # 6) Guardar Transaction completa
-    tx_dict = tx.model_dump()
-    columnas_iso = {k: v for k, v in tx_dict.items() if k.startswith("i_") and v is not None}
+    # Códigos → ids de risk_factors (factores_ids, índice GIN)
+    factores_ids = await catalogo_factores.internar(engine, riesgo["risk_factor"])
 
-    db_tx = Transaction(
+    # 6) Guardar Transaction completa: columnas calientes (None incluido,
+    # filas homogéneas para el insert en bloque) + DE fríos en "des".
+    # El id se preasigna de la secuencia en ambos modos.
+    fila = dict(
+        id=await tx_ids.siguiente(),
         tx_timestamp_utc=ahora,
-        card_id=card.id if card else None,
+        card_id=card_id,
         mti=tx.mti,
         bitmap=tx.bitmap,
-        **columnas_iso,
+        **columnas_iso(tx),
         es_fraude=riesgo["is_fraud"],
         probabilidad_fraude=riesgo["fraud_prob"],
         nivel_riesgo=riesgo["risk_level"],
         factores_riesgo=",".join(riesgo["risk_factor"]),
+        factores_ids=factores_ids,
         mensaje_analisis=riesgo["message"],
         recomendacion_analisis=riesgo["advice"],
         analisis_timestamp=ahora,
@@ -193,17 +249,39 @@ async def procesar_transaccion_iso(
         monto_promedio_30d=hist_ctx["promedio_30d"],
         merchant_permitido=merchant_ctx["merchant_permitido"],
         mcc_permitido=merchant_ctx["mcc_permitido"],
+        des=des_frios(tx),
     )
+    trnx_db_id = fila["id"]
 
-    db.add(db_tx)
-    await db.commit()
-    await db.refresh(db_tx)
-
-    return {
-        "db_tx": db_tx,
+    resultado = {
+        "trnx_db_id": trnx_db_id,
+        "monto_dop": monto_dop,
         "risk": riesgo,
         "history": hist_ctx,
         "merchant_ctx": merchant_ctx,
         "exchange": conversion,
         "ofac": ofac_ctx
     }
+    if clave is not None:
+        resultado = serializar_resultado(resultado)
+        fila["replay"] = fila_replay(clave, trnx_db_id, ahora, resultado)
+
+    if settings.TX_PERSISTENCE_MODE == "write_behind":
+        # El veredicto no espera el INSERT: la fila va al writer en segundo
+        # plano (journal + insert en bloque).
+        # Carrera conocida: una retransmisión analizada a la vez en otro
+        # worker no ve esta fila (todavía no está en la BD); el writer
+        # descarta la segunda (ON CONFLICT), pero su trnx_db_id ya se
+        # devolvió. Ver TransaccionResponse.trnx_db_id.
+        await tx_writer.put(fila)
+    else:
+        # Core, sin unit-of-work ni SELECT de refresh
+        duplicadas = await insertar_transacciones(db, [fila])
+        await db.commit()
+        if duplicadas:
+            # Otro worker registró el mismo mensaje primero: su veredicto manda
+            original = await buscar_veredicto(db, clave)
+            if original is not None:
+                return original
+
+    return resultado
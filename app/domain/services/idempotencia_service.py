@@ -0,0 +1,181 @@
+# app/domain/services/idempotencia_service.py
+"""
+Idempotencia de /analyze-trnx ante retransmisiones del adquirente.
+
+Un mensaje se identifica por (STAN, TID, fecha/hora de transmisión DE7).
+Antes de analizar se consulta:
+
+  1. el cache en memoria del worker (LRU con TTL),
+  2. los análisis en curso del mismo worker (el duplicado espera el futuro
+     del original en vez de analizar dos veces),
+  3. ctransactions_replay (veredictos de otros workers / reinicios).
+
+Si el mensaje ya fue analizado se devuelve el veredicto original. El
+registro en ctransactions_replay se escribe junto con la transacción
+(misma transacción SQL, o mismo lote del writer diferido).
+
+En write_behind el registro llega a la BD después de responder: dos
+copias del mismo mensaje en workers distintos al mismo tiempo se analizan
+las dos, y la segunda fila se descarta en el writer con su trnx_db_id ya
+devuelto. En sync la segunda choca con la PK de ctransactions_replay y
+devuelve el original.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.infra.db.tx_statements import SELECT_REPLAY
+from app.schemas.iso_schemas import ISO8583Transaction
+
+logger = logging.getLogger(__name__)
+
+ClaveMensaje = Tuple[str, str, str]
+
+
+def clave_mensaje(tx: ISO8583Transaction) -> Optional[ClaveMensaje]:
+    """(STAN, TID, DE7) o None si el mensaje no trae los tres."""
+    stan = tx.i_0011_stan
+    tid = tx.i_0041_card_acceptor_tid
+    dt = tx.i_0007_transmission_datetime
+    if not (stan and tid and dt):
+        return None
+    return stan, tid, dt
+
+
+def _json_default(v: Any):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if hasattr(v, "item"):
+        # Escalares numpy del modelo (bool_, float64)
+        return v.item()
+    raise TypeError(f"No serializable: {type(v)}")
+
+
+def serializar_resultado(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia JSON-compatible del resultado (la misma que se persiste)."""
+    return json.loads(json.dumps(resultado, default=_json_default))
+
+
+def fila_replay(clave: ClaveMensaje, tx_id: int, tx_timestamp_utc: datetime, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    stan, tid, dt = clave
+    return {
+        "i_0011_stan": stan,
+        "i_0041_card_acceptor_tid": tid,
+        "i_0007_transmission_datetime": dt,
+        "tx_id": tx_id,
+        "tx_timestamp_utc": tx_timestamp_utc,
+        "resultado": resultado,
+    }
+
+
+async def buscar_veredicto(db, clave: ClaveMensaje) -> Optional[Dict[str, Any]]:
+    """Veredicto registrado en ctransactions_replay dentro de la retención."""
+    stan, tid, dt = clave
+    desde = datetime.utcnow() - timedelta(hours=settings.IDEMPOTENCY_RETENTION_HOURS)
+    res = await db.execute(SELECT_REPLAY, {"stan": stan, "tid": tid, "dt": dt, "desde": desde})
+    return res.scalar()
+
+
+class VeredictosRecientes:
+    """LRU con TTL de veredictos por clave de mensaje (por worker)."""
+
+    def __init__(self, max_items: int, ttl_seconds: float):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[ClaveMensaje, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, clave: ClaveMensaje) -> Optional[Dict[str, Any]]:
+        item = self._items.get(clave)
+        if item is None:
+            return None
+        guardado, resultado = item
+        if time.monotonic() - guardado > self.ttl_seconds:
+            del self._items[clave]
+            return None
+        self._items.move_to_end(clave)
+        return resultado
+
+    def put(self, clave: ClaveMensaje, resultado: Dict[str, Any]) -> None:
+        self._items[clave] = (time.monotonic(), resultado)
+        self._items.move_to_end(clave)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class Idempotencia:
+    def __init__(self, cache: VeredictosRecientes):
+        self.cache = cache
+        self._en_curso: Dict[ClaveMensaje, asyncio.Future] = {}
+
+    async def procesar(
+        self,
+        db,
+        tx: ISO8583Transaction,
+        procesar: Callable[..., Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta `procesar(db, tx, clave=...)` una sola vez por mensaje y
+        devuelve el resultado (serializado a JSON) o el veredicto original.
+        """
+        clave = clave_mensaje(tx)
+        if clave is None:
+            return await procesar(db, tx)
+
+        resultado = self.cache.get(clave)
+        if resultado is not None:
+            logger.info(f"Retransmisión {clave}: veredicto en cache")
+            return resultado
+
+        futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            logger.info(f"Retransmisión {clave}: esperando análisis en curso")
+            await asyncio.wait((futuro,))
+            if not futuro.cancelled() and futuro.exception() is None:
+                return futuro.result()
+            # El original falló: este mensaje se analiza por su cuenta
+            return await self.procesar(db, tx, procesar)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_curso[clave] = futuro
+        try:
+            resultado = await buscar_veredicto(db, clave)
+            if resultado is not None:
+                logger.info(f"Retransmisión {clave}: veredicto en ctransactions_replay")
+            else:
+                resultado = await procesar(db, tx, clave=clave)
+            self.cache.put(clave, resultado)
+            futuro.set_result(resultado)
+            return resultado
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            # Marcar la excepción como recuperada si nadie esperaba el futuro
+            futuro.exception()
+            raise
+        finally:
+            self._en_curso.pop(clave, None)
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+idempotencia = Idempotencia(
+    VeredictosRecientes(
+        max_items=settings.IDEMPOTENCY_CACHE_SIZE,
+        ttl_seconds=settings.IDEMPOTENCY_CACHE_TTL_SECONDS,
+    )
+)
@@ -0,0 +1,136 @@
+# app/domain/services/ingesta_service.py
+"""
+Ingesta NDJSON en streaming (re-análisis de archivos offline).
+
+El cuerpo se consume por chunks y se corta en líneas; cada línea es un
+ISO8583Transaction. INGEST_CONCURRENCY workers (cada uno con su sesión)
+toman líneas de una cola acotada, las analizan por el mismo camino que
+/analyze-trnx (idempotencia incluida: re-enviar un archivo devuelve los
+veredictos originales) y dejan la línea NDJSON del veredicto en otra
+cola acotada, que es la que se devuelve al cliente a medida que sale.
+
+Memoria constante: como mucho INGEST_QUEUE_SIZE líneas por cola más una
+línea parcial (máximo INGEST_MAX_LINE_BYTES).
+
+Control de flujo:
+  - cola de entrada llena → no se lee el siguiente chunk y el servidor
+    deja de leer el socket (TCP frena al cliente);
+  - cola de salida llena (cliente que no lee respuestas) → los workers
+    se detienen;
+  - en write_behind, con INGEST_WRITER_MAX_PENDING filas en la cola del
+    writer los workers esperan a que baje, en vez de derramar al spill.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Tuple
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.domain.services.analizador_fraude import procesar_transaccion_iso
+from app.domain.services.idempotencia_service import idempotencia
+from app.infra.db.buffered_writer import tx_writer
+from app.infra.db.session import AsyncSessionLocal
+from app.schemas.iso_schemas import ISO8583Transaction
+from app.schemas.veredicto import linea_error, linea_veredicto
+
+logger = logging.getLogger(__name__)
+
+_ESPERA_WRITER_SECONDS = 0.05
+
+
+class LineaDemasiadoLarga(ValueError):
+    def __init__(self, linea: int, mensaje: str):
+        super().__init__(mensaje)
+        self.linea = linea
+
+
+async def lineas_ndjson(
+    chunks: AsyncIterator[bytes], maximo: int
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """(número de línea, línea) no vacías de un flujo de bytes, sin cargarlo entero."""
+    resto = b""
+    n = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        *lineas, resto = (resto + chunk).split(b"\n")
+        for linea in lineas:
+            n += 1
+            if linea.strip():
+                yield n, linea
+        if len(resto) > maximo:
+            raise LineaDemasiadoLarga(n + 1, f"línea de más de {maximo} bytes")
+    if resto.strip():
+        yield n + 1, resto
+
+
+async def _esperar_writer() -> None:
+    if settings.TX_PERSISTENCE_MODE != "write_behind":
+        return
+    while tx_writer.pendientes >= settings.INGEST_WRITER_MAX_PENDING:
+        await asyncio.sleep(_ESPERA_WRITER_SECONDS)
+
+
+async def _analizar_linea(db, n: int, linea: bytes) -> bytes:
+    try:
+        tx = ISO8583Transaction.model_validate_json(linea)
+    except ValidationError as e:
+        return linea_error(n, f"inválida: {e.error_count()} errores ({e.errors()[0]['msg']})")
+
+    await _esperar_writer()
+    try:
+        resultado = await idempotencia.procesar(db, tx, procesar_transaccion_iso)
+    except Exception as e:
+        logger.exception(f"Ingesta: error analizando la línea {n}")
+        await db.rollback()
+        return linea_error(n, f"Error analizando transacción: {e}")
+    return linea_veredicto(n, resultado, tx)
+
+
+async def veredictos_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Líneas NDJSON de veredicto (con "linea"), en el orden en que terminan."""
+    entrada: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+    salida: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+    workers = settings.INGEST_CONCURRENCY
+
+    async def leer() -> None:
+        try:
+            async for item in lineas_ndjson(chunks, settings.INGEST_MAX_LINE_BYTES):
+                await entrada.put(item)
+        except LineaDemasiadoLarga as e:
+            # Sin fin de línea no se puede seguir cortando el archivo
+            await salida.put(linea_error(e.linea, str(e)))
+        for _ in range(workers):
+            await entrada.put(None)
+
+    async def analizar() -> None:
+        async with AsyncSessionLocal() as db:
+            while (item := await entrada.get()) is not None:
+                await salida.put(await _analizar_linea(db, *item))
+
+    async def producir() -> None:
+        # TaskGroup: si la lectura o un worker falla, se cancela el resto
+        try:
+            async with asyncio.TaskGroup() as tareas:
+                tareas.create_task(leer())
+                for _ in range(workers):
+                    tareas.create_task(analizar())
+        except Exception as e:
+            logger.exception("Ingesta interrumpida")
+            await salida.put(linea_error(None, f"Ingesta interrumpida: {e}"))
+        await salida.put(None)
+
+    productor = asyncio.create_task(producir())
+    try:
+        while (linea := await salida.get()) is not None:
+            yield linea
+        await productor
+    finally:
+        # Cliente desconectado: cortar lectura y análisis pendientes
+        if not productor.done():
+            productor.cancel()
+            try:
+                await productor
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,86 @@
+# app/infra/cache/factor_catalog.py
+"""
+Catálogo de factores de riesgo: código ↔ id de risk_factors.
+
+Las transacciones guardan los factores como SMALLINT[] (factores_ids,
+índice GIN); la API sigue hablando en códigos. Los ids son los de
+risk_factors.id, estables entre procesos. Un código que el motor emite y
+no existe aún en risk_factors se da de alta (deshabilitado, peso 0) en su
+propia transacción para no depender del commit de la request.
+"""
+from typing import Any, Dict, Iterable, List
+
+from app.infra.db.tx_statements import (
+    INSERT_FACTORES_AUTO,
+    SELECT_CATALOGO_FACTORES,
+    SELECT_FACTORES_POR_CODIGO,
+)
+
+
+def factor_auto(code: str) -> Dict[str, Any]:
+    return {
+        "code": code,
+        "description": code,
+        "weight": 0,
+        "category": "AUTO",
+        "severity": "LOW",
+        "enabled": False,
+    }
+
+
+class CodigoDesconocido(ValueError):
+    pass
+
+
+class CatalogoFactores:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.codigos: Dict[int, str] = {}
+
+    def _agregar(self, filas: Iterable[Any]) -> None:
+        for r in filas:
+            self.ids[r.code] = r.id
+            self.codigos[r.id] = r.code
+
+    async def cargar(self, db) -> None:
+        self._agregar((await db.execute(SELECT_CATALOGO_FACTORES)).all())
+
+    async def asegurar(self, db, codigos: Iterable[str]) -> None:
+        """Recarga si falta algún código (p. ej. alta hecha por otro worker)."""
+        if not self.ids or any(c not in self.ids for c in codigos):
+            await self.cargar(db)
+
+    async def internar(self, engine, codigos: Iterable[str]) -> List[int]:
+        """Ids de los códigos; da de alta los que no existan en risk_factors."""
+        faltantes = sorted({c for c in codigos if c and c not in self.ids})
+        if faltantes:
+            async with engine.begin() as conn:
+                filas = (await conn.execute(
+                    INSERT_FACTORES_AUTO, [factor_auto(c) for c in faltantes]
+                )).all()
+                self._agregar(filas)
+                otros = [c for c in faltantes if c not in self.ids]
+                if otros:
+                    self._agregar((await conn.execute(
+                        SELECT_FACTORES_POR_CODIGO, {"codes": otros}
+                    )).all())
+        return self.a_ids(codigos)
+
+    def a_ids(self, codigos: Iterable[str], estricto: bool = False) -> List[int]:
+        ids = set()
+        for c in codigos:
+            if c in self.ids:
+                ids.add(self.ids[c])
+            elif estricto:
+                raise CodigoDesconocido(f"Factor de riesgo desconocido: {c}")
+        return sorted(ids)
+
+    def a_codigos(self, ids: Iterable[int] | None) -> List[str]:
+        return [self.codigos.get(i, str(i)) for i in (ids or [])]
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+catalogo_factores = CatalogoFactores()
@@ -0,0 +1,363 @@
+# app/infra/db/audit_queries.py
+"""
+Consultas de auditoría sobre ctransactions (SQLAlchemy Core).
+
+  - Listado paginado por cursor keyset sobre (tx_timestamp_utc, id):
+    cada página es un range scan del índice idx_ctransactions_tx_time,
+    sin OFFSET, y el costo no crece con la profundidad.
+  - Exportación por rango de fechas con cursor del lado del servidor:
+    las filas se leen y emiten por bloques (memoria constante).
+  - Búsqueda filtrada: el planificador traduce los filtros a predicados
+    que coinciden con los índices compuestos / parciales de ctransactions
+    y acota el rango de fechas cuando ningún filtro es selectivo.
+  - Estadísticas del dashboard desde los rollups horarios / diarios (nunca
+    GROUP BY sobre ctransactions).
+
+Sólo se seleccionan las columnas proyectadas; nunca objetos ORM.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, bindparam, func, or_, select, tuple_
+
+from app.infra.db.models.transaction import Transaction
+from app.infra.db.models.tx_rollup import RollupWatermark, TxRollup, TxRollupFactor
+
+TX = Transaction.__table__
+ROLLUP = TxRollup.__table__
+ROLLUP_FACTOR = TxRollupFactor.__table__
+
+# Listado (/auditoria/transactions)
+COLUMNAS_LISTADO = (
+    TX.c.id,
+    TX.c.tx_timestamp_utc.label("timestamp"),
+    TX.c.i_0002_pan.label("pan"),
+    TX.c.monto_dop_calculado.label("monto_dop"),
+    TX.c.nivel_riesgo,
+    TX.c.es_fraude,
+)
+
+# Exportación (cumplimiento): listado + datos del mensaje y del análisis
+COLUMNAS_EXPORTACION = COLUMNAS_LISTADO + (
+    TX.c.mti,
+    TX.c.i_0004_amount_transaction.label("amount"),
+    TX.c.i_0049_currency_code_tx.label("currency"),
+    TX.c.i_0011_stan.label("stan"),
+    TX.c.i_0041_card_acceptor_tid.label("tid"),
+    TX.c.i_0042_card_acceptor_mid.label("mid"),
+    TX.c.i_0018_merchant_type_mcc.label("mcc"),
+    TX.c.probabilidad_fraude,
+    TX.c.factores_riesgo,
+    TX.c.recomendacion_analisis,
+)
+CAMPOS_EXPORTACION: Tuple[str, ...] = tuple(c.key for c in COLUMNAS_EXPORTACION)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+# ==========================================================
+#  CURSOR KEYSET
+# ==========================================================
+
+def codificar_cursor(ts: datetime, tx_id: int) -> str:
+    crudo = f"{ts.isoformat()}|{tx_id}".encode("ascii")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        ts, tx_id = base64.urlsafe_b64decode(cursor + relleno).decode("ascii").split("|")
+        return datetime.fromisoformat(ts), int(tx_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def _paginar(stmt: Select, limit: int, cursor: Optional[str]) -> Select:
+    """
+    Más reciente primero. Pide limit + 1 filas: la extra sólo indica que
+    hay página siguiente.
+    """
+    stmt = stmt.order_by(TX.c.tx_timestamp_utc.desc(), TX.c.id.desc()).limit(limit + 1)
+    if cursor:
+        ts, tx_id = decodificar_cursor(cursor)
+        stmt = stmt.where(tuple_(TX.c.tx_timestamp_utc, TX.c.id) < tuple_(ts, tx_id))
+    return stmt
+
+
+def consulta_pagina(limit: int, cursor: Optional[str] = None) -> Select:
+    return _paginar(select(*COLUMNAS_LISTADO), limit, cursor)
+
+
+def fila_listado(r: Any) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "timestamp": r.timestamp,
+        "pan": r.pan,
+        "monto_dop": float(r.monto_dop or 0),
+        "nivel_riesgo": r.nivel_riesgo,
+        "es_fraude": r.es_fraude,
+    }
+
+
+# ==========================================================
+#  EXPORTACIÓN POR RANGO
+# ==========================================================
+
+def consulta_exportacion(desde: datetime, hasta: datetime) -> Select:
+    """[desde, hasta) en orden ascendente; el rango poda particiones."""
+    return (
+        select(*COLUMNAS_EXPORTACION)
+        .where(TX.c.tx_timestamp_utc >= desde, TX.c.tx_timestamp_utc < hasta)
+        .order_by(TX.c.tx_timestamp_utc, TX.c.id)
+    )
+
+
+# ==========================================================
+#  BÚSQUEDA FILTRADA
+# ==========================================================
+
+class BusquedaNoAcotada(ValueError):
+    pass
+
+
+@dataclass
+class FiltrosBusqueda:
+    pan: Optional[str] = None
+    tid: Optional[str] = None
+    mid: Optional[str] = None
+    nivel_riesgo: Optional[str] = None
+    es_fraude: Optional[bool] = None
+    monto_min: Optional[Decimal] = None
+    monto_max: Optional[Decimal] = None
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    factores_ids: Optional[List[int]] = None     # todos presentes (@>)
+
+
+@dataclass
+class PlanBusqueda:
+    stmt: Select
+    indice: str            # índice que el predicado principal puede usar
+    desde: datetime
+    hasta: datetime
+
+
+# Igualdades con índice (columna, tx_timestamp_utc), de más a menos selectiva
+_IGUALDADES = (
+    ("pan", TX.c.i_0002_pan, "idx_ctransactions_pan"),
+    ("tid", TX.c.i_0041_card_acceptor_tid, "idx_ctransactions_tid"),
+    ("mid", TX.c.i_0042_card_acceptor_mid, "idx_ctransactions_mid"),
+)
+
+
+def planificar_busqueda(
+    f: FiltrosBusqueda,
+    limit: int,
+    cursor: Optional[str] = None,
+    dias_por_defecto: int = 30,
+    dias_max_sin_indice: int = 31,
+    ahora: Optional[datetime] = None,
+) -> PlanBusqueda:
+    """
+    Traduce los filtros a un SELECT paginado (keyset) sobre las columnas
+    del listado. Reglas:
+
+      - Siempre hay rango de tiempo (poda de particiones): sin `desde` se
+        usan los últimos `dias_por_defecto`.
+      - Igualdad por PAN / TID / MID → índice (columna, tx_timestamp_utc):
+        el rango y el ORDER BY salen del mismo índice.
+      - es_fraude = true → predicado idéntico al de los índices parciales
+        (`WHERE es_fraude`) para que el planner los pueda usar.
+      - nivel_riesgo → índice (nivel_riesgo, tx_timestamp_utc).
+      - Factores (ids de risk_factors) → factores_ids @> ARRAY[...] sobre
+        el índice GIN idx_ctransactions_factores.
+      - Monto: filtro residual, salvo con es_fraude (índice parcial de monto).
+      - Sin filtro indexado selectivo, el rango no puede superar
+        `dias_max_sin_indice` (BusquedaNoAcotada).
+    """
+    hasta = f.hasta or (ahora or datetime.utcnow())
+    desde = f.desde or hasta - timedelta(days=dias_por_defecto)
+    if hasta <= desde:
+        raise BusquedaNoAcotada("'hasta' debe ser posterior a 'desde'")
+
+    condiciones: List[Any] = [
+        TX.c.tx_timestamp_utc >= desde,
+        TX.c.tx_timestamp_utc < hasta,
+    ]
+    indice = None
+
+    for campo, columna, nombre in _IGUALDADES:
+        valor = getattr(f, campo)
+        if valor:
+            condiciones.append(columna == valor)
+            indice = indice or nombre
+
+    if f.es_fraude is True:
+        # Mismo predicado que los índices parciales
+        condiciones.append(TX.c.es_fraude)
+        if indice is None:
+            indice = (
+                "idx_ctransactions_fraude_monto"
+                if f.monto_min is not None or f.monto_max is not None
+                else "idx_ctransactions_fraude"
+            )
+    elif f.es_fraude is False:
+        condiciones.append(TX.c.es_fraude.is_not(True))
+
+    if f.factores_ids:
+        condiciones.append(TX.c.factores_ids.contains(f.factores_ids))
+        indice = indice or "idx_ctransactions_factores"
+
+    if f.nivel_riesgo:
+        condiciones.append(TX.c.nivel_riesgo == f.nivel_riesgo.upper())
+        indice = indice or "idx_ctransactions_nivel_riesgo"
+
+    if f.monto_min is not None:
+        condiciones.append(TX.c.monto_dop_calculado >= f.monto_min)
+    if f.monto_max is not None:
+        condiciones.append(TX.c.monto_dop_calculado <= f.monto_max)
+
+    selectivo = indice is not None and indice != "idx_ctransactions_nivel_riesgo"
+    if not selectivo and hasta - desde > timedelta(days=dias_max_sin_indice):
+        raise BusquedaNoAcotada(
+            f"Sin filtro por PAN/TID/MID, fraude o factores el rango máximo es de "
+            f"{dias_max_sin_indice} días"
+        )
+
+    stmt = _paginar(select(*COLUMNAS_LISTADO).where(*condiciones), limit, cursor)
+    return PlanBusqueda(
+        stmt=stmt,
+        indice=indice or "idx_ctransactions_tx_time",
+        desde=desde,
+        hasta=hasta,
+    )
+
+
+def consulta_conteo_factores(
+    factores_ids: List[int], desde: datetime, hasta: datetime, todos: bool = True
+) -> Select:
+    """
+    Transacciones con todos (@>) o alguno (&&) de los factores en
+    [desde, hasta): bitmap scan del índice GIN + poda de particiones.
+    """
+    predicado = (
+        TX.c.factores_ids.contains(factores_ids)
+        if todos else TX.c.factores_ids.overlap(factores_ids)
+    )
+    return select(
+        func.count().label("n"),
+        func.count().filter(TX.c.es_fraude).label("fraude"),
+    ).where(
+        predicado,
+        TX.c.tx_timestamp_utc >= desde,
+        TX.c.tx_timestamp_utc < hasta,
+    )
+
+
+# Presupuesto de tiempo por consulta (SET LOCAL no acepta parámetros)
+SET_TIMEOUT_LOCAL = select(
+    func.set_config("statement_timeout", bindparam("timeout"), True)
+)
+
+
+# ==========================================================
+#  ESTADÍSTICAS (ROLLUPS)
+# ==========================================================
+
+def _hora(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _dia(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def segmentos_rollup(desde: datetime, hasta: datetime) -> List[Tuple[str, datetime, datetime]]:
+    """
+    Cubre [desde, hasta) (alineado a horas) con la menor cantidad de
+    buckets: días completos desde el rollup diario y los bordes desde
+    el horario.
+    """
+    desde, hasta = _hora(desde), _hora(hasta)
+    if hasta <= desde:
+        return []
+    dia_ini = desde if desde == _dia(desde) else _dia(desde) + timedelta(days=1)
+    dia_fin = _dia(hasta)
+    if dia_ini >= dia_fin:
+        return [("H", desde, hasta)]
+
+    segmentos = []
+    if desde < dia_ini:
+        segmentos.append(("H", desde, dia_ini))
+    segmentos.append(("D", dia_ini, dia_fin))
+    if dia_fin < hasta:
+        segmentos.append(("H", dia_fin, hasta))
+    return segmentos
+
+
+def _en_segmentos(tabla, segmentos: List[Tuple[str, datetime, datetime]]):
+    return or_(*[
+        and_(tabla.c.periodo == p, tabla.c.bucket >= a, tabla.c.bucket < b)
+        for p, a, b in segmentos
+    ])
+
+
+def consulta_stats_riesgo(segmentos) -> Select:
+    return (
+        select(ROLLUP.c.nivel_riesgo, ROLLUP.c.es_fraude, func.sum(ROLLUP.c.n).label("n"))
+        .where(_en_segmentos(ROLLUP, segmentos))
+        .group_by(ROLLUP.c.nivel_riesgo, ROLLUP.c.es_fraude)
+        .order_by(ROLLUP.c.nivel_riesgo, ROLLUP.c.es_fraude)
+    )
+
+
+def consulta_stats_monedas(segmentos) -> Select:
+    return (
+        select(
+            ROLLUP.c.moneda,
+            func.sum(ROLLUP.c.n).label("n"),
+            func.sum(ROLLUP.c.monto_src).label("monto_src"),
+            func.sum(ROLLUP.c.monto_dop).label("monto_dop"),
+        )
+        .where(_en_segmentos(ROLLUP, segmentos))
+        .group_by(ROLLUP.c.moneda)
+        .order_by(func.sum(ROLLUP.c.monto_dop).desc())
+    )
+
+
+def consulta_top_factores(segmentos, top: int) -> Select:
+    return (
+        select(ROLLUP_FACTOR.c.factor, func.sum(ROLLUP_FACTOR.c.n).label("n"))
+        .where(_en_segmentos(ROLLUP_FACTOR, segmentos))
+        .group_by(ROLLUP_FACTOR.c.factor)
+        .order_by(func.sum(ROLLUP_FACTOR.c.n).desc())
+        .limit(top)
+    )
+
+
+def consulta_serie(periodo: str, desde: datetime, hasta: datetime) -> Select:
+    """Serie por bucket × nivel × fraude (sólo un periodo: H o D)."""
+    inicio = _hora(desde) if periodo == "H" else _dia(desde)
+    return (
+        select(
+            ROLLUP.c.bucket,
+            ROLLUP.c.nivel_riesgo,
+            ROLLUP.c.es_fraude,
+            func.sum(ROLLUP.c.n).label("n"),
+        )
+        .where(ROLLUP.c.periodo == periodo, ROLLUP.c.bucket >= inicio, ROLLUP.c.bucket < hasta)
+        .group_by(ROLLUP.c.bucket, ROLLUP.c.nivel_riesgo, ROLLUP.c.es_fraude)
+        .order_by(ROLLUP.c.bucket)
+    )
+
+
+SELECT_ROLLUP_WATERMARK = select(RollupWatermark.hasta).where(
+    RollupWatermark.nombre == "ctransactions"
+)
@@ -0,0 +1,371 @@
+# app/infra/db/buffered_writer.py
+"""
+Escritura diferida en bloque (write-behind) para auditoría y transacciones.
+
+Las filas se encolan en memoria y un task de fondo las inserta en bloque
+cuando se llena el lote o vence el intervalo. Si la BD no está disponible
+las filas se agregan a un archivo local (JSON lines, append-only) y se
+reintentan después, de modo que no se pierde ningún registro.
+
+Con `journal_dir`, cada fila se escribe además a un segmento de journal
+antes de encolarse; los segmentos se borran cuando todas sus filas ya
+están en la BD (o en el spill file). Si el proceso muere, el siguiente
+arranque pasa los segmentos huérfanos al spill file y se re-insertan.
+Requiere `idempotente=True` (ON CONFLICT DO NOTHING): una fila del journal
+puede haber llegado ya a la BD.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy import Date, DateTime, Numeric, Table, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.infra.db.models.ofac_audit import OfacAudit
+from app.infra.db.models.transaction import Transaction
+from app.infra.db.session import engine
+from app.infra.db.tx_statements import insertar_transacciones
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(v: Any):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    raise TypeError(f"No serializable: {type(v)}")
+
+
+class BufferedWriter:
+    def __init__(
+        self,
+        tabla: Table,
+        nombre: str,
+        max_batch: int = settings.AUDIT_BATCH_SIZE,
+        flush_seconds: float = settings.AUDIT_FLUSH_SECONDS,
+        max_pendientes: int = settings.AUDIT_MAX_PENDING,
+        enqueue_timeout: float = settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+        spill_dir: str = settings.AUDIT_SPILL_DIR,
+        idempotente: bool = False,
+        journal_dir: str | None = None,
+        ejecutar: Callable[[Any, List[Dict[str, Any]]], Awaitable[None]] | None = None,
+    ) -> None:
+        if journal_dir and not idempotente:
+            raise ValueError(f"{nombre}: el journal requiere inserts idempotentes")
+        self.tabla = tabla
+        self.nombre = nombre
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_dir = spill_dir
+        self.journal_dir = journal_dir
+
+        # ON CONFLICT DO NOTHING: el replay (spill/journal) no duplica filas
+        self._stmt = (
+            pg_insert(tabla).on_conflict_do_nothing() if idempotente else insert(tabla)
+        )
+        # Escritura a medida (p. ej. una fila → varias tablas); debe ser idempotente
+        # si se combina con journal/spill de filas ya insertadas.
+        self._ejecutar_custom = ejecutar
+
+        self._max_pendientes = max_pendientes
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+        # Journal: segmento actual y filas aún no persistidas por segmento
+        self._seg = 0
+        self._seg_file = None
+        self._seg_pendientes: Dict[int, int] = {}
+
+        # Conversores para re-hidratar filas leídas del spill file
+        self._conversores = {}
+        for col in tabla.columns:
+            if isinstance(col.type, DateTime):
+                self._conversores[col.name] = datetime.fromisoformat
+            elif isinstance(col.type, Date):
+                self._conversores[col.name] = date.fromisoformat
+            elif isinstance(col.type, Numeric) and col.type.asdecimal:
+                self._conversores[col.name] = Decimal
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        if self.journal_dir:
+            self._recuperar_journal()
+            self._abrir_segmento()
+        self._queue = asyncio.Queue(maxsize=self._max_pendientes)
+        self._task = asyncio.create_task(self._loop(), name=f"writer-{self.nombre}")
+
+    async def stop(self) -> None:
+        """Hook de shutdown: drena la cola y hace el último flush."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+        if self._seg_file is not None:
+            self._seg_file.close()
+            self._seg_file = None
+            self._limpiar_segmentos(incluir_actual=True)
+
+    @property
+    def spill_path(self) -> str:
+        # Por proceso: con varios workers cada uno derrama y re-inserta lo suyo
+        return os.path.join(self.spill_dir, f"{self.nombre}.{os.getpid()}.jsonl")
+
+    @property
+    def pendientes(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ------------------------------------------------------------------
+    # Encolado (con backpressure acotado)
+    # ------------------------------------------------------------------
+    async def put(self, fila: Dict[str, Any]) -> None:
+        await self.put_many([fila])
+
+    async def put_many(self, filas: Iterable[Dict[str, Any]]) -> None:
+        self.start()
+        filas = list(filas)
+        seg = self._journal(filas) if self.journal_dir else None
+        for i, fila in enumerate(filas):
+            try:
+                await asyncio.wait_for(self._queue.put((seg, fila)), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                # Cola llena más allá del límite: no bloqueamos al cliente
+                # indefinidamente; el resto va directo al spill file.
+                logger.warning(
+                    f"{self.nombre}: cola llena, {len(filas) - i} filas al spill file"
+                )
+                self._spill(filas[i:])
+                self._confirmar([(seg, f) for f in filas[i:]])
+                return
+
+    # ------------------------------------------------------------------
+    # Flush
+    # ------------------------------------------------------------------
+    async def _loop(self) -> None:
+        await self._replay_spill()
+        loop = asyncio.get_running_loop()
+        terminar = False
+
+        while not terminar:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                await self._replay_spill()
+                continue
+
+            # Acumular hasta llenar el lote o vencer el intervalo
+            lote: List[Tuple[int | None, Dict[str, Any]]] = []
+            terminar = item is None
+            if item is not None:
+                lote.append(item)
+            limite = loop.time() + self.flush_seconds
+            while not terminar and len(lote) < self.max_batch:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    terminar = True
+                else:
+                    lote.append(item)
+
+            # Al cerrar: drenar lo que aún quede en cola
+            while terminar and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    lote.append(item)
+
+            if self._seg_file is not None and lote:
+                self._abrir_segmento()
+
+            for i in range(0, len(lote), self.max_batch):
+                await self._flush(lote[i:i + self.max_batch])
+
+    async def _ejecutar(self, conn, filas: List[Dict[str, Any]]) -> None:
+        if self._ejecutar_custom is not None:
+            await self._ejecutar_custom(conn, filas)
+        else:
+            await conn.execute(self._stmt, filas)
+
+    async def _insertar(self, filas: List[Dict[str, Any]]) -> None:
+        async with engine.begin() as conn:
+            await self._ejecutar(conn, filas)
+
+    async def _flush(self, lote: List[Tuple[int | None, Dict[str, Any]]]) -> None:
+        filas = [f for _, f in lote]
+        try:
+            await self._insertar(filas)
+        except Exception as e:
+            logger.error(f"{self.nombre}: BD no disponible ({e}); {len(filas)} filas al spill file")
+            self._spill(filas)
+        self._confirmar(lote)
+
+    # ------------------------------------------------------------------
+    # Spill file (append-only)
+    # ------------------------------------------------------------------
+    def _spill(self, filas: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.spill_dir or ".", exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for fila in filas:
+                f.write(json.dumps(fila, default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rehidratar(self, fila: Dict[str, Any]) -> Dict[str, Any]:
+        for col, conv in self._conversores.items():
+            if fila.get(col) is not None:
+                fila[col] = conv(fila[col])
+        return fila
+
+    async def _replay_spill(self) -> None:
+        """Reintenta las filas derramadas; si vuelve a fallar quedan en disco."""
+        replay_path = self.spill_path + ".replay"
+        if not os.path.exists(replay_path):
+            if os.path.exists(self.spill_path):
+                os.replace(self.spill_path, replay_path)
+            elif not self._adoptar_huerfano(replay_path):
+                return
+
+        with open(replay_path, encoding="utf-8") as f:
+            filas = [self._rehidratar(json.loads(l)) for l in f if l.strip()]
+
+        try:
+            # Una sola transacción: o entra todo el archivo o nada (sin duplicados)
+            async with engine.begin() as conn:
+                for i in range(0, len(filas), self.max_batch):
+                    await self._ejecutar(conn, filas[i:i + self.max_batch])
+        except Exception as e:
+            logger.warning(f"{self.nombre}: replay del spill file pendiente ({e})")
+            return
+
+        os.remove(replay_path)
+        logger.info(f"{self.nombre}: {len(filas)} filas recuperadas del spill file")
+
+    def _adoptar_huerfano(self, replay_path: str) -> bool:
+        """
+        Toma el spill/replay de un proceso que ya no existe (o de antes del
+        spill por proceso). El rename es atómico: un solo worker lo adopta.
+        """
+        for ruta in sorted(glob.glob(os.path.join(self.spill_dir, f"{self.nombre}.*jsonl*"))):
+            pid = os.path.basename(ruta)[len(self.nombre) + 1:].split(".", 1)[0]
+            if pid.isdigit() and (int(pid) == os.getpid() or _proceso_vivo(int(pid))):
+                continue
+            try:
+                os.replace(ruta, replay_path)
+            except FileNotFoundError:
+                continue
+            logger.warning(f"{self.nombre}: spill file huérfano {ruta} adoptado")
+            return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Journal por segmentos (sólo con journal_dir)
+    # ------------------------------------------------------------------
+    def _ruta_segmento(self, seg: int, pid: int | None = None) -> str:
+        return os.path.join(
+            self.journal_dir, f"{self.nombre}.{pid or os.getpid()}.{seg:08d}.journal"
+        )
+
+    def _abrir_segmento(self) -> None:
+        """Rota: las filas nuevas van a un segmento nuevo."""
+        if self._seg_file is not None:
+            self._seg_file.close()
+        self._seg += 1
+        self._seg_pendientes[self._seg] = 0
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._seg_file = open(self._ruta_segmento(self._seg), "a", encoding="utf-8")
+        self._limpiar_segmentos()
+
+    def _journal(self, filas: List[Dict[str, Any]]) -> int:
+        # write() + flush(): sobrevive a la caída del proceso sin pagar un
+        # fsync por transacción; el fsync queda a cargo del sistema operativo.
+        self._seg_file.write(
+            "".join(json.dumps(f, default=_json_default) + "\n" for f in filas)
+        )
+        self._seg_file.flush()
+        self._seg_pendientes[self._seg] += len(filas)
+        return self._seg
+
+    def _confirmar(self, lote: List[Tuple[int | None, Dict[str, Any]]]) -> None:
+        """Las filas del lote ya están en la BD o en el spill file."""
+        if self.journal_dir is None:
+            return
+        for seg, _ in lote:
+            if seg in self._seg_pendientes:
+                self._seg_pendientes[seg] -= 1
+        self._limpiar_segmentos()
+
+    def _limpiar_segmentos(self, incluir_actual: bool = False) -> None:
+        for seg, n in list(self._seg_pendientes.items()):
+            if n <= 0 and (incluir_actual or seg != self._seg):
+                del self._seg_pendientes[seg]
+                try:
+                    os.remove(self._ruta_segmento(seg))
+                except FileNotFoundError:
+                    pass
+
+    def _recuperar_journal(self) -> None:
+        """
+        Segmentos de procesos que ya no existen → spill file (se re-insertan
+        con ON CONFLICT DO NOTHING en el próximo replay).
+        """
+        for ruta in sorted(glob.glob(os.path.join(self.journal_dir, f"{self.nombre}.*.journal"))):
+            try:
+                pid = int(os.path.basename(ruta)[len(self.nombre) + 1:].split(".", 1)[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _proceso_vivo(pid):
+                continue
+            with open(ruta, encoding="utf-8") as f:
+                filas = [json.loads(l) for l in f if l.strip()]
+            if filas:
+                self._spill(filas)
+                logger.warning(f"{self.nombre}: {len(filas)} filas recuperadas del journal {ruta}")
+            os.remove(ruta)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+ofac_audit_writer = BufferedWriter(OfacAudit.__table__, "ofac_audit")
+
+# Transacciones (TX_PERSISTENCE_MODE="write_behind"): id preasignado,
+# fila caliente + DE fríos (ctransactions_iso), ON CONFLICT DO NOTHING
+# y journal local.
+tx_writer = BufferedWriter(
+    Transaction.__table__,
+    "ctransactions",
+    max_batch=settings.TX_BATCH_SIZE,
+    flush_seconds=settings.TX_FLUSH_SECONDS,
+    max_pendientes=settings.TX_MAX_PENDING,
+    idempotente=True,
+    journal_dir=settings.TX_JOURNAL_DIR,
+    ejecutar=insertar_transacciones,
+)
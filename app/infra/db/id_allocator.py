@@ -0,0 +1,58 @@
+# app/infra/db/id_allocator.py
+"""
+Preasignación de ids por bloques desde una secuencia de Postgres.
+
+Permite conocer el id de una fila antes de insertarla (escritura diferida):
+se piden N valores con un solo round-trip y se reparten en memoria. Los
+valores no usados al reiniciar el proceso se pierden (huecos), igual que
+con cualquier nextval() de una transacción abortada.
+"""
+import asyncio
+import logging
+from collections import deque
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.infra.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+_STMT_BLOQUE = text("SELECT nextval(CAST(:seq AS regclass)) FROM generate_series(1, :n)")
+
+
+class IdAllocator:
+    def __init__(self, secuencia: str, bloque: int) -> None:
+        self.secuencia = secuencia
+        self.bloque = bloque
+        self._libres: deque[int] = deque()
+        self._lock = asyncio.Lock()
+        self._prefetch: asyncio.Task | None = None
+
+    async def _pedir_bloque(self) -> list[int]:
+        async with engine.connect() as conn:
+            rows = await conn.execute(_STMT_BLOQUE, {"seq": self.secuencia, "n": self.bloque})
+            return [r[0] for r in rows]
+
+    async def _recargar(self) -> None:
+        async with self._lock:
+            if len(self._libres) <= self.bloque // 10:
+                self._libres.extend(await self._pedir_bloque())
+
+    async def siguiente(self) -> int:
+        while not self._libres:
+            await self._recargar()
+        if len(self._libres) < self.bloque // 10 and (
+            self._prefetch is None or self._prefetch.done()
+        ):
+            # Recarga anticipada en segundo plano: ninguna request espera
+            # el round-trip mientras queden ids en el bloque actual.
+            self._prefetch = asyncio.create_task(self._recargar())
+        return self._libres.popleft()
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+tx_ids = IdAllocator("ctransactions_id_seq", settings.TX_ID_BLOCK_SIZE)
@@ -10,7 +10,10 @@ class Card(Base):
 
     id = Column(Integer, primary_key=True)
     pan = Column(String(20), unique=True, nullable=False)
-    account_id = Column(Integer, ForeignKey("caccounts.id"), nullable=False)
+    pan_last_4 = Column(String(4), nullable=False)
+    pan_bin = Column(String(8), nullable=False)
+    # NULL: tarjeta auto-provisionada al recibir un PAN desconocido
+    account_id = Column(Integer, ForeignKey("caccounts.id"), nullable=True)
     pan_token = Column(String(32), unique=True, nullable=False)
     last4 = Column(String(4), nullable=False)
     brand = Column(String(20), nullable=True)
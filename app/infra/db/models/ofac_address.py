@@ -1,7 +1,7 @@
 # app/infra/db/models/ofac_address.py
 
 from sqlalchemy import Column, Integer, String, Text, ForeignKey
-from app.infra.db.base_class import Base
+from app.infra.db.base import Base
 
 
 class OfacAddress(Base):
@@ -14,5 +14,6 @@ class OfacAudit(Base):
     best_score = Column(Float, nullable=False)
     best_name = Column(String(255))
     ent_num = Column(Integer)
+    list_code = Column(String(10))       # SDN | CONS | UN | EU
 
     created_at = Column(DateTime, server_default=func.now())
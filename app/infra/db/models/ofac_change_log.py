@@ -0,0 +1,18 @@
+# app/infra/db/models/ofac_change_log.py
+
+from sqlalchemy import Column, BigInteger, Integer, Text, DateTime, ARRAY
+from sqlalchemy.sql import func
+from app.infra.db.base import Base
+
+
+class OfacChangeLog(Base):
+    __tablename__ = "ofac_change_log"
+
+    id = Column(BigInteger, primary_key=True)
+    synced_at = Column(DateTime, server_default=func.now(), nullable=False)
+    source_hash = Column(Text, nullable=False)
+    lists_hash = Column(Text)  # sólo UN / EU / CONS
+
+    inserted = Column(ARRAY(Integer), nullable=False, default=list)
+    updated = Column(ARRAY(Integer), nullable=False, default=list)
+    deleted = Column(ARRAY(Integer), nullable=False, default=list)
@@ -19,4 +19,7 @@ class OfacEntity(Base):
 
     is_individual = Column(Boolean, default=False)
 
+    # Huella de la entidad + aliases + direcciones (diff incremental del sync)
+    row_hash = Column(String(64))
+
     last_updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
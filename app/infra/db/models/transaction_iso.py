@@ -0,0 +1,29 @@
+# app/infra/db/models/transaction_iso.py
+from sqlalchemy import Column, DDL, DateTime, Integer, event, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.infra.db.base import Base
+
+
+class TransactionIso(Base):
+    """
+    Data elements ISO 8583 poco consultados de una transacción (parte
+    "fría" de ctransactions): sólo los presentes, keyed por número de DE.
+    Se lee bajo demanda; el hot path nunca la consulta.
+    """
+    __tablename__ = "ctransactions_iso"
+
+    tx_id = Column(Integer, primary_key=True)
+    tx_timestamp_utc = Column(DateTime, primary_key=True)
+    des = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+
+    __table_args__ = (
+        {"postgresql_partition_by": "RANGE (tx_timestamp_utc)"},
+    )
+
+
+event.listen(
+    TransactionIso.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS ctransactions_iso_default PARTITION OF ctransactions_iso DEFAULT"),
+)
@@ -0,0 +1,23 @@
+# app/infra/db/models/transaction_replay.py
+from sqlalchemy import Column, DateTime, Integer, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.infra.db.base import Base
+
+
+class TransactionReplay(Base):
+    """
+    Veredictos recientes por mensaje (STAN, TID, DE7). Una retransmisión
+    del adquirente devuelve el veredicto original sin volver a analizarse.
+    La purga por created_at la hace el job de mantenimiento de particiones.
+    """
+    __tablename__ = "ctransactions_replay"
+
+    i_0011_stan = Column(String(6), primary_key=True)
+    i_0041_card_acceptor_tid = Column(String(8), primary_key=True)
+    i_0007_transmission_datetime = Column(String(10), primary_key=True)
+
+    tx_id = Column(Integer, nullable=False)
+    tx_timestamp_utc = Column(DateTime, nullable=False)
+    resultado = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
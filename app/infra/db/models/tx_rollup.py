@@ -0,0 +1,43 @@
+# app/infra/db/models/tx_rollup.py
+from sqlalchemy import Column, BigInteger, Boolean, CHAR, DateTime, DECIMAL, String
+
+from app.infra.db.base import Base
+
+
+class TxRollup(Base):
+    """
+    Conteos y montos de ctransactions por bucket (periodo "H" = hora,
+    "D" = día, UTC) × nivel de riesgo × fraude × moneda. Los nulos se
+    guardan como '' / false para que formen parte de la PK.
+    Lo mantiene app/jobs/ctransactions_rollup.py.
+    """
+    __tablename__ = "ctransactions_rollup"
+
+    periodo = Column(CHAR(1), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    nivel_riesgo = Column(String(10), primary_key=True)
+    es_fraude = Column(Boolean, primary_key=True)
+    moneda = Column(String(3), primary_key=True)
+
+    n = Column(BigInteger, nullable=False, default=0)
+    monto_dop = Column(DECIMAL(20, 2), nullable=False, default=0)
+    monto_src = Column(DECIMAL(20, 2), nullable=False, default=0)
+
+
+class TxRollupFactor(Base):
+    """Ocurrencias de cada factor de riesgo por bucket."""
+    __tablename__ = "ctransactions_rollup_factor"
+
+    periodo = Column(CHAR(1), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    factor = Column(String(80), primary_key=True)
+
+    n = Column(BigInteger, nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    """Hasta dónde (tx_timestamp_utc, exclusivo) están agregadas las filas."""
+    __tablename__ = "rollup_watermark"
+
+    nombre = Column(String(40), primary_key=True)
+    hasta = Column(DateTime, nullable=False)
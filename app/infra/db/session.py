@@ -1,23 +1,127 @@
 # app/infra/db/session.py
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Dict
+from uuid import uuid4
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 from app.infra.db.base import Base
 
 
-engine = create_async_engine(
+# ==========================================================
+#  MÉTRICAS DEL POOL
+# ==========================================================
+
+class MetricasPool:
+    """Esperas por conexión (checkout) acumuladas desde el arranque."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.timeouts = 0
+
+    def registrar(self, espera: float) -> None:
+        self.checkouts += 1
+        self.espera_total += espera
+        if espera > self.espera_max:
+            self.espera_max = espera
+
+
+def _clase_pool(metricas: MetricasPool):
+    """
+    AsyncAdaptedQueuePool que mide cuánto espera cada checkout (incluye
+    abrir la conexión si el pool crece). Se usa una subclase por engine
+    porque pool.recreate() (dispose) no conserva atributos de instancia.
+    """
+    class PoolMedido(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metricas.timeouts += 1
+                raise
+            finally:
+                metricas.registrar(time.perf_counter() - inicio)
+
+    return PoolMedido
+
+
+def _connect_args() -> Dict[str, Any]:
+    """
+    Cache de prepared statements por conexión: el de SQLAlchemy
+    (prepared_statement_cache_size) y el de asyncpg (statement_cache_size).
+    Con DB_STATEMENT_CACHE_SIZE=0 (pgbouncer en modo transaction) se apagan
+    los dos y cada statement se prepara con un nombre único: los nombres
+    secuenciales de asyncpg chocan en las conexiones de servidor que
+    pgbouncer comparte ("prepared statement ... already exists").
+    """
+    args: Dict[str, Any] = {
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    if settings.DB_STATEMENT_CACHE_SIZE == 0:
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return args
+
+
+def _crear_engine(url: str, pool_size: int, max_overflow: int, metricas: MetricasPool) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=_clase_pool(metricas),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
+
+
+# ==========================================================
+#  INSTANCIAS DEL PROCESO
+# ==========================================================
+
+metricas_primario = MetricasPool()
+engine = _crear_engine(
     settings.DATABASE_URL,
-    echo=settings.ENVIRONMENT == "development",
-    future=True,
+    settings.DB_POOL_SIZE,
+    settings.DB_MAX_OVERFLOW,
+    metricas_primario,
 )
 
+# Lecturas de auditoría / historial / reportes: réplica si está
+# configurada; si no, el mismo pool del primario en modo read-only.
+if settings.DATABASE_READ_URL:
+    metricas_lectura = MetricasPool()
+    read_engine = _crear_engine(
+        settings.DATABASE_READ_URL,
+        settings.DB_READ_POOL_SIZE,
+        settings.DB_READ_MAX_OVERFLOW,
+        metricas_lectura,
+    ).execution_options(postgresql_readonly=True)
+else:
+    metricas_lectura = metricas_primario
+    read_engine = engine.execution_options(postgresql_readonly=True)
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
     class_=AsyncSession,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependencia FastAPI para obtener una sesión async."""
@@ -28,6 +132,50 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Sesión de sólo lectura (réplica si DATABASE_READ_URL está definida)."""
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def estado_pool(eng: AsyncEngine, metricas: MetricasPool, max_overflow: int) -> Dict[str, Any]:
+    pool = eng.pool
+    capacidad = pool.size() + max_overflow
+    en_uso = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "checked_out": en_uso,
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(en_uso / capacidad, 3) if capacidad > 0 else 0.0,
+        "checkouts": metricas.checkouts,
+        "wait_avg_ms": round(metricas.espera_total / metricas.checkouts * 1000, 3) if metricas.checkouts else 0.0,
+        "wait_max_ms": round(metricas.espera_max * 1000, 3),
+        "timeouts": metricas.timeouts,
+    }
+
+
+def metricas_pools() -> Dict[str, Any]:
+    return {
+        "primary": estado_pool(engine, metricas_primario, settings.DB_MAX_OVERFLOW),
+        "read": (
+            estado_pool(read_engine, metricas_lectura, settings.DB_READ_MAX_OVERFLOW)
+            if settings.DATABASE_READ_URL else {"shared_with": "primary"}
+        ),
+    }
+
+
+async def cerrar_engines() -> None:
+    """Cierra las conexiones de los pools (un proceso hijo no debe heredarlas)."""
+    await engine.dispose()
+    if settings.DATABASE_READ_URL:
+        await read_engine.dispose()
+
+
 async def init_db() -> None:
     """Crea las tablas (en dev). En prod usa Alembic."""
     async with engine.begin() as conn:
@@ -0,0 +1,271 @@
+# app/infra/db/tx_statements.py
+"""
+Acceso a datos del camino de autorización (SQLAlchemy Core).
+
+Las sentencias se construyen una sola vez al importar el módulo: SQLAlchemy
+memoiza su cache key y reutiliza la forma compilada del engine en cada
+request. Los modelos ORM siguen existiendo para administración/auditoría;
+aquí no se instancian objetos mapeados ni se usa el unit-of-work.
+"""
+import hashlib
+from operator import attrgetter
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infra.db.models.account import Account
+from app.infra.db.models.card import Card
+from app.infra.db.models.country import Country
+from app.infra.db.models.customer import Customer
+from app.infra.db.models.risk_factors import RiskFactor, RiskFactorCritical, RiskFactorRule
+from app.infra.db.models.transaction import Transaction
+from app.infra.db.models.transaction_iso import TransactionIso
+from app.infra.db.models.transaction_replay import TransactionReplay
+from app.schemas.iso_schemas import ISO8583Transaction
+
+TX = Transaction.__table__
+TX_ISO = TransactionIso.__table__
+REPLAY = TransactionReplay.__table__
+CARD = Card.__table__
+ACCOUNT = Account.__table__
+CUSTOMER = Customer.__table__
+
+# Columnas ISO calientes (i_00xx_* de ctransactions) y frías (el resto del
+# schema, guardadas en ctransactions_iso.des con el número de DE como clave)
+COLUMNAS_ISO: Tuple[str, ...] = tuple(c.name for c in TX.columns if c.name.startswith("i_"))
+COLUMNAS_ISO_FRIAS: Tuple[str, ...] = tuple(
+    f for f in ISO8583Transaction.model_fields
+    if f.startswith("i_") and f not in COLUMNAS_ISO
+)
+_DE_FRIOS: Tuple[str, ...] = tuple(str(int(c[2:6])) for c in COLUMNAS_ISO_FRIAS)
+_COLUMNA_POR_DE: Dict[str, str] = dict(zip(_DE_FRIOS, COLUMNAS_ISO_FRIAS))
+
+_valores_iso = attrgetter(*COLUMNAS_ISO)
+_valores_frios = attrgetter(*COLUMNAS_ISO_FRIAS)
+
+
+def columnas_iso(tx: Any) -> Dict[str, Any]:
+    """Columnas ISO calientes del mensaje (None incluido) sin pasar por model_dump()."""
+    return dict(zip(COLUMNAS_ISO, _valores_iso(tx)))
+
+
+def des_frios(tx: Any) -> Dict[str, str]:
+    """Data elements fríos presentes en el mensaje: {"3": "000000", ...}."""
+    return {de: v for de, v in zip(_DE_FRIOS, _valores_frios(tx)) if v is not None}
+
+
+def columnas_desde_des(des: Dict[str, str] | None) -> Dict[str, Any]:
+    """Inverso de des_frios: {"3": ...} → {"i_0003_processing_code": ...}."""
+    return {_COLUMNA_POR_DE[de]: v for de, v in (des or {}).items() if de in _COLUMNA_POR_DE}
+
+
+# ==========================================================
+#  SENTENCIAS DEL HOT PATH
+# ==========================================================
+
+# Tarjeta → cuenta → cliente en un solo round-trip
+SELECT_CONTEXTO_TARJETA = (
+    select(
+        CARD.c.id.label("card_id"),
+        CUSTOMER.c.id.label("customer_id"),
+        CUSTOMER.c.first_name,
+        CUSTOMER.c.last_name,
+    )
+    .select_from(
+        CARD.outerjoin(ACCOUNT, CARD.c.account_id == ACCOUNT.c.id)
+        .outerjoin(CUSTOMER, ACCOUNT.c.customer_id == CUSTOMER.c.id)
+    )
+    .where(CARD.c.pan == bindparam("pan"))
+    .limit(1)
+)
+
+# ON CONFLICT DO NOTHING: el replay del writer diferido no duplica filas
+INSERT_TX = insert(TX).on_conflict_do_nothing()
+INSERT_TX_ISO = insert(TX_ISO).on_conflict_do_nothing()
+
+# Con tx_timestamp_utc → se lee una sola partición
+SELECT_TX_ISO = select(TX_ISO.c.des).where(
+    TX_ISO.c.tx_id == bindparam("tx_id"),
+    TX_ISO.c.tx_timestamp_utc == bindparam("tx_timestamp_utc"),
+)
+
+# Veredicto ya emitido para un mensaje (retransmisión)
+SELECT_REPLAY = select(REPLAY.c.resultado).where(
+    REPLAY.c.i_0011_stan == bindparam("stan"),
+    REPLAY.c.i_0041_card_acceptor_tid == bindparam("tid"),
+    REPLAY.c.i_0007_transmission_datetime == bindparam("dt"),
+    REPLAY.c.created_at >= bindparam("desde"),
+)
+
+# Historial: conteos y promedio agregados en la BD (sin cargar filas)
+SELECT_HISTORIAL = (
+    select(
+        func.count().filter(TX.c.tx_timestamp_utc >= bindparam("hace_24h")).label("tx_24h"),
+        func.count().filter(TX.c.tx_timestamp_utc >= bindparam("hace_7d")).label("tx_7d"),
+        func.avg(TX.c.monto_dop_calculado).label("promedio_30d"),
+    )
+    .select_from(
+        TX.join(CARD, TX.c.card_id == CARD.c.id)
+        .join(ACCOUNT, CARD.c.account_id == ACCOUNT.c.id)
+    )
+    .where(ACCOUNT.c.customer_id == bindparam("customer_id"))
+    .where(TX.c.tx_timestamp_utc >= bindparam("hace_30d"))
+)
+
+# Configuración de riesgo (se cachea con TTL en el servicio)
+SELECT_PAISES_RIESGO = select(Country.iso2, Country.risk_level)
+SELECT_RISK_FACTORS = select(RiskFactor.code, RiskFactor.weight).where(
+    RiskFactor.enabled == True
+)
+SELECT_RISK_CRITICAL = select(RiskFactorCritical.factor_code)
+SELECT_RISK_RULES = select(
+    RiskFactorRule.trigger_factors,
+    RiskFactorRule.result_factor,
+    RiskFactorRule.weight_override,
+    RiskFactorRule.enabled,
+)
+
+# Catálogo code ↔ id (todos, habilitados o no) para ctransactions.factores_ids
+RISK_FACTOR = RiskFactor.__table__
+SELECT_CATALOGO_FACTORES = select(RISK_FACTOR.c.id, RISK_FACTOR.c.code)
+SELECT_FACTORES_POR_CODIGO = select(RISK_FACTOR.c.id, RISK_FACTOR.c.code).where(
+    RISK_FACTOR.c.code.in_(bindparam("codes", expanding=True))
+)
+# Códigos emitidos por el motor que aún no están en risk_factors: alta
+# informativa (peso 0, deshabilitado) sólo para obtener un id estable
+INSERT_FACTORES_AUTO = (
+    insert(RISK_FACTOR)
+    .on_conflict_do_nothing(index_elements=[RISK_FACTOR.c.code])
+    .returning(RISK_FACTOR.c.id, RISK_FACTOR.c.code)
+)
+
+
+# ==========================================================
+#  ESCRITURA (fila caliente + data elements fríos)
+# ==========================================================
+
+# Reclama la clave del mensaje; RETURNING sólo trae las que no existían
+INSERT_REPLAY = (
+    insert(REPLAY)
+    .on_conflict_do_nothing()
+    .returning(
+        REPLAY.c.i_0011_stan,
+        REPLAY.c.i_0041_card_acceptor_tid,
+        REPLAY.c.i_0007_transmission_datetime,
+    )
+)
+
+# Tarjetas de PAN desconocido: alta mínima sin cuenta (ver sql/02_triggers.sql)
+INSERT_TARJETAS_AUTO = (
+    insert(CARD)
+    .on_conflict_do_nothing(index_elements=[CARD.c.pan])
+    .returning(CARD.c.id, CARD.c.pan)
+)
+SELECT_TARJETAS_POR_PAN = select(CARD.c.id, CARD.c.pan).where(
+    CARD.c.pan.in_(bindparam("pans", expanding=True))
+)
+
+
+def tarjeta_auto(pan: str) -> Dict[str, Any]:
+    return {
+        "pan": pan,
+        "pan_last_4": pan[-4:],
+        "pan_bin": pan[:6],
+        "last4": pan[-4:],
+        "pan_token": hashlib.sha256(pan.encode("utf-8")).hexdigest()[:32],
+        "brand": "UNKNOWN",
+        "status": "auto",
+        "account_id": None,
+    }
+
+
+async def resolver_tarjetas(conn, filas: List[Dict[str, Any]]) -> None:
+    """
+    Completa card_id de las filas que no lo traen (PAN desconocido en el
+    momento del análisis): un upsert en bloque para todos los PAN del lote
+    y un SELECT para los que ya existían o creó otra sesión.
+    """
+    pendientes = [f for f in filas if f.get("card_id") is None and f.get("i_0002_pan")]
+    if not pendientes:
+        return
+
+    pans = sorted({f["i_0002_pan"] for f in pendientes})
+    ids = {
+        r.pan: r.id
+        for r in await conn.execute(INSERT_TARJETAS_AUTO, [tarjeta_auto(p) for p in pans])
+    }
+    faltantes = [p for p in pans if p not in ids]
+    if faltantes:
+        ids.update(
+            (r.pan, r.id)
+            for r in await conn.execute(SELECT_TARJETAS_POR_PAN, {"pans": faltantes})
+        )
+
+    for f in pendientes:
+        f["card_id"] = ids.get(f["i_0002_pan"])
+
+
+async def insertar_transacciones(conn, filas: List[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
+    """
+    Inserta un lote de transacciones. Cada fila trae las columnas de
+    ctransactions (id ya preasignado) más "des" con los DE fríos y,
+    opcionalmente, "replay" con el veredicto para ctransactions_replay;
+    todo se escribe en la misma transacción de `conn`. Las tarjetas de
+    PAN desconocido se dan de alta en bloque antes del insert.
+
+    Las filas cuyo mensaje (STAN, TID, DE7) ya estaba registrado no se
+    insertan: son retransmisiones analizadas en paralelo por otro worker.
+    Devuelve esas claves duplicadas.
+    """
+    calientes = []
+    replays = []
+    for fila in filas:
+        fila = dict(fila)
+        replay = fila.pop("replay", None)
+        clave = None
+        if replay:
+            # id / timestamp de la fila ya rehidratada (replay del journal)
+            replay = {**replay, "tx_id": fila["id"], "tx_timestamp_utc": fila["tx_timestamp_utc"]}
+            replays.append(replay)
+            clave = (
+                replay["i_0011_stan"],
+                replay["i_0041_card_acceptor_tid"],
+                replay["i_0007_transmission_datetime"],
+            )
+        calientes.append((clave, fila))
+
+    duplicadas: List[Tuple[str, str, str]] = []
+    if replays:
+        nuevas = {tuple(r) for r in await conn.execute(INSERT_REPLAY, replays)}
+        aceptadas = []
+        for clave, fila in calientes:
+            if clave is None:
+                aceptadas.append((clave, fila))
+            elif clave in nuevas:
+                # Una sola fila por clave aunque el lote traiga repetidas
+                nuevas.discard(clave)
+                aceptadas.append((clave, fila))
+            else:
+                duplicadas.append(clave)
+        calientes = aceptadas
+        if not calientes:
+            return duplicadas
+
+    filas_tx = []
+    frias = []
+    for _, fila in calientes:
+        des = fila.pop("des", None)
+        filas_tx.append(fila)
+        if des:
+            frias.append({
+                "tx_id": fila["id"],
+                "tx_timestamp_utc": fila["tx_timestamp_utc"],
+                "des": des,
+            })
+
+    await resolver_tarjetas(conn, filas_tx)
+    await conn.execute(INSERT_TX, filas_tx)
+    if frias:
+        await conn.execute(INSERT_TX_ISO, frias)
+    return duplicadas
@@ -14,8 +14,9 @@ from app.infra.cache.risk_factor_cache import RiskConfig
 #  CONFIGURACIÓN MODELO DE ANOMALÍAS (IsolationForest)
 # ==========================================================
 
-# ⚠️ El modelo se inicializa globalmente, pero puedes re-entrenarlo
-# con datos reales usando la función `entrenar_isolation_forest`
+# Modelo global del proceso: `cargar_modelo` lo entrena (precarga del
+# servidor, antes del fork); se re-entrena con datos reales usando
+# `entrenar_isolation_forest`
 _isoforest: IsolationForest | None = None
 
 
@@ -204,13 +205,9 @@ def analizar(
       - customer_hash (string)
       - timestamp (ISO8601)
     """
-    global _isoforest
-
     if _isoforest is None:
-        # Fallback minimalista si alguien llama a analizar sin entrenar nada.
-        # Idealmente deberías llamar a `entrenar_isolation_forest` al arrancar.
-        df_fallback = generar_dataset_sintetico_basico()
-        entrenar_isolation_forest(df_fallback)
+        # Fallback si el proceso no pasó por la precarga (dev, scripts)
+        cargar_modelo()
 
     # 1) IsolationForest: sólo usa monto_dop y hora_local (normalizados a DOP)
     X = np.array([[monto_dop, hora_local]])
@@ -456,11 +453,11 @@ def entrenar_isolation_forest(
     return modelo
 
 
-# Inicialización por defecto al importar el módulo
-# (puedes quitar esto si prefieres entrenar siempre afuera)
-try:
-    _df_init = generar_dataset_sintetico_basico()
-    entrenar_isolation_forest(_df_init)
-except Exception:
-    # En caso de error, dejamos _isoforest = None para que analizar() lo gestione
-    _isoforest = None
+def cargar_modelo() -> IsolationForest:
+    """
+    Modelo del proceso: lo entrena con el dataset sintético base si todavía
+    no hay uno. Lo llama la precarga del servidor (app.main.precargar).
+    """
+    if _isoforest is None:
+        return entrenar_isolation_forest(generar_dataset_sintetico_basico())
+    return _isoforest
@@ -1,6 +1,201 @@
 # app/infra/detectors/iso_parser.py
 """
-Placeholder: si en el futuro recibes ISO crudo (bitmap + campos),
-aquí puedes implementar un parser → ISO8583Transaction.
-Por ahora el frontend ya envía el JSON parseado, así que no se usa.
+Parser / encoder de mensajes ISO 8583 (versión 1987, ASCII) crudos.
+
+    MTI (4) | bitmap primario (8 bytes) [| secundario (8)] | DE2 ... DE128
+
+- Bitmap binario (por defecto) o en hex ASCII (16/32 caracteres).
+- DE fijos, LLVAR y LLLVAR (largos en dígitos ASCII); los DE binarios
+  (b64: PIN, MAC) se devuelven en hex.
+- La tabla SPEC se arma una vez al importar: por número de DE, el campo de
+  ISO8583Transaction y su formato. Los DE 105–128 (no están en el schema)
+  se recorren para validar el encuadre pero no se devuelven.
+
+El mensaje se recorre con un memoryview: los largos se leen byte a byte y
+cada valor se decodifica directo del buffer, sin copias intermedias.
+
+El resultado es un dict con los nombres de ISO8583Transaction (sólo los DE
+presentes), apto para ISO8583Transaction(**campos) o ISO8583Rapido(campos).
 """
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.iso_schemas import ISO8583Transaction
+
+# Formatos: FIJO = largo exacto; LLVAR/LLLVAR = prefijo de 2/3 dígitos con
+# el largo (máximo indicado); BINARIO = bytes exactos, se devuelve en hex
+FIJO, LLVAR, LLLVAR, BINARIO = 0, 2, 3, -1
+
+_FORMATOS: Dict[int, Tuple[int, int]] = {
+    2: (LLVAR, 19), 3: (FIJO, 6), 4: (FIJO, 12), 5: (FIJO, 12),
+    6: (FIJO, 12), 7: (FIJO, 10), 8: (FIJO, 8), 9: (FIJO, 8),
+    10: (FIJO, 8), 11: (FIJO, 6), 12: (FIJO, 6), 13: (FIJO, 4),
+    14: (FIJO, 4), 15: (FIJO, 4), 16: (FIJO, 4), 17: (FIJO, 4),
+    18: (FIJO, 4), 19: (FIJO, 3), 20: (FIJO, 3), 21: (FIJO, 3),
+    22: (FIJO, 3), 23: (FIJO, 3), 24: (FIJO, 3), 25: (FIJO, 2),
+    26: (FIJO, 2), 27: (FIJO, 1), 28: (FIJO, 9), 29: (FIJO, 9),
+    30: (FIJO, 9), 31: (FIJO, 9), 32: (LLVAR, 11), 33: (LLVAR, 11),
+    34: (LLVAR, 28), 35: (LLVAR, 37), 36: (LLLVAR, 104), 37: (FIJO, 12),
+    38: (FIJO, 6), 39: (FIJO, 2), 40: (FIJO, 3), 41: (FIJO, 8),
+    42: (FIJO, 15), 43: (FIJO, 40), 44: (LLVAR, 25), 45: (LLVAR, 76),
+    46: (LLLVAR, 999), 47: (LLLVAR, 999), 48: (LLLVAR, 999), 49: (FIJO, 3),
+    50: (FIJO, 3), 51: (FIJO, 3), 52: (BINARIO, 8), 53: (FIJO, 16),
+    54: (LLLVAR, 120), 55: (LLLVAR, 999), 56: (LLLVAR, 999), 57: (LLLVAR, 999),
+    58: (LLLVAR, 999), 59: (LLLVAR, 999), 60: (LLLVAR, 999), 61: (LLLVAR, 999),
+    62: (LLLVAR, 999), 63: (LLLVAR, 999), 64: (BINARIO, 8), 65: (FIJO, 1),
+    66: (FIJO, 1), 67: (FIJO, 2), 68: (FIJO, 3), 69: (FIJO, 3),
+    70: (FIJO, 3), 71: (FIJO, 4), 72: (FIJO, 4), 73: (FIJO, 6),
+    74: (FIJO, 10), 75: (FIJO, 10), 76: (FIJO, 10), 77: (FIJO, 10),
+    78: (FIJO, 10), 79: (FIJO, 10), 80: (FIJO, 10), 81: (FIJO, 10),
+    82: (FIJO, 12), 83: (FIJO, 12), 84: (FIJO, 12), 85: (FIJO, 12),
+    86: (FIJO, 16), 87: (FIJO, 16), 88: (FIJO, 16), 89: (FIJO, 16),
+    90: (FIJO, 42), 91: (FIJO, 1), 92: (FIJO, 2), 93: (FIJO, 5),
+    94: (FIJO, 7), 95: (FIJO, 42), 96: (BINARIO, 8), 97: (FIJO, 16),
+    98: (FIJO, 25), 99: (LLVAR, 11), 100: (LLVAR, 11), 101: (LLVAR, 17),
+    102: (LLVAR, 28), 103: (LLVAR, 28), 104: (LLLVAR, 100),
+    **{de: (LLLVAR, 999) for de in range(105, 128)},
+    128: (BINARIO, 8),
+}
+
+_CAMPO_POR_DE: Dict[int, str] = {
+    int(f[2:6]): f for f in ISO8583Transaction.model_fields if f.startswith("i_")
+}
+
+# SPEC[de] = (campo de ISO8583Transaction o None, formato, largo)
+SPEC: Tuple[Optional[Tuple[Optional[str], int, int]], ...] = tuple(
+    (_CAMPO_POR_DE.get(de), *_FORMATOS[de]) if de in _FORMATOS else None
+    for de in range(129)
+)
+_DE_POR_CAMPO: Dict[str, int] = {c: de for de, c in _CAMPO_POR_DE.items() if de in _FORMATOS}
+
+# _BITS[byte] = posiciones (0–7, desde el bit más significativo) encendidas
+_BITS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(i for i in range(8) if b & (0x80 >> i)) for b in range(256)
+)
+
+
+class MensajeIsoInvalido(ValueError):
+    def __init__(self, mensaje: str, de: int | None = None):
+        super().__init__(f"DE{de}: {mensaje}" if de is not None else mensaje)
+        self.de = de
+
+
+def _des_presentes(bitmap: memoryview) -> List[int]:
+    des = []
+    for i, byte in enumerate(bitmap):
+        base = i * 8 + 1
+        for bit in _BITS[byte]:
+            des.append(base + bit)
+    return des
+
+
+def _largo_variable(mv: memoryview, pos: int, digitos: int, de: int) -> int:
+    if pos + digitos > len(mv):
+        raise MensajeIsoInvalido("mensaje truncado en el largo", de)
+    n = 0
+    for b in mv[pos:pos + digitos]:
+        if not 48 <= b <= 57:
+            raise MensajeIsoInvalido("largo no numérico", de)
+        n = n * 10 + b - 48
+    return n
+
+
+def _bitmap(mv: memoryview, bitmap_binario: bool) -> Tuple[memoryview, int]:
+    """(bitmap primario[+secundario] en binario, posición del DE2)."""
+    if bitmap_binario:
+        if len(mv) < 12:
+            raise MensajeIsoInvalido("mensaje truncado en el bitmap")
+        fin = 20 if mv[4] & 0x80 else 12
+        if len(mv) < fin:
+            raise MensajeIsoInvalido("mensaje truncado en el bitmap secundario")
+        return mv[4:fin], fin
+
+    if len(mv) < 20:
+        raise MensajeIsoInvalido("mensaje truncado en el bitmap")
+    fin = 36 if _hex(mv[4:6])[0] & 0x80 else 20
+    if len(mv) < fin:
+        raise MensajeIsoInvalido("mensaje truncado en el bitmap secundario")
+    return memoryview(_hex(mv[4:fin])), fin
+
+
+def _hex(mv: memoryview) -> bytes:
+    try:
+        return bytes.fromhex(str(mv, "ascii"))
+    except (UnicodeDecodeError, ValueError):
+        raise MensajeIsoInvalido("bitmap hex inválido")
+
+
+def parsear(mensaje: bytes | bytearray | memoryview, bitmap_binario: bool = True) -> Dict[str, str]:
+    """Mensaje ISO 8583 crudo (sin el prefijo de largo) → campos de ISO8583Transaction."""
+    mv = memoryview(mensaje)
+    if len(mv) < 4:
+        raise MensajeIsoInvalido("mensaje truncado en el MTI")
+
+    bitmap, pos = _bitmap(mv, bitmap_binario)
+    campos: Dict[str, str] = {
+        "mti": str(mv[0:4], "latin-1"),
+        "bitmap": bitmap.hex().upper(),
+    }
+    total = len(mv)
+
+    for de in _des_presentes(bitmap):
+        if de == 1:
+            continue  # bitmap secundario, ya leído
+        spec = SPEC[de]
+        if spec is None:
+            raise MensajeIsoInvalido("DE no soportado", de)
+        campo, formato, largo = spec
+
+        if formato > 0:
+            n = _largo_variable(mv, pos, formato, de)
+            pos += formato
+            if n > largo:
+                raise MensajeIsoInvalido(f"largo {n} > {largo}", de)
+        else:
+            n = largo
+        fin = pos + n
+        if fin > total:
+            raise MensajeIsoInvalido("mensaje truncado", de)
+
+        if campo is not None:
+            if formato == BINARIO:
+                campos[campo] = mv[pos:fin].hex().upper()
+            else:
+                campos[campo] = str(mv[pos:fin], "latin-1")
+        pos = fin
+
+    if pos != total:
+        raise MensajeIsoInvalido(f"{total - pos} bytes sobrantes después del último DE")
+    return campos
+
+
+def codificar(campos: Dict[str, Any], bitmap_binario: bool = True) -> bytes:
+    """Inverso de parsear: campos de ISO8583Transaction (None = ausente) → bytes."""
+    des = sorted(
+        de for campo, de in _DE_POR_CAMPO.items() if campos.get(campo) is not None
+    )
+    bits = 0
+    for de in des:
+        bits |= 1 << (128 - de)
+    if des and des[-1] > 64:
+        bits |= 1 << 127
+        bitmap = bits.to_bytes(16, "big")
+    else:
+        bitmap = (bits >> 64).to_bytes(8, "big")
+
+    mti = campos["mti"]
+    if len(mti) != 4:
+        raise MensajeIsoInvalido("MTI debe tener 4 caracteres")
+    partes = [mti.encode("latin-1"), bitmap if bitmap_binario else bitmap.hex().upper().encode("ascii")]
+
+    for de in des:
+        campo, formato, largo = SPEC[de]
+        valor = campos[campo]
+        datos = bytes.fromhex(valor) if formato == BINARIO else str(valor).encode("latin-1")
+        if formato > 0:
+            if len(datos) > largo:
+                raise MensajeIsoInvalido(f"largo {len(datos)} > {largo}", de)
+            partes.append(b"%0*d" % (formato, len(datos)))
+        elif len(datos) != largo:
+            raise MensajeIsoInvalido(f"largo {len(datos)} != {largo}", de)
+        partes.append(datos)
+    return b"".join(partes)
@@ -4,11 +4,11 @@ OFAC_FULL_WEIGHT = 1.0
 OFAC_PARTIAL_WEIGHT = 0.7
 OFAC_CLEAR_WEIGHT = 0.0
 
-async def aplicar_factor_ofac(db, cliente, contexto_riesgo):
+async def aplicar_factor_ofac(db, cliente, contexto_riesgo, pais=None, ciudad=None):
     full_name = f"{cliente.first_name} {cliente.last_name}".strip()
 
     try:
-        result = await screen_person_ofac(db, full_name)
+        result = await screen_person_ofac(db, full_name, pais=pais, ciudad=ciudad)
     except Exception as e:
         # Log y fallback seguro
         contexto_riesgo["factors"].append({
@@ -43,6 +43,8 @@ async def aplicar_factor_ofac(db, cliente, contexto_riesgo):
                 "name_match": best_name,
                 "score_match": best_score,
                 "ent_num": ent_num,
+                "list": result.get("list", "SDN"),
+                "geo_match": result.get("geo_match", False),
             },
             "weight": OFAC_FULL_WEIGHT,
             "recomended_action": "AUTOMATIC_BLOCK_AND_REPORT"
@@ -56,6 +58,8 @@ async def aplicar_factor_ofac(db, cliente, contexto_riesgo):
                 "name_match": best_name,
                 "score_match": best_score,
                 "ent_num": ent_num,
+                "list": result.get("list", "SDN"),
+                "geo_match": result.get("geo_match", False),
             },
             "weight": OFAC_PARTIAL_WEIGHT,
             "recomended_action": "MANUAL_REVIEW"
@@ -0,0 +1,123 @@
+# app/infra/feeds/stream_source.py
+"""
+Lectura incremental de archivos publicados (listas de sanciones, etc.).
+
+Una "fuente" es un string:
+  - https://... / http://...     → descarga HTTP por chunks
+  - /ruta/archivo.csv            → archivo local (también file:///ruta)
+  - /ruta/archivo.csv.gz         → gzip local
+  - /ruta/paquete.zip!sdn.csv    → miembro dentro de un zip
+
+Las filas se parsean mientras se leen los bytes, así que descarga y parseo
+se solapan y la memoria queda acotada al tamaño del chunk.
+"""
+import csv
+import gzip
+import io
+import logging
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkStream(io.RawIOBase):
+    """Adapta un iterador de chunks (bytes) a un stream binario legible."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pendiente = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pendiente:
+            try:
+                self._pendiente = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._pendiente))
+        b[:n] = self._pendiente[:n]
+        self._pendiente = self._pendiente[n:]
+        return n
+
+
+class _DigestStream(io.RawIOBase):
+    """Stream que actualiza un hash con cada bloque leído."""
+
+    def __init__(self, src: BinaryIO, digest):
+        self._src = src
+        self._digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._src.read(len(b))
+        if not data:
+            return 0
+        n = len(data)
+        b[:n] = data
+        self._digest.update(data)
+        return n
+
+
+def es_remota(spec: str) -> bool:
+    return spec.startswith(("http://", "https://"))
+
+
+@contextmanager
+def abrir_fuente(spec: str, chunk_size: int = CHUNK_SIZE) -> Iterator[BinaryIO]:
+    """Abre la fuente como stream binario, sin cargarla completa en memoria."""
+    if es_remota(spec):
+        logger.info(f"Descargando (stream) {spec}")
+        with requests.get(spec, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            yield io.BufferedReader(
+                _ChunkStream(resp.iter_content(chunk_size)), chunk_size
+            )
+        return
+
+    ruta = spec[len("file://"):] if spec.startswith("file://") else spec
+    logger.info(f"Leyendo fuente local {ruta}")
+
+    if "!" in ruta:
+        archivo, miembro = ruta.split("!", 1)
+        with zipfile.ZipFile(archivo) as zf, zf.open(miembro) as f:
+            yield f
+    elif ruta.endswith(".gz"):
+        with gzip.open(ruta, "rb") as f:
+            yield f
+    else:
+        with open(ruta, "rb") as f:
+            yield f
+
+
+def hashear_fuente(spec: str, digest, chunk_size: int = CHUNK_SIZE) -> None:
+    """Actualiza `digest` (hashlib) con los bytes de la fuente, por chunks."""
+    with abrir_fuente(spec, chunk_size) as raw:
+        while chunk := raw.read(chunk_size):
+            digest.update(chunk)
+
+
+def leer_csv(
+    spec: str,
+    digest=None,
+    encoding: str = "latin-1",
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[list[str]]:
+    """
+    Itera las filas CSV de una fuente a medida que llegan.
+    Si se pasa `digest` (hashlib), se actualiza con los bytes crudos.
+    """
+    with abrir_fuente(spec, chunk_size) as raw:
+        if digest is not None:
+            raw = io.BufferedReader(_DigestStream(raw, digest), chunk_size)
+        texto = io.TextIOWrapper(raw, encoding=encoding, newline="")
+        yield from csv.reader(texto)
@@ -0,0 +1,361 @@
+# app/jobs/ctransactions_export.py
+"""
+Exportación columnar de ctransactions para analítica y reentrenamiento.
+
+  - Lee la BD por bloques con un cursor del lado del servidor (psycopg2,
+    stream_results) y escribe un archivo por día:
+        {dir}/fecha=YYYY-MM-DD/part-{primer_id}.parquet   (o .arrow)
+  - Columnas tipadas: montos DECIMAL → float64 (NaN si nulo), factores
+    como list<string> y list<int16> (ids), timestamps en microsegundos. El PAN no se exporta.
+  - Incremental por orden de inserción: la marca de agua (inserted_at, id)
+    de la última fila exportada se guarda en {dir}/_watermark.json al
+    publicar los archivos. Las filas que el write-behind reenvía tarde
+    (spill / journal) traen un tx_timestamp_utc viejo pero un inserted_at
+    nuevo: salen en la corrida siguiente, en un part- más de su día. Se
+    deja un margen (TX_EXPORT_SETTLE_SECONDS) para inserts sin confirmar.
+
+`cargar_columnas` / `dataset_entrenamiento` mapean los archivos en
+memoria (Arrow IPC sin copia) y devuelven arrays NumPy / el DataFrame
+que espera `entrenar_isolation_forest`.
+
+    python -m app.jobs.ctransactions_export [--format arrow] [--full]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, select, tuple_
+
+from app.core.config import settings
+from app.infra.db.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+TX = Transaction.__table__
+
+EXTENSIONES = {"parquet": ".parquet", "arrow": ".arrow"}
+WATERMARK = "_watermark.json"
+
+COLUMNAS = (
+    TX.c.id,
+    TX.c.tx_timestamp_utc,
+    TX.c.inserted_at,
+    TX.c.card_id,
+    TX.c.mti,
+    TX.c.i_0004_amount_transaction,
+    TX.c.i_0049_currency_code_tx,
+    TX.c.i_0018_merchant_type_mcc,
+    TX.c.i_0042_card_acceptor_mid,
+    TX.c.i_0041_card_acceptor_tid,
+    TX.c.i_0012_time_local,
+    TX.c.monto_dop_calculado,
+    TX.c.es_fraude,
+    TX.c.probabilidad_fraude,
+    TX.c.nivel_riesgo,
+    TX.c.factores_riesgo,
+    TX.c.factores_ids,
+    TX.c.historial_tx_24h,
+    TX.c.historial_tx_7d,
+    TX.c.monto_promedio_30d,
+    TX.c.merchant_permitido,
+    TX.c.mcc_permitido,
+)
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("tx_timestamp_utc", pa.timestamp("us")),
+    ("inserted_at", pa.timestamp("us")),
+    ("card_id", pa.int64()),
+    ("mti", pa.string()),
+    ("monto_src", pa.float64()),
+    ("moneda", pa.string()),
+    ("mcc", pa.string()),
+    ("mid", pa.string()),
+    ("tid", pa.string()),
+    ("hora_local", pa.int8()),          # -1 si el mensaje no trae DE12
+    ("monto_dop", pa.float64()),
+    ("es_fraude", pa.bool_()),
+    ("probabilidad_fraude", pa.float64()),
+    ("nivel_riesgo", pa.string()),
+    ("factores", pa.list_(pa.string())),
+    ("factores_ids", pa.list_(pa.int16())),
+    ("historial_tx_24h", pa.int32()),
+    ("historial_tx_7d", pa.int32()),
+    ("monto_promedio_30d", pa.float64()),
+    ("merchant_permitido", pa.bool_()),
+    ("mcc_permitido", pa.bool_()),
+])
+
+
+# ==========================================================
+#  FILAS → RECORD BATCH
+# ==========================================================
+
+def _float(v: Any) -> float:
+    return float(v) if v is not None else math.nan
+
+
+def _monto_src(v: Optional[str]) -> float:
+    # DE4 en unidades menores (12 dígitos)
+    try:
+        return int(v) / 100 if v else math.nan
+    except ValueError:
+        return math.nan
+
+
+def _hora(v: Optional[str]) -> int:
+    return int(v[:2]) if v and v[:2].isdigit() else -1
+
+
+def lote_arrow(filas: Sequence[Any]) -> pa.RecordBatch:
+    (ids, ts, insertado, cards, mti, de4, moneda, mcc, mid, tid, de12, monto_dop, fraude,
+     prob, nivel, factores, factores_ids, h24, h7, prom30, merch_ok, mcc_ok) = zip(*filas)
+    columnas = [
+        ids,
+        ts,
+        insertado,
+        cards,
+        mti,
+        [_monto_src(v) for v in de4],
+        moneda,
+        mcc,
+        mid,
+        tid,
+        [_hora(v) for v in de12],
+        [_float(v) for v in monto_dop],
+        [bool(v) for v in fraude],
+        [_float(v) for v in prob],
+        nivel,
+        [v.split(",") if v else [] for v in factores],
+        [v or [] for v in factores_ids],
+        h24,
+        h7,
+        [_float(v) for v in prom30],
+        merch_ok,
+        mcc_ok,
+    ]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(c, type=f.type) for c, f in zip(columnas, SCHEMA)],
+        schema=SCHEMA,
+    )
+
+
+# ==========================================================
+#  MARCA DE AGUA
+# ==========================================================
+
+def leer_watermark(directorio: Path) -> Optional[Tuple[datetime, int]]:
+    ruta = directorio / WATERMARK
+    if not ruta.exists():
+        return None
+    data = json.loads(ruta.read_text())
+    return datetime.fromisoformat(data["inserted_at"]), int(data["id"])
+
+
+def guardar_watermark(directorio: Path, ts: datetime, tx_id: int) -> None:
+    tmp = directorio / (WATERMARK + ".tmp")
+    tmp.write_text(json.dumps({"inserted_at": ts.isoformat(), "id": tx_id}))
+    os.replace(tmp, directorio / WATERMARK)
+
+
+# ==========================================================
+#  ESCRITURA POR DÍA
+# ==========================================================
+
+class ArchivoDia:
+    """Un archivo por día; se escribe con sufijo .tmp y se publica al cerrar."""
+
+    def __init__(self, directorio: Path, dia: date, primer_id: int, formato: str):
+        carpeta = directorio / f"fecha={dia.isoformat()}"
+        carpeta.mkdir(parents=True, exist_ok=True)
+        self.dia = dia
+        self.ruta = carpeta / f"part-{primer_id:012d}{EXTENSIONES[formato]}"
+        self.tmp = self.ruta.with_name(self.ruta.name + ".tmp")
+        self.filas = 0
+        if formato == "parquet":
+            self._writer = pq.ParquetWriter(self.tmp, SCHEMA, compression="zstd")
+        else:
+            # IPC sin compresión: el loader lo mapea sin copiar
+            self._sink = pa.OSFile(str(self.tmp), "wb")
+            self._writer = pa.ipc.new_file(self._sink, SCHEMA)
+
+    def escribir(self, lote: pa.RecordBatch) -> None:
+        self._writer.write_batch(lote)
+        self.filas += lote.num_rows
+
+    def _cerrar_writer(self) -> None:
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+    def cerrar(self) -> None:
+        self._cerrar_writer()
+        os.replace(self.tmp, self.ruta)
+        logger.info(f"{self.ruta}: {self.filas} filas")
+
+    def descartar(self) -> None:
+        self._cerrar_writer()
+        self.tmp.unlink(missing_ok=True)
+
+
+def _tramos_insercion(filas: Sequence[Any]) -> Iterable[Sequence[Any]]:
+    """Divide un bloque ordenado por inserted_at en tramos del mismo día de inserción."""
+    inicio = 0
+    for i in range(1, len(filas) + 1):
+        if i == len(filas) or filas[i].inserted_at.date() != filas[inicio].inserted_at.date():
+            yield filas[inicio:i]
+            inicio = i
+
+
+def _por_dia(filas: Sequence[Any]) -> Iterable[Tuple[date, List[Any]]]:
+    """Agrupa por día de tx_timestamp_utc (los reenvíos tardíos caen en días viejos)."""
+    dias: Dict[date, List[Any]] = {}
+    for fila in filas:
+        dias.setdefault(fila.tx_timestamp_utc.date(), []).append(fila)
+    return dias.items()
+
+
+def run(
+    directorio: str | None = None,
+    formato: str | None = None,
+    completo: bool = False,
+    db_url: str | None = None,
+    ahora: datetime | None = None,
+) -> int:
+    """Exporta las filas nuevas desde la marca de agua. Devuelve cuántas."""
+    formato = formato or settings.TX_EXPORT_FORMAT
+    if formato not in EXTENSIONES:
+        raise ValueError(f"Formato de exportación inválido: {formato}")
+    destino = Path(directorio or settings.TX_EXPORT_DIR)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    corte = (ahora or datetime.utcnow()) - timedelta(seconds=settings.TX_EXPORT_SETTLE_SECONDS)
+    stmt = (
+        select(*COLUMNAS)
+        .where(TX.c.inserted_at < corte)
+        .order_by(TX.c.inserted_at, TX.c.id)
+    )
+    marca = None if completo else leer_watermark(destino)
+    if marca:
+        stmt = stmt.where(tuple_(TX.c.inserted_at, TX.c.id) > tuple_(*marca))
+        logger.info(f"Exportando desde la marca de agua {marca[0].isoformat()} / {marca[1]}")
+
+    engine = create_engine(db_url or settings.OFAC_SYNC_DATABASE_URL, future=True)
+    chunk = settings.TX_EXPORT_CHUNK_ROWS
+    total = 0
+    # Un archivo abierto por día de tx_timestamp_utc; se publican todos
+    # juntos (y se avanza la marca) al cambiar el día de inserción
+    abiertos: Dict[date, ArchivoDia] = {}
+    ultima = None
+
+    def publicar() -> None:
+        for archivo in abiertos.values():
+            archivo.cerrar()
+        abiertos.clear()
+        guardar_watermark(destino, ultima.inserted_at, ultima.id)
+
+    with engine.connect() as conn:
+        # psycopg2 + stream_results → cursor con nombre (memoria constante)
+        resultado = conn.execution_options(stream_results=True, max_row_buffer=chunk).execute(stmt)
+        try:
+            for bloque in resultado.partitions(chunk):
+                for tramo in _tramos_insercion(bloque):
+                    if ultima is not None and ultima.inserted_at.date() != tramo[0].inserted_at.date():
+                        publicar()
+                    for dia, filas in _por_dia(tramo):
+                        if dia not in abiertos:
+                            abiertos[dia] = ArchivoDia(destino, dia, filas[0].id, formato)
+                        abiertos[dia].escribir(lote_arrow(filas))
+                    ultima = tramo[-1]
+                    total += len(tramo)
+            if abiertos:
+                publicar()
+        finally:
+            # Error a mitad de un día de inserción: no se publica y la marca
+            # de agua queda en el último día completo
+            for archivo in abiertos.values():
+                archivo.descartar()
+
+    logger.info(f"Exportación completada: {total} filas ({formato})")
+    return total
+
+
+# ==========================================================
+#  LOADER (mmap → NumPy)
+# ==========================================================
+
+def archivos(directorio: str | None = None, desde: date | None = None, hasta: date | None = None) -> List[Path]:
+    """Archivos publicados en [desde, hasta] (por carpeta fecha=)."""
+    base = Path(directorio or settings.TX_EXPORT_DIR)
+    rutas = []
+    for carpeta in sorted(base.glob("fecha=*")):
+        dia = date.fromisoformat(carpeta.name.split("=", 1)[1])
+        if (desde and dia < desde) or (hasta and dia > hasta):
+            continue
+        rutas += sorted(p for p in carpeta.iterdir() if p.suffix in EXTENSIONES.values())
+    return rutas
+
+
+def _leer_tabla(ruta: Path, columnas: Sequence[str]) -> pa.Table:
+    if ruta.suffix == ".arrow":
+        # Buffers apuntan al mapa: sin copia hasta que se combinen
+        return pa.ipc.open_file(pa.memory_map(str(ruta), "r")).read_all().select(list(columnas))
+    return pq.read_table(ruta, columns=list(columnas), memory_map=True)
+
+
+def cargar_columnas(
+    columnas: Sequence[str],
+    directorio: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+) -> Dict[str, np.ndarray]:
+    """Columnas numéricas como arrays NumPy (un solo archivo IPC → sin copia)."""
+    tablas = [_leer_tabla(r, columnas) for r in archivos(directorio, desde, hasta)]
+    if not tablas:
+        return {c: np.empty(0, dtype=SCHEMA.field(c).type.to_pandas_dtype()) for c in columnas}
+    tabla = pa.concat_tables(tablas) if len(tablas) > 1 else tablas[0]
+    return {
+        c: (
+            tabla.column(c).chunk(0).to_numpy()
+            if tabla.column(c).num_chunks == 1
+            else tabla.column(c).to_numpy()
+        )
+        for c in columnas
+    }
+
+
+def dataset_entrenamiento(
+    directorio: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+) -> pd.DataFrame:
+    """DataFrame `monto` / `hora` para entrenar_isolation_forest (sin nulos)."""
+    datos = cargar_columnas(("monto_dop", "hora_local"), directorio, desde, hasta)
+    validos = ~np.isnan(datos["monto_dop"]) & (datos["hora_local"] >= 0)
+    return pd.DataFrame(
+        {"monto": datos["monto_dop"][validos], "hora": datos["hora_local"][validos]},
+        copy=False,
+    )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Exportación columnar de ctransactions")
+    parser.add_argument("--dir", help="Directorio destino")
+    parser.add_argument("--format", choices=tuple(EXTENSIONES), help="parquet | arrow")
+    parser.add_argument("--full", action="store_true", help="Ignorar la marca de agua")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(directorio=args.dir, formato=args.format, completo=args.full)
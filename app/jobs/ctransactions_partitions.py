@@ -0,0 +1,170 @@
+# app/jobs/ctransactions_partitions.py
+"""
+Mantenimiento de particiones mensuales de ctransactions (y ctransactions_iso).
+
+  - Pre-crea las particiones del mes actual y de los N meses siguientes.
+    Si la partición DEFAULT tiene filas de ese rango, se mueven a la nueva
+    partición antes de adjuntarla.
+  - Retira las particiones más viejas que la retención: DETACH y luego se
+    dejan sueltas (detach), se mueven a un schema de archivo (archive) o se
+    eliminan (drop).
+
+Pensado para correr a diario (cron / scheduler):
+    python -m app.jobs.ctransactions_partitions
+"""
+import argparse
+import logging
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Tablas particionadas por mes sobre tx_timestamp_utc
+TABLAS = ("ctransactions", "ctransactions_iso")
+
+_NOMBRE_PARTICION = re.compile(r"^(?P<tabla>\w+)_p(?P<anio>\d{4})(?P<mes>\d{2})$")
+
+
+def inicio_mes(d: date, desplazamiento: int = 0) -> date:
+    total = d.year * 12 + (d.month - 1) + desplazamiento
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(tabla: str, mes: date) -> str:
+    return f"{tabla}_p{mes.year:04d}{mes.month:02d}"
+
+
+def particiones(conn, tabla: str) -> dict[str, date]:
+    """Particiones mensuales existentes → primer día del mes que cubren."""
+    rows = conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:tabla AS regclass)
+            """
+        ),
+        {"tabla": tabla},
+    ).scalars()
+    existentes = {}
+    for nombre in rows:
+        m = _NOMBRE_PARTICION.match(nombre)
+        if m and m.group("tabla") == tabla:
+            existentes[nombre] = date(int(m.group("anio")), int(m.group("mes")), 1)
+    return existentes
+
+
+def crear_particion(conn, tabla: str, mes: date) -> bool:
+    nombre = nombre_particion(tabla, mes)
+    if nombre in particiones(conn, tabla):
+        return False
+
+    desde, hasta = mes, inicio_mes(mes, 1)
+    default = f"{tabla}_default"
+    hay_default = conn.execute(
+        text("SELECT to_regclass(:t) IS NOT NULL"), {"t": default}
+    ).scalar()
+
+    conn.execute(text(
+        f"CREATE TABLE {nombre} (LIKE {tabla} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    if hay_default:
+        # Filas del rango que cayeron en DEFAULT (p. ej. antes del primer run)
+        movidas = conn.execute(
+            text(
+                f"""
+                WITH movidas AS (
+                    DELETE FROM {default}
+                    WHERE tx_timestamp_utc >= :desde AND tx_timestamp_utc < :hasta
+                    RETURNING *
+                )
+                INSERT INTO {nombre} SELECT * FROM movidas
+                """
+            ),
+            {"desde": desde, "hasta": hasta},
+        ).rowcount
+        if movidas:
+            logger.info(f"{nombre}: {movidas} filas movidas desde {default}")
+
+    # ATTACH crea en la partición los índices del padre que falten
+    conn.execute(text(
+        f"ALTER TABLE {tabla} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    ))
+    logger.info(f"Partición creada: {nombre} [{desde}, {hasta})")
+    return True
+
+
+def retirar_particion(conn, tabla: str, nombre: str, accion: str) -> None:
+    conn.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {nombre}"))
+    if accion == "drop":
+        conn.execute(text(f"DROP TABLE {nombre}"))
+    elif accion == "archive":
+        esquema = settings.TX_ARCHIVE_SCHEMA
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {esquema}"))
+        conn.execute(text(f"ALTER TABLE {nombre} SET SCHEMA {esquema}"))
+    logger.info(f"Partición retirada ({accion}): {nombre}")
+
+
+def purgar_replay(conn, horas: int) -> int:
+    borradas = conn.execute(
+        text("DELETE FROM ctransactions_replay WHERE created_at < :corte"),
+        {"corte": datetime.utcnow() - timedelta(hours=horas)},
+    ).rowcount
+    logger.info(f"ctransactions_replay: {borradas} veredictos purgados (> {horas} h)")
+    return borradas
+
+
+def run(
+    meses_adelante: int | None = None,
+    retencion_meses: int | None = None,
+    accion: str | None = None,
+    db_url: str | None = None,
+    hoy: date | None = None,
+) -> None:
+    meses_adelante = settings.TX_PARTITION_MONTHS_AHEAD if meses_adelante is None else meses_adelante
+    retencion_meses = settings.TX_RETENTION_MONTHS if retencion_meses is None else retencion_meses
+    accion = accion or settings.TX_RETENTION_ACTION
+    if accion not in ("detach", "archive", "drop"):
+        raise ValueError(f"Acción de retención inválida: {accion}")
+
+    actual = inicio_mes(hoy or datetime.utcnow().date())
+
+    # Mismo DSN síncrono (psycopg2) que el resto de jobs
+    engine = create_engine(db_url or settings.OFAC_SYNC_DATABASE_URL, future=True)
+
+    for tabla in TABLAS:
+        # Una transacción por partición: un fallo no revierte las demás
+        for k in range(meses_adelante + 1):
+            with engine.begin() as conn:
+                crear_particion(conn, tabla, inicio_mes(actual, k))
+
+        if retencion_meses:
+            corte = inicio_mes(actual, -retencion_meses)
+            with engine.connect() as conn:
+                viejas = [n for n, mes in particiones(conn, tabla).items() if mes < corte]
+            for nombre in sorted(viejas):
+                with engine.begin() as conn:
+                    retirar_particion(conn, tabla, nombre, accion)
+
+    with engine.begin() as conn:
+        purgar_replay(conn, settings.IDEMPOTENCY_RETENTION_HOURS)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones de ctransactions")
+    parser.add_argument("--ahead", type=int, help="Meses a pre-crear después del actual")
+    parser.add_argument("--retention", type=int, help="Meses a conservar (0 = no retirar)")
+    parser.add_argument("--action", choices=("detach", "archive", "drop"), help="Qué hacer con las viejas")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(meses_adelante=args.ahead, retencion_meses=args.retention, accion=args.action)
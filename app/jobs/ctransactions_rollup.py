@@ -0,0 +1,172 @@
+# app/jobs/ctransactions_rollup.py
+"""
+Mantenimiento incremental de los rollups de ctransactions.
+
+Cada corrida agrega las filas con inserted_at en [marca de agua,
+ahora - ROLLUP_SETTLE_SECONDS) por ventanas de ROLLUP_WINDOW_HOURS. Cada
+ventana es una transacción: se suman los deltas a los buckets horarios
+y diarios (ON CONFLICT ... n = n + EXCLUDED.n) y se avanza la marca de
+agua. La fila de la marca se bloquea (FOR UPDATE), así que dos corridas
+simultáneas no cuentan dos veces.
+
+La marca va por orden de inserción, no por tx_timestamp_utc: en modo
+write_behind las filas que se reenvían tarde desde el spill o el journal
+conservan su tx_timestamp_utc original y caerían detrás de la marca. Así
+se cuentan en la corrida siguiente, en el bucket de su tx_timestamp_utc.
+(El id tampoco sirve de marca: write_behind reserva bloques por worker.)
+
+Un solo scan por ventana: los buckets diarios salen de los horarios.
+
+    python -m app.jobs.ctransactions_rollup [--desde 2025-01-01]
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+NOMBRE = "ctransactions"
+
+ROLLUP_SQL = text(
+    """
+    WITH h AS (
+        SELECT date_trunc('hour', tx_timestamp_utc) AS bucket,
+               COALESCE(nivel_riesgo, '') AS nivel_riesgo,
+               COALESCE(es_fraude, false) AS es_fraude,
+               COALESCE(i_0049_currency_code_tx, '') AS moneda,
+               count(*) AS n,
+               COALESCE(sum(monto_dop_calculado), 0) AS monto_dop,
+               COALESCE(sum(
+                   CASE WHEN i_0004_amount_transaction ~ '^[0-9]+$'
+                        THEN i_0004_amount_transaction::numeric / 100
+                   END
+               ), 0) AS monto_src
+        FROM ctransactions
+        WHERE inserted_at >= :desde AND inserted_at < :hasta
+        GROUP BY 1, 2, 3, 4
+    ),
+    horas AS (
+        INSERT INTO ctransactions_rollup AS r
+            (periodo, bucket, nivel_riesgo, es_fraude, moneda, n, monto_dop, monto_src)
+        SELECT 'H', bucket, nivel_riesgo, es_fraude, moneda, n, monto_dop, monto_src FROM h
+        ON CONFLICT (periodo, bucket, nivel_riesgo, es_fraude, moneda) DO UPDATE
+        SET n = r.n + EXCLUDED.n,
+            monto_dop = r.monto_dop + EXCLUDED.monto_dop,
+            monto_src = r.monto_src + EXCLUDED.monto_src
+    )
+    INSERT INTO ctransactions_rollup AS r
+        (periodo, bucket, nivel_riesgo, es_fraude, moneda, n, monto_dop, monto_src)
+    SELECT 'D', date_trunc('day', bucket), nivel_riesgo, es_fraude, moneda,
+           sum(n), sum(monto_dop), sum(monto_src)
+    FROM h
+    GROUP BY 2, 3, 4, 5
+    ON CONFLICT (periodo, bucket, nivel_riesgo, es_fraude, moneda) DO UPDATE
+    SET n = r.n + EXCLUDED.n,
+        monto_dop = r.monto_dop + EXCLUDED.monto_dop,
+        monto_src = r.monto_src + EXCLUDED.monto_src
+    """
+)
+
+ROLLUP_FACTORES_SQL = text(
+    """
+    WITH h AS (
+        SELECT date_trunc('hour', t.tx_timestamp_utc) AS bucket, rf.code AS factor, count(*) AS n
+        FROM ctransactions t
+        CROSS JOIN LATERAL unnest(t.factores_ids) AS f(id)
+        JOIN risk_factors rf ON rf.id = f.id
+        WHERE t.inserted_at >= :desde AND t.inserted_at < :hasta
+          AND t.factores_ids <> '{}'
+        GROUP BY 1, 2
+    ),
+    horas AS (
+        INSERT INTO ctransactions_rollup_factor AS r (periodo, bucket, factor, n)
+        SELECT 'H', bucket, factor, n FROM h
+        ON CONFLICT (periodo, bucket, factor) DO UPDATE SET n = r.n + EXCLUDED.n
+    )
+    INSERT INTO ctransactions_rollup_factor AS r (periodo, bucket, factor, n)
+    SELECT 'D', date_trunc('day', bucket), factor, sum(n)
+    FROM h
+    GROUP BY 2, 3
+    ON CONFLICT (periodo, bucket, factor) DO UPDATE SET n = r.n + EXCLUDED.n
+    """
+)
+
+
+def _marca(conn, desde_inicial: datetime | None) -> datetime | None:
+    """Marca de agua actual (bloqueada hasta el fin de la transacción)."""
+    hasta = conn.execute(
+        text("SELECT hasta FROM rollup_watermark WHERE nombre = :n FOR UPDATE"),
+        {"n": NOMBRE},
+    ).scalar()
+    if hasta is not None:
+        return hasta
+
+    inicio = desde_inicial or conn.execute(
+        text("SELECT date_trunc('hour', min(inserted_at)) FROM ctransactions")
+    ).scalar()
+    if inicio is None:
+        return None
+    conn.execute(
+        text(
+            "INSERT INTO rollup_watermark (nombre, hasta) VALUES (:n, :h) "
+            "ON CONFLICT (nombre) DO NOTHING"
+        ),
+        {"n": NOMBRE, "h": inicio},
+    )
+    return conn.execute(
+        text("SELECT hasta FROM rollup_watermark WHERE nombre = :n FOR UPDATE"),
+        {"n": NOMBRE},
+    ).scalar()
+
+
+def run(
+    desde_inicial: datetime | None = None,
+    db_url: str | None = None,
+    ahora: datetime | None = None,
+) -> int:
+    """Agrega hasta el corte; devuelve cuántas ventanas procesó."""
+    corte = (ahora or datetime.utcnow()) - timedelta(seconds=settings.ROLLUP_SETTLE_SECONDS)
+    ventana = timedelta(hours=settings.ROLLUP_WINDOW_HOURS)
+
+    engine = create_engine(db_url or settings.OFAC_SYNC_DATABASE_URL, future=True)
+
+    ventanas = 0
+    while True:
+        with engine.begin() as conn:
+            desde = _marca(conn, desde_inicial)
+            if desde is None or desde >= corte:
+                break
+            hasta = min(desde + ventana, corte)
+
+            params = {"desde": desde, "hasta": hasta}
+            conn.execute(ROLLUP_SQL, params)
+            conn.execute(ROLLUP_FACTORES_SQL, params)
+            conn.execute(
+                text("UPDATE rollup_watermark SET hasta = :h WHERE nombre = :n"),
+                {"h": hasta, "n": NOMBRE},
+            )
+        ventanas += 1
+        logger.info(f"Rollup [{desde}, {hasta}) agregado")
+
+    logger.info(f"Rollups al día: {ventanas} ventanas procesadas")
+    return ventanas
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rollups horarios/diarios de ctransactions")
+    parser.add_argument(
+        "--desde",
+        type=datetime.fromisoformat,
+        help="Inicio (inserted_at) si aún no hay marca de agua (por defecto, la primera fila insertada)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(desde_inicial=args.desde)
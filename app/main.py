@@ -1,4 +1,6 @@
 # app/main.py
+import asyncio
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
@@ -7,10 +9,17 @@ from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
+from app.aml.ofac_index import obtener_indice
+from app.api.tcp.iso_listener import iso_listener
 from app.api.v1.router import api_router_v1
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.infra.db.session import init_db
+from app.domain.services.analizador_fraude import obtener_config_riesgo
+from app.infra.cache.factor_catalog import catalogo_factores
+from app.infra.db.buffered_writer import ofac_audit_writer, tx_writer
+from app.infra.db.session import AsyncSessionLocal, cerrar_engines, init_db
+from app.infra.detectors.fraude_model import cargar_modelo
+from app.infra.detectors.tasas import obtener_tasas_cambio
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -34,6 +43,20 @@ def create_app() -> FastAPI:
     @app.on_event("startup")
     async def on_startup() -> None:
         await init_db()
+        ofac_audit_writer.start()
+        if settings.TX_PERSISTENCE_MODE == "write_behind":
+            tx_writer.start()
+        if settings.ISO_TCP_ENABLED:
+            await iso_listener.start()
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        # Contestar lo que está en vuelo por TCP y después drenar los
+        # writers (esos análisis todavía encolan filas)
+        await iso_listener.stop()
+        # Drenar auditoría pendiente antes de salir
+        await ofac_audit_writer.stop()
+        await tx_writer.stop()
 
     @app.get("/")
     async def root():
@@ -42,6 +65,31 @@ def create_app() -> FastAPI:
     return app
 
 
+async def precargar() -> None:
+    """
+    Carga el estado de sólo lectura del camino de autorización en el
+    proceso actual. run_server lo llama en el maestro antes del fork para
+    que los workers compartan esas páginas copy-on-write:
+
+      - el IsolationForest (cargar_modelo),
+      - las tasas de cambio,
+      - países de riesgo y RiskConfig (obtener_config_riesgo),
+      - el catálogo de factores código ↔ id,
+      - el índice OFAC.
+
+    Al final cierra las conexiones usadas: no deben heredarse.
+    """
+    try:
+        await asyncio.to_thread(cargar_modelo)
+        await asyncio.to_thread(obtener_tasas_cambio)
+        async with AsyncSessionLocal() as db:
+            await obtener_config_riesgo(db)
+            await catalogo_factores.cargar(db)
+            await obtener_indice(db)
+    finally:
+        await cerrar_engines()
+
+
 def _rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
         status_code=429,
@@ -0,0 +1,97 @@
+# app/schemas/iso_rapido.py
+"""
+Parseo rápido de ISO8583Transaction para emisores confiables.
+
+El switch ya validó el mensaje: aquí no se construye el modelo Pydantic
+(más de cien campos con max_length) sino un objeto plano con los mismos
+atributos, que es lo único que usa el motor (acceso por atributo). Los
+campos ausentes valen None a nivel de clase; por mensaje sólo se copian
+los presentes (una veintena de más de cien).
+Sólo se validan los campos que el motor lee o que van a columnas de largo
+fijo en ctransactions; el resto se copia tal cual al JSONB de DE fríos.
+
+Requerido/largo salen del propio ISO8583Transaction, así que las reglas
+de esos campos no se desalinean con el modo completo.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from app.schemas.iso_schemas import ISO8583Transaction
+
+CAMPOS: Tuple[str, ...] = tuple(ISO8583Transaction.model_fields)
+_CAMPOS = frozenset(CAMPOS)
+
+# Leídos por el motor (monto, moneda, hora, DE43, PAN, clave de
+# idempotencia, merchant) + columnas calientes con largo fijo
+CAMPOS_VALIDADOS: Tuple[str, ...] = (
+    "mti",
+    "i_0002_pan",
+    "i_0004_amount_transaction",
+    "i_0007_transmission_datetime",
+    "i_0011_stan",
+    "i_0012_time_local",
+    "i_0013_date_local",
+    "i_0018_merchant_type_mcc",
+    "i_0041_card_acceptor_tid",
+    "i_0042_card_acceptor_mid",
+    "i_0043_card_acceptor_name_loc",
+    "i_0049_currency_code_tx",
+)
+
+
+def _max_length(campo: str) -> Optional[int]:
+    for m in ISO8583Transaction.model_fields[campo].metadata:
+        largo = getattr(m, "max_length", None)
+        if largo is not None:
+            return largo
+    return None
+
+
+_REGLAS: Tuple[Tuple[str, bool, Optional[int]], ...] = tuple(
+    (c, ISO8583Transaction.model_fields[c].is_required(), _max_length(c))
+    for c in CAMPOS_VALIDADOS
+)
+
+
+class MensajeInvalido(ValueError):
+    def __init__(self, campo: str | None, mensaje: str):
+        super().__init__(f"{campo}: {mensaje}" if campo else mensaje)
+        self.campo = campo
+        self.mensaje = mensaje
+
+
+class ISO8583Rapido:
+    """Mismos atributos que ISO8583Transaction; los ausentes quedan en None."""
+
+    def __init__(self, datos: Dict[str, Any]):
+        self.__dict__.update({c: v for c, v in datos.items() if c in _CAMPOS})
+
+    @classmethod
+    def desde_json(cls, cuerpo: bytes) -> "ISO8583Rapido":
+        try:
+            datos = orjson.loads(cuerpo)
+        except orjson.JSONDecodeError as e:
+            raise MensajeInvalido(None, f"JSON inválido: {e}")
+        if not isinstance(datos, dict):
+            raise MensajeInvalido(None, "Se esperaba un objeto JSON")
+        return cls.desde_campos(datos)
+
+    @classmethod
+    def desde_campos(cls, datos: Dict[str, Any]) -> "ISO8583Rapido":
+        """Dict ya decodificado (JSON o ISO 8583 crudo) → objeto validado."""
+        for campo, requerido, largo in _REGLAS:
+            valor = datos.get(campo)
+            if valor is None:
+                if requerido:
+                    raise MensajeInvalido(campo, "campo requerido")
+            elif type(valor) is not str:
+                raise MensajeInvalido(campo, "debe ser texto")
+            elif largo is not None and len(valor) > largo:
+                raise MensajeInvalido(campo, f"máximo {largo} caracteres")
+        return cls(datos)
+
+
+# Default de clase de cada campo: lo que no vino en el mensaje lee None
+for _campo in CAMPOS:
+    setattr(ISO8583Rapido, _campo, None)
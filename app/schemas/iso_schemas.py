@@ -466,4 +466,13 @@ class TransaccionResponse(BaseModel):
     data_analyzed: Dict
     exchange: Optional[Dict] = None
     ofac: Optional[Dict] = None
-    trnx_db_id: Optional[int] = None
+    trnx_db_id: Optional[int] = Field(
+        None,
+        description=(
+            "Id en ctransactions del mensaje analizado. Con TX_PERSISTENCE_MODE="
+            "write_behind la fila se inserta después de responder: si el mismo mensaje "
+            "(STAN, TID, DE7) llega a dos workers a la vez, se analizan ambas copias, "
+            "sólo se conserva la primera fila y el id devuelto para la otra copia nunca "
+            "se persiste. En modo sync se devuelve el veredicto persistido."
+        ),
+    )
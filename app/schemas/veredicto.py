@@ -0,0 +1,91 @@
+# app/schemas/veredicto.py
+"""
+Respuesta de /analyze-trnx sin pasar por Pydantic.
+
+El resultado lo produce el propio motor (no es entrada del cliente), así
+que no se vuelve a validar: se arma el dict con el orden y los tipos de
+TransaccionResponse y se codifica con orjson. TransaccionResponse sigue
+siendo el contrato (response_model → OpenAPI); cuando el endpoint
+devuelve un Response, FastAPI no valida ni re-serializa.
+"""
+from decimal import Decimal
+from typing import Any, Dict
+
+import orjson
+from fastapi.responses import Response, StreamingResponse
+
+from app.schemas.iso_schemas import ISO8583Transaction
+
+# Escalares numpy del modelo (bool_, float64) sin conversión previa
+_OPCIONES = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(v: Any):
+    if isinstance(v, Decimal):
+        return float(v)
+    if hasattr(v, "item"):
+        return v.item()
+    raise TypeError(f"No serializable: {type(v)}")
+
+
+def veredicto(resultado: Dict[str, Any], tx: ISO8583Transaction) -> Dict[str, Any]:
+    """Cuerpo de TransaccionResponse a partir del resultado del análisis."""
+    risk = resultado["risk"]
+    monto = tx.i_0004_amount_transaction
+    return {
+        "is_fraud": bool(risk["is_fraud"]),
+        "fraud_prob": float(risk["fraud_prob"]),
+        "risk_level": risk["risk_level"],
+        "risk_factor": risk["risk_factor"],
+        "message": risk["message"],
+        "advice": risk["advice"],
+        "customer_hash": risk["customer_hash"],
+        "anomaly_score": float(risk["anomaly_score"]),
+        "timestamp": risk["timestamp"],
+        "data_analyzed": {
+            "src_amount": float(monto) / 100 if monto else 0.0,
+            "tar_amount": round(float(resultado["monto_dop"] or 0), 2),
+            "currency_tx": tx.i_0049_currency_code_tx,
+            "time_local": tx.i_0012_time_local,
+        },
+        "exchange": resultado["exchange"],
+        "ofac": resultado["ofac"],
+        "trnx_db_id": resultado["trnx_db_id"],
+    }
+
+
+def serializar_veredicto(resultado: Dict[str, Any], tx: ISO8583Transaction) -> bytes:
+    return orjson.dumps(veredicto(resultado, tx), default=_default, option=_OPCIONES)
+
+
+def respuesta_veredicto(resultado: Dict[str, Any], tx: ISO8583Transaction) -> Response:
+    return Response(content=serializar_veredicto(resultado, tx), media_type="application/json")
+
+
+def linea_veredicto(linea: int, resultado: Dict[str, Any], tx: ISO8583Transaction) -> bytes:
+    """Veredicto como línea NDJSON, con el número de línea de entrada."""
+    return orjson.dumps(
+        {"linea": linea, **veredicto(resultado, tx)},
+        default=_default,
+        option=_OPCIONES | orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+def linea_error(linea: int | None, error: str) -> bytes:
+    return orjson.dumps({"linea": linea, "error": error}, option=orjson.OPT_APPEND_NEWLINE)
+
+
+class NdjsonStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse para cuerpos que se leen mientras se responde: sin
+    la tarea que espera la desconexión, porque esa tarea consume receive()
+    y le quitaría chunks del cuerpo a request.stream(). La desconexión se
+    detecta al leer el cuerpo (ClientDisconnect).
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -1,7 +1,32 @@
 #!/usr/bin/env python3
+"""
+Arranque del servidor.
+
+  dev  (SERVER_MODE=dev): un proceso, uvicorn con reload.
+  prod (SERVER_MODE=prod): un maestro que
+
+    1. importa la app y precarga el estado de sólo lectura (app.main.
+       precargar: IsolationForest, tasas, países de riesgo y RiskConfig,
+       catálogo de factores, índice OFAC),
+    2. congela esos objetos (gc.freeze) para que el GC de los workers no
+       los toque y las páginas sigan compartidas copy-on-write,
+    3. abre el socket y hace fork de SERVER_WORKERS workers uvicorn
+       (uvloop + httptools) que aceptan sobre el mismo socket,
+    4. reinicia los workers que mueren y, con SIGTERM/SIGINT, deja de
+       aceptar y drena: cada worker termina sus requests en curso y vacía
+       los writers diferidos (shutdown) dentro de
+       SERVER_GRACEFUL_TIMEOUT_SECONDS; pasado ese plazo, SIGKILL.
+
+    python run_server.py [--mode prod] [--workers 8]
+"""
+import argparse
+import asyncio
+import gc
 import logging
 import os
+import signal
 import sys
+import time
 
 import uvicorn
 
@@ -15,6 +40,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger("run_server")
 
+# Un worker que muere antes de esto se relanza con espera (evita un
+# fork en bucle si el arranque falla siempre)
+_VIDA_MINIMA_SECONDS = 1.0
+
 
 def get_ssl_params() -> dict:
     key = settings.SSL_KEYFILE
@@ -26,19 +55,171 @@ def get_ssl_params() -> dict:
     return {"ssl_keyfile": key, "ssl_certfile": cert}
 
 
-def main() -> None:
-    params = get_ssl_params()
-    protocolo = "https" if params else "http"
+# ==========================================================
+#  MODO DEV
+# ==========================================================
 
+def run_dev(params: dict) -> None:
+    protocolo = "https" if params else "http"
+    logger.info(f"Servidor (dev) en {protocolo}://localhost:{settings.SERVER_PORT}")
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
         reload=True,
         log_level="info",
         **params,
     )
-    logger.info(f"Servidor levantado en {protocolo}://localhost:8000")
+
+
+# ==========================================================
+#  MODO PROD (prefork)
+# ==========================================================
+
+class Maestro:
+    """Proceso padre: hace fork de los workers, los vigila y coordina el drenado."""
+
+    def __init__(self, config: uvicorn.Config, workers: int, timeout_drenado: float):
+        self.config = config
+        self.n_workers = workers
+        self.timeout_drenado = timeout_drenado
+        self.sock = None
+        self.workers: dict[int, float] = {}  # pid → inicio
+        self.drenando = False
+
+    def _worker(self) -> None:
+        """Código del hijo: uvicorn sobre el socket heredado."""
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+            signal.signal(sig, signal.SIG_DFL)
+        gc.enable()
+        # uvicorn instala sus propios handlers: SIGTERM → deja de aceptar,
+        # espera las requests en curso y corre el shutdown de la app
+        uvicorn.Server(self.config).run(sockets=[self.sock])
+
+    def _lanzar(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                self._worker()
+            except BaseException:
+                logger.exception("Worker terminado con error")
+                codigo = 1
+            finally:
+                os._exit(codigo)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Worker {pid} iniciado")
+        if self.drenando:
+            # La señal llegó entre el fork y el registro del pid
+            _senal(pid, signal.SIGTERM)
+
+    def _drenar(self, signum, frame) -> None:
+        if self.drenando:
+            return
+        self.drenando = True
+        logger.info(
+            f"{signal.Signals(signum).name}: drenando {len(self.workers)} workers "
+            f"(máx. {self.timeout_drenado:.0f}s)"
+        )
+        # El maestro también tiene el socket: cerrarlo para que el kernel
+        # deje de encolar conexiones que ya nadie va a aceptar
+        self.sock.close()
+        for pid in self.workers:
+            _senal(pid, signal.SIGTERM)
+        signal.alarm(int(self.timeout_drenado) + 5)
+
+    def _forzar(self, signum, frame) -> None:
+        logger.error(f"Drenado vencido: SIGKILL a {sorted(self.workers)}")
+        for pid in self.workers:
+            _senal(pid, signal.SIGKILL)
+
+    def run(self) -> None:
+        self.sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._drenar)
+        signal.signal(signal.SIGINT, self._drenar)
+        signal.signal(signal.SIGALRM, self._forzar)
+
+        for _ in range(self.n_workers):
+            self._lanzar()
+
+        while self.workers:
+            try:
+                pid, estado = os.wait()
+            except ChildProcessError:
+                break
+            inicio = self.workers.pop(pid, None)
+            if inicio is None or self.drenando:
+                continue
+            logger.error(f"Worker {pid} terminó ({os.waitstatus_to_exitcode(estado)}); relanzando")
+            if time.monotonic() - inicio < _VIDA_MINIMA_SECONDS:
+                time.sleep(_VIDA_MINIMA_SECONDS)
+            if not self.drenando:
+                self._lanzar()
+
+        signal.alarm(0)
+        logger.info("Servidor detenido")
+
+
+def _senal(pid: int, sig: signal.Signals) -> None:
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def run_prod(params: dict, workers: int) -> None:
+    # Sin GC durante la precarga: los objetos largos quedan juntos y
+    # gc.freeze() los pasa a la generación permanente antes del fork
+    gc.disable()
+
+    from app.main import app, precargar
+
+    inicio = time.perf_counter()
+    asyncio.run(precargar())
+    gc.freeze()
+    logger.info(
+        f"Estado precargado en {time.perf_counter() - inicio:.1f}s "
+        f"({gc.get_freeze_count()} objetos congelados)"
+    )
+
+    config = uvicorn.Config(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        loop="uvloop",
+        http="httptools",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_graceful_shutdown=int(settings.SERVER_GRACEFUL_TIMEOUT_SECONDS),
+        log_level="info",
+        **params,
+    )
+    protocolo = "https" if params else "http"
+    logger.info(
+        f"Servidor (prod) en {protocolo}://{settings.SERVER_HOST}:{settings.SERVER_PORT} "
+        f"con {workers} workers"
+    )
+    Maestro(config, workers, settings.SERVER_GRACEFUL_TIMEOUT_SECONDS).run()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor de la API de fraude")
+    parser.add_argument("--mode", choices=("dev", "prod"), default=settings.SERVER_MODE)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVER_WORKERS,
+        help="Workers en modo prod (0 → uno por CPU)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    params = get_ssl_params()
+    if args.mode == "prod":
+        run_prod(params, args.workers or os.cpu_count() or 1)
+    else:
+        run_dev(params)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,9 @@
 -- Borrar tablas si ya existen (para pruebas limpias)
+DROP TABLE IF EXISTS ctransactions_replay;
+DROP TABLE IF EXISTS ctransactions_rollup;
+DROP TABLE IF EXISTS ctransactions_rollup_factor;
+DROP TABLE IF EXISTS rollup_watermark;
+DROP TABLE IF EXISTS ctransactions_iso;
 DROP TABLE IF EXISTS ctransactions;
 DROP TABLE IF EXISTS ccardx;
 DROP TABLE IF EXISTS caccounts;
@@ -81,7 +86,7 @@ CREATE TABLE ccardx (
     card_type VARCHAR(20),
     brand VARCHAR(20),
     status VARCHAR(20) DEFAULT 'active',
-    account_id INTEGER NOT NULL,
+    account_id INTEGER,                 -- NULL: tarjeta auto-provisionada (PAN desconocido)
     pan_token VARCHAR(32),
     last4 VARCHAR(4),
     creado_en TIMESTAMP,
@@ -117,164 +122,47 @@ CREATE INDEX idx_cmerchants_mcc ON cmerchants(mcc);
 CREATE INDEX idx_cmerchants_pais ON cmerchants(pais);
 
 -- Tabla de Transacciones (ISO 8583 + Resultados de Fraude)
+-- Particionada por mes sobre tx_timestamp_utc. Las particiones mensuales las
+-- crea (y retira según la retención) app/jobs/ctransactions_partitions.py;
+-- la partición DEFAULT sólo recibe filas fuera de rango hasta que corre el job.
 CREATE TABLE ctransactions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
 
     -- Metadatos locales
     tx_timestamp_utc TIMESTAMP NOT NULL DEFAULT NOW(),
+    -- Momento del INSERT (UTC): las filas que el write-behind reenvía tarde
+    -- llevan un tx_timestamp_utc viejo; los jobs incrementales marcan por acá
+    inserted_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
 
     -- Llave foránea a la tarjeta
     card_id INTEGER NOT NULL REFERENCES ccardx(id),
 
     -------------------------------------------------
-    -- CAMPOS ISO 8583 (nombres i_00xx_*)
+    -- CAMPOS ISO 8583 CONSULTADOS CON FRECUENCIA (nombres i_00xx_*)
+    -- El resto de data elements va a ctransactions_iso.
     -------------------------------------------------
     -- Bitmap & MTI
     mti VARCHAR(4),
     bitmap VARCHAR(32),
 
-    -- DE 2–4
     i_0002_pan VARCHAR(19),
-    i_0003_processing_code VARCHAR(6),
     i_0004_amount_transaction VARCHAR(12),
-    i_0005_amount_settlement VARCHAR(12),
-    i_0006_amount_cardholder_billing VARCHAR(12),
-
-    -- DE 7–13
-    i_0007_transmission_datetime VARCHAR(10),
-    i_0008_amount_cardholder_billing_fee VARCHAR(8),
-    i_0009_conversion_rate_settlement VARCHAR(8),
-    i_0010_conversion_rate_cardholder_billing VARCHAR(8),
     i_0011_stan VARCHAR(6),
     i_0012_time_local VARCHAR(6),
     i_0013_date_local VARCHAR(4),
-
-    -- DE 14–21
-    i_0014_expiration_date VARCHAR(4),
-    i_0015_settlement_date VARCHAR(4),
-    i_0016_currency_conversion_date VARCHAR(4),
-    i_0017_capture_date VARCHAR(4),
     i_0018_merchant_type_mcc VARCHAR(4),
-    i_0019_acq_country_code VARCHAR(3),
-    i_0020_pan_extended_country_code VARCHAR(3),
-    i_0021_fwd_country_code VARCHAR(3),
-
-    -- DE 22–27
-    i_0022_pos_entry_mode VARCHAR(3),
-    i_0023_pan_sequence_number VARCHAR(3),
-    i_0024_function_code_nii VARCHAR(3),
-    i_0025_pos_condition_code VARCHAR(2),
-    i_0026_pos_capture_code VARCHAR(2),
-    i_0027_auth_id_response_length VARCHAR(1),
-
-    -- DE 28–31 (x+n 8 → lo guardamos como string)
-    i_0028_amount_tx_fee VARCHAR(9),
-    i_0029_amount_settlement_fee VARCHAR(9),
-    i_0030_amount_tx_processing_fee VARCHAR(9),
-    i_0031_amount_settlement_processing_fee VARCHAR(9),
-
-    -- DE 32–36
-    i_0032_acquiring_inst_id VARCHAR(11),
-    i_0033_forwarding_inst_id VARCHAR(11),
-    i_0034_pan_extended VARCHAR(28),
-    i_0035_track_2_data VARCHAR(37),
-    i_0036_track_3_data VARCHAR(104),
-
-    -- DE 37–42
-    i_0037_retrieval_reference_number VARCHAR(12),
-    i_0038_auth_id_response VARCHAR(6),
-    i_0039_response_code VARCHAR(2),
-    i_0040_service_restriction_code VARCHAR(3),
     i_0041_card_acceptor_tid VARCHAR(8),
     i_0042_card_acceptor_mid VARCHAR(15),
-
-    -- DE 43–49
-    i_0043_card_acceptor_name_loc VARCHAR(40),
-    i_0044_additional_response_data VARCHAR(25),
-    i_0045_track_1_data VARCHAR(76),
-    i_0046_additional_data_iso TEXT,
-    i_0047_additional_data_national TEXT,
-    i_0048_additional_data_private TEXT,
     i_0049_currency_code_tx VARCHAR(3),
 
-    -- DE 50–55
-    i_0050_currency_code_settlement VARCHAR(3),
-    i_0051_currency_code_cardholder_billing VARCHAR(3),
-    i_0052_pin_data VARCHAR(64),
-    i_0053_security_control_info VARCHAR(16),
-    i_0054_additional_amounts TEXT,
-    i_0055_icc_data_emv TEXT,
-
-    -- DE 56–63
-    i_0056_reserved_iso TEXT,
-    i_0057_reserved_national TEXT,
-    i_0058_reserved TEXT,
-    i_0059_reserved TEXT,
-    i_0060_reserved_national TEXT,
-    i_0061_reserved_private TEXT,
-    i_0062_reserved_private_2 TEXT,
-    i_0063_reserved_private_3 TEXT,
-
-    -- DE 64
-    i_0064_message_authentication_code VARCHAR(64),
-
-    -- DE 65–72
-    i_0065_extended_bitmap_indicator VARCHAR(1),
-    i_0066_settlement_code VARCHAR(1),
-    i_0067_extended_payment_code VARCHAR(2),
-    i_0068_receiving_inst_country_code VARCHAR(3),
-    i_0069_settlement_inst_country_code VARCHAR(3),
-    i_0070_network_management_info_code VARCHAR(3),
-    i_0071_message_number VARCHAR(4),
-    i_0072_last_message_number VARCHAR(4),
-
-    -- DE 73–79
-    i_0073_action_date VARCHAR(6),
-    i_0074_number_credits VARCHAR(10),
-    i_0075_credits_reversal_number VARCHAR(10),
-    i_0076_number_debits VARCHAR(10),
-    i_0077_debits_reversal_number VARCHAR(10),
-    i_0078_transfer_number VARCHAR(10),
-    i_0079_transfer_reversal_number VARCHAR(10),
-
-    -- DE 80–89
-    i_0080_number_inquiries VARCHAR(10),
-    i_0081_number_authorizations VARCHAR(10),
-    i_0082_credits_processing_fee_amount VARCHAR(12),
-    i_0083_credits_transaction_fee_amount VARCHAR(12),
-    i_0084_debits_processing_fee_amount VARCHAR(12),
-    i_0085_debits_transaction_fee_amount VARCHAR(12),
-    i_0086_total_amount_credits VARCHAR(16),
-    i_0087_credits_reversal_amount VARCHAR(16),
-    i_0088_total_amount_debits VARCHAR(16),
-    i_0089_debits_reversal_amount VARCHAR(16),
-
-    -- DE 90–96
-    i_0090_original_data_elements TEXT,
-    i_0091_file_update_code VARCHAR(1),
-    i_0092_file_security_code VARCHAR(2),
-    i_0093_response_indicator VARCHAR(5),
-    i_0094_service_indicator VARCHAR(7),
-    i_0095_replacement_amounts TEXT,
-    i_0096_message_security_code VARCHAR(64),
-
-    -- DE 97–104
-    i_0097_net_settlement_amount VARCHAR(16),
-    i_0098_payee VARCHAR(25),
-    i_0099_settlement_inst_id_code VARCHAR(11),
-    i_0100_receiving_inst_id_code VARCHAR(11),
-    i_0101_file_name VARCHAR(17),
-    i_0102_account_id_1 VARCHAR(28),
-    i_0103_account_id_2 VARCHAR(28),
-    i_0104_tx_description VARCHAR(100),
-
     -------------------------------------------------
     -- CAMPOS PARA ANÁLISIS DE FRAUDE
     -------------------------------------------------
     es_fraude BOOLEAN DEFAULT FALSE,
     probabilidad_fraude FLOAT DEFAULT 0.0,
     nivel_riesgo VARCHAR(10),
-    factores_riesgo VARCHAR(255),
+    factores_riesgo TEXT,                          -- códigos separados por coma (lectura)
+    factores_ids SMALLINT[] NOT NULL DEFAULT '{}',  -- risk_factors.id, ordenados (índice GIN)
     mensaje_analisis VARCHAR(255),
     recomendacion_analisis VARCHAR(255),
     analisis_timestamp TIMESTAMP,
@@ -285,18 +173,95 @@ CREATE TABLE ctransactions (
     historial_tx_7d INTEGER,
     monto_promedio_30d DECIMAL(18, 2),
     merchant_permitido BOOLEAN,
-    mcc_permitido BOOLEAN
+    mcc_permitido BOOLEAN,
+
+    -- La clave de partición debe formar parte de toda PK / UNIQUE: un
+    -- UNIQUE (STAN, TID) con tx_timestamp_utc nunca detectaría un duplicado.
+    -- Las retransmisiones se descartan por la PK de ctransactions_replay
+    -- (STAN, TID, DE7), que se inserta en la misma transacción.
+    PRIMARY KEY (id, tx_timestamp_utc)
+) PARTITION BY RANGE (tx_timestamp_utc);
+
+CREATE TABLE ctransactions_default PARTITION OF ctransactions DEFAULT;
+
+-- Índices recomendados (se propagan a cada partición)
+-- (tx_timestamp_utc, id): orden de auditoría y cursor keyset
+CREATE INDEX idx_ctransactions_tx_time ON ctransactions(tx_timestamp_utc, id);
+-- Marca de agua de rollups / exportación (orden de inserción)
+CREATE INDEX idx_ctransactions_inserted ON ctransactions(inserted_at, id);
+CREATE INDEX idx_ctransactions_card_time ON ctransactions(card_id, tx_timestamp_utc);
+CREATE INDEX idx_ctransactions_stan ON ctransactions(i_0011_stan);
+-- Búsqueda de auditoría: igualdad + rango/orden por tiempo en el mismo índice
+CREATE INDEX idx_ctransactions_pan ON ctransactions(i_0002_pan, tx_timestamp_utc);
+CREATE INDEX idx_ctransactions_tid ON ctransactions(i_0041_card_acceptor_tid, tx_timestamp_utc);
+CREATE INDEX idx_ctransactions_mid ON ctransactions(i_0042_card_acceptor_mid, tx_timestamp_utc);
+CREATE INDEX idx_ctransactions_nivel_riesgo ON ctransactions(nivel_riesgo, tx_timestamp_utc);
+-- Parciales: sólo las filas marcadas (pocas) → índices pequeños
+CREATE INDEX idx_ctransactions_fraude ON ctransactions(tx_timestamp_utc, id) WHERE es_fraude;
+CREATE INDEX idx_ctransactions_fraude_monto ON ctransactions(monto_dop_calculado) WHERE es_fraude;
+-- Factores: factores_ids @> '{7,12}' (todos) / && (alguno)
+CREATE INDEX idx_ctransactions_factores ON ctransactions USING GIN (factores_ids);
+
+-- Data elements ISO 8583 restantes, sólo los presentes en el mensaje:
+-- {"3": "000000", "7": "1019123456", ...} (clave = número de DE).
+-- Se carga bajo demanda (detalle / exportación), nunca en el hot path.
+CREATE TABLE ctransactions_iso (
+    tx_id INTEGER NOT NULL,
+    tx_timestamp_utc TIMESTAMP NOT NULL,
+    des JSONB NOT NULL DEFAULT '{}',
+
+    -- Sin FK a ctransactions: ambas se particionan/retiran por mes de forma
+    -- independiente y la fila se escribe en la misma transacción que la caliente.
+    PRIMARY KEY (tx_id, tx_timestamp_utc)
+) PARTITION BY RANGE (tx_timestamp_utc);
+
+CREATE TABLE ctransactions_iso_default PARTITION OF ctransactions_iso DEFAULT;
+
+-- Veredictos recientes por mensaje (idempotencia ante retransmisiones):
+-- clave STAN + TID + fecha/hora de transmisión (DE7). Se escribe en la misma
+-- transacción que ctransactions; el job de particiones purga por created_at.
+CREATE TABLE ctransactions_replay (
+    i_0011_stan VARCHAR(6) NOT NULL,
+    i_0041_card_acceptor_tid VARCHAR(8) NOT NULL,
+    i_0007_transmission_datetime VARCHAR(10) NOT NULL,
+    tx_id INTEGER NOT NULL,
+    tx_timestamp_utc TIMESTAMP NOT NULL,
+    resultado JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (i_0011_stan, i_0041_card_acceptor_tid, i_0007_transmission_datetime)
 );
 
--- Índices recomendados
-CREATE INDEX idx_ctransactions_tx_time ON ctransactions(tx_timestamp_utc);
-CREATE INDEX idx_ctransactions_card_id ON ctransactions(card_id);
-CREATE INDEX idx_ctransactions_pan ON ctransactions(i_0002_pan);
-CREATE INDEX idx_ctransactions_stan ON ctransactions(i_0011_stan);
-CREATE INDEX idx_ctransactions_tid ON ctransactions(i_0041_card_acceptor_tid);
-CREATE INDEX idx_ctransactions_mid ON ctransactions(i_0042_card_acceptor_mid);
-CREATE INDEX idx_ctransactions_es_fraude ON ctransactions(es_fraude);
-CREATE INDEX idx_ctransactions_nivel_riesgo ON ctransactions(nivel_riesgo);
+CREATE INDEX idx_ctransactions_replay_created ON ctransactions_replay(created_at);
+
+-- Rollups para el dashboard (/auditoria/stats). periodo: 'H' hora, 'D' día
+-- (UTC). Los mantiene app/jobs/ctransactions_rollup.py con marca de agua.
+CREATE TABLE ctransactions_rollup (
+    periodo CHAR(1) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    nivel_riesgo VARCHAR(10) NOT NULL,       -- '' si nulo
+    es_fraude BOOLEAN NOT NULL,
+    moneda VARCHAR(3) NOT NULL,              -- DE49; '' si nulo
+    n BIGINT NOT NULL DEFAULT 0,
+    monto_dop DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    monto_src DECIMAL(20, 2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (periodo, bucket, nivel_riesgo, es_fraude, moneda)
+);
+
+CREATE TABLE ctransactions_rollup_factor (
+    periodo CHAR(1) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    factor VARCHAR(80) NOT NULL,
+    n BIGINT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (periodo, bucket, factor)
+);
+
+CREATE TABLE rollup_watermark (
+    nombre VARCHAR(40) PRIMARY KEY,
+    hasta TIMESTAMP NOT NULL
+);
 
 
 -- Entidades SDN principales
@@ -309,6 +274,7 @@ CREATE TABLE ofac_entity (
     title           TEXT,
     remarks         TEXT,
     is_individual   BOOLEAN,              -- flag util para screening de personas
+    row_hash        VARCHAR(64),          -- huella entidad+aliases+direcciones (sync incremental)
     last_updated_at TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
@@ -340,6 +306,17 @@ CREATE TABLE ofac_metadata (
     last_source_hash TEXT
 );
 
+-- Cambios por sincronización (lo consumen caches y re-screening)
+CREATE TABLE ofac_change_log (
+    id           BIGSERIAL PRIMARY KEY,
+    synced_at    TIMESTAMP NOT NULL DEFAULT NOW(),
+    source_hash  TEXT NOT NULL,
+    lists_hash   TEXT,                -- sólo UN / EU / CONS (recarga en los workers)
+    inserted     INT[] NOT NULL DEFAULT '{}',
+    updated      INT[] NOT NULL DEFAULT '{}',
+    deleted      INT[] NOT NULL DEFAULT '{}'
+);
+
 CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 CREATE INDEX idx_ofac_sdn_name_trgm
@@ -351,7 +328,7 @@ ON ofac_alias
 USING gin (alt_name gin_trgm_ops);
 
 CREATE TABLE risk_factors (
-    id SERIAL PRIMARY KEY,
+    id SERIAL PRIMARY KEY,                 -- estable: se guarda en ctransactions.factores_ids (SMALLINT)
     code VARCHAR(80) UNIQUE NOT NULL,      -- HIGH_AMOUNT, NIGHT_TIME, etc.
     description VARCHAR(255) NOT NULL,     -- texto entendible para auditoría
     weight NUMERIC(6,3) NOT NULL,          -- peso numérico
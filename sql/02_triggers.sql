@@ -1,4 +1,10 @@
--- Create function to trigger on event detected
+-- OPCIONAL: resolución de card_id en la BD para cargas externas (psql, ETL)
+-- que insertan en ctransactions sin card_id.
+--
+-- La aplicación ya resuelve la tarjeta y auto-provisiona los PAN desconocidos
+-- en bloque (app/infra/db/tx_statements.py: resolver_tarjetas), así que sus
+-- inserts llegan con card_id y el trigger no se ejecuta (cláusula WHEN):
+-- no hay PL/pgSQL por fila en el camino de escritura ni en cargas masivas.
 CREATE OR REPLACE FUNCTION set_card_id_from_pan()
 RETURNS TRIGGER AS $$
 DECLARE
@@ -10,16 +16,26 @@ BEGIN
     WHERE pan = NEW.i_0002_pan
     LIMIT 1;
 
-    -- Si NO existe → crear tarjeta automáticamente
+    -- Si NO existe → crear tarjeta automáticamente (sin cuenta asociada)
     IF v_card_id IS NULL THEN
-        INSERT INTO ccardx (account_id, pan_token, last4, brand)
+        INSERT INTO ccardx (pan, pan_last_4, pan_bin, last4, pan_token, brand, status, account_id)
         VALUES (
-            NULL,
             NEW.i_0002_pan,
             RIGHT(NEW.i_0002_pan, 4),
-            'UNKNOWN'
+            LEFT(NEW.i_0002_pan, 6),
+            RIGHT(NEW.i_0002_pan, 4),
+            LEFT(encode(sha256(convert_to(NEW.i_0002_pan, 'UTF8')), 'hex'), 32),
+            'UNKNOWN',
+            'auto',
+            NULL
         )
+        ON CONFLICT (pan) DO NOTHING
         RETURNING id INTO v_card_id;
+
+        -- Otra sesión la creó en paralelo
+        IF v_card_id IS NULL THEN
+            SELECT id INTO v_card_id FROM ccardx WHERE pan = NEW.i_0002_pan;
+        END IF;
     END IF;
 
     -- Asignar card_id
@@ -30,8 +46,9 @@ END;
 $$ LANGUAGE plpgsql;
 
 
--- Trigger fucntion on new transaction received
+-- Trigger function on new transaction received: sólo filas sin card_id
 CREATE TRIGGER trg_set_card_id_from_pan
 BEFORE INSERT ON ctransactions
 FOR EACH ROW
+WHEN (NEW.card_id IS NULL AND NEW.i_0002_pan IS NOT NULL)
 EXECUTE FUNCTION set_card_id_from_pan();
@@ -301,77 +301,81 @@ INSERT INTO cmerchants (mid, nombre_comercial, pais, ciudad, mcc, riesgo_nivel,
 (01, 'Casino Las Vegas', 'US', 'Las Vegas', '7995', 'ALTO', FALSE);
 
 -- Insertar Transacciones de prueba (similar a tu script original)
+-- Campos calientes en ctransactions; el resto de DE en ctransactions_iso.
 
 -- Transacción 1: Normal - BAJO RIESGO
-INSERT INTO ctransactions (
-    card_id, mti, i_0002_pan, i_0003_processing_code, i_0004_amount_transaction,
-    i_0007_transmission_datetime, i_0011_stan, i_0012_time_local, i_0013_date_local,
-    i_0022_pos_entry_mode, i_0024_function_code_nii, i_0025_pos_condition_code,
-    i_0032_acquiring_inst_id, i_0041_card_acceptor_tid, i_0042_card_acceptor_mid,
-    i_0043_card_acceptor_name_loc, i_0049_currency_code_tx,
-    es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
-    mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
-    historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
-) VALUES (
-    (SELECT id FROM ccardx WHERE pan = '4000123456789012'),
-    '0100', '4000123456789012', '000000', '000000015050',
-    '1114130930', '123456', '130930', '1114',
-    '051', '200', '00',
-    '123456', 'TERM0001', 'MERCHANT1234567',
-    'Mi Tienda, Santo Domingo, DO', '840',
-    FALSE, 0.15, 'BAJO', '',
-    'Transacción dentro de parámetros normales', 'Recomendación: Transacción aprobada automáticamente',
-    CURRENT_TIMESTAMP - INTERVAL '1 day', 8877.75,
-    2, 5, 7500.00, TRUE, TRUE
-);
+WITH t AS (
+    INSERT INTO ctransactions (
+        card_id, mti, i_0002_pan, i_0004_amount_transaction,
+        i_0011_stan, i_0012_time_local, i_0013_date_local,
+        i_0041_card_acceptor_tid, i_0042_card_acceptor_mid, i_0049_currency_code_tx,
+        es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
+        mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
+        historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
+    ) VALUES (
+        (SELECT id FROM ccardx WHERE pan = '4000123456789012'),
+        '0100', '4000123456789012', '000000015050',
+        '123456', '130930', '1114',
+        'TERM0001', 'MERCHANT1234567', '840',
+        FALSE, 0.15, 'BAJO', '',
+        'Transacción dentro de parámetros normales', 'Recomendación: Transacción aprobada automáticamente',
+        CURRENT_TIMESTAMP - INTERVAL '1 day', 8877.75,
+        2, 5, 7500.00, TRUE, TRUE
+    )
+    RETURNING id, tx_timestamp_utc
+)
+INSERT INTO ctransactions_iso (tx_id, tx_timestamp_utc, des)
+SELECT id, tx_timestamp_utc, '{"3": "000000", "7": "1114130930", "22": "051", "24": "200", "25": "00", "32": "123456", "43": "Mi Tienda, Santo Domingo, DO"}'::jsonb FROM t;
 
 -- Transacción 2: Alto Riesgo - USD, noche, Venezuela, hotel
-INSERT INTO ctransactions (
-    card_id, mti, i_0002_pan, i_0003_processing_code, i_0004_amount_transaction,
-    i_0007_transmission_datetime, i_0011_stan, i_0012_time_local, i_0013_date_local,
-    i_0022_pos_entry_mode, i_0024_function_code_nii, i_0025_pos_condition_code,
-    i_0032_acquiring_inst_id, i_0041_card_acceptor_tid, i_0042_card_acceptor_mid,
-    i_0043_card_acceptor_name_loc, i_0049_currency_code_tx,
-    es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
-    mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
-    historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
-) VALUES (
-    (SELECT id FROM ccardx WHERE pan = '4000123456789012'),
-    '0100', '4000123456789012', '000000', '000000100000',
-    '1114030510', '123457', '030510', '1114',
-    '051', '200', '00',
-    '987654', 'TERM0002', 'MERCHANT9876543',
-    'Hotel Caracas, VE', '840',
-    TRUE, 0.85, 'ALTO', 'MONTO_ELEVADO,HORARIO_NOCTURNO,PAIS_ALTO_RIESGO,TRANSACCION_DIVISA,DIVISA_MONTO_ELEVADO',
-    'ALERTA: Transacción identificada como fraudulenta por modelo ML y reglas de negocio',
-    'Recomendación: Revisar transacción manualmente y contactar al cliente',
-    CURRENT_TIMESTAMP - INTERVAL '1 hour', 59000.00,
-    1, 3, 20000.00, TRUE, TRUE
-);
+WITH t AS (
+    INSERT INTO ctransactions (
+        card_id, mti, i_0002_pan, i_0004_amount_transaction,
+        i_0011_stan, i_0012_time_local, i_0013_date_local,
+        i_0041_card_acceptor_tid, i_0042_card_acceptor_mid, i_0049_currency_code_tx,
+        es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
+        mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
+        historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
+    ) VALUES (
+        (SELECT id FROM ccardx WHERE pan = '4000123456789012'),
+        '0100', '4000123456789012', '000000100000',
+        '123457', '030510', '1114',
+        'TERM0002', 'MERCHANT9876543', '840',
+        TRUE, 0.85, 'ALTO', 'MONTO_ELEVADO,HORARIO_NOCTURNO,PAIS_ALTO_RIESGO,TRANSACCION_DIVISA,DIVISA_MONTO_ELEVADO',
+        'ALERTA: Transacción identificada como fraudulenta por modelo ML y reglas de negocio',
+        'Recomendación: Revisar transacción manualmente y contactar al cliente',
+        CURRENT_TIMESTAMP - INTERVAL '1 hour', 59000.00,
+        1, 3, 20000.00, TRUE, TRUE
+    )
+    RETURNING id, tx_timestamp_utc
+)
+INSERT INTO ctransactions_iso (tx_id, tx_timestamp_utc, des)
+SELECT id, tx_timestamp_utc, '{"3": "000000", "7": "1114030510", "22": "051", "24": "200", "25": "00", "32": "987654", "43": "Hotel Caracas, VE"}'::jsonb FROM t;
 
 -- Transacción 3: Tarjeta desconocida - ALTO RIESGO
-INSERT INTO ctransactions (
-    card_id, mti, i_0002_pan, i_0003_processing_code, i_0004_amount_transaction,
-    i_0007_transmission_datetime, i_0011_stan, i_0012_time_local, i_0013_date_local,
-    i_0022_pos_entry_mode, i_0024_function_code_nii, i_0025_pos_condition_code,
-    i_0032_acquiring_inst_id, i_0041_card_acceptor_tid, i_0042_card_acceptor_mid,
-    i_0043_card_acceptor_name_loc, i_0049_currency_code_tx,
-    es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
-    mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
-    historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
-) VALUES (
-    NULL,
-    '0100', '9999000011112222', '000000', '00000000500000',
-    '1114021530', '555444', '021530', '1114',
-    '021', '200', '00',
-    '111222', 'TERM0003', 'MERCHANT333444',
-    'Colmado Don Jose, Santo Domingo, DO', '214',
-    TRUE, 0.70, 'ALTO', 'MONTO_ELEVADO,HORARIO_NOCTURNO,MONTO_ALTO_HORARIO_SOSPECHOSO',
-    'ALERTA: Múltiples factores de riesgo identificados',
-    'Recomendación: Revisar transacción manualmente y contactar al cliente',
-    CURRENT_TIMESTAMP - INTERVAL '30 minutes', 5000.00,
-    4, 10, 4500.00, TRUE, TRUE
-);
+WITH t AS (
+    INSERT INTO ctransactions (
+        card_id, mti, i_0002_pan, i_0004_amount_transaction,
+        i_0011_stan, i_0012_time_local, i_0013_date_local,
+        i_0041_card_acceptor_tid, i_0042_card_acceptor_mid, i_0049_currency_code_tx,
+        es_fraude, probabilidad_fraude, nivel_riesgo, factores_riesgo,
+        mensaje_analisis, recomendacion_analisis, analisis_timestamp, monto_dop_calculado,
+        historial_tx_24h, historial_tx_7d, monto_promedio_30d, merchant_permitido, mcc_permitido
+    ) VALUES (
+        NULL,
+        '0100', '9999000011112222', '00000000500000',
+        '555444', '021530', '1114',
+        'TERM0003', 'MERCHANT333444', '214',
+        TRUE, 0.70, 'ALTO', 'MONTO_ELEVADO,HORARIO_NOCTURNO,MONTO_ALTO_HORARIO_SOSPECHOSO',
+        'ALERTA: Múltiples factores de riesgo identificados',
+        'Recomendación: Revisar transacción manualmente y contactar al cliente',
+        CURRENT_TIMESTAMP - INTERVAL '30 minutes', 5000.00,
+        4, 10, 4500.00, TRUE, TRUE
+    )
+    RETURNING id, tx_timestamp_utc
+)
+INSERT INTO ctransactions_iso (tx_id, tx_timestamp_utc, des)
+SELECT id, tx_timestamp_utc, '{"3": "000000", "7": "1114021530", "22": "021", "24": "200", "25": "00", "32": "111222", "43": "Colmado Don Jose, Santo Domingo, DO"}'::jsonb FROM t;
 
 -- Factores 4: Factores de Riesgo
 
@@ -447,6 +451,16 @@ VALUES
 ('MEDIUM_COUNTRY_HIGH_AMOUNT', 'País de riesgo medio con monto elevado', 2.5, 'COMBO', 'HIGH', TRUE);
 
 
+-- factores_ids de las transacciones de ejemplo (risk_factors ya cargado)
+UPDATE ctransactions t
+SET factores_ids = ARRAY(
+    SELECT rf.id
+    FROM unnest(string_to_array(t.factores_riesgo, ',')) AS c(code)
+    JOIN risk_factors rf ON rf.code = c.code
+    ORDER BY rf.id
+)::smallint[]
+WHERE t.factores_riesgo <> '';
+
 -- Verificación rápida
 SELECT 'ccurrencies' as tabla, COUNT(*) FROM ccurrencies
 UNION ALL
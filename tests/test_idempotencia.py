@@ -0,0 +1,121 @@
+# tests/test_idempotencia.py
+"""Retransmisiones (STAN, TID, DE7): un solo análisis, veredicto original."""
+import asyncio
+
+import pytest
+
+from app.api.tcp.simulador import mensaje_0100
+from app.domain.services import idempotencia_service as modulo
+from app.domain.services.idempotencia_service import Idempotencia, VeredictosRecientes
+from app.schemas.iso_rapido import ISO8583Rapido
+
+
+class _Motor:
+    def __init__(self, demora: float = 0.0, fallar: int = 0):
+        self.demora = demora
+        self.fallar = fallar
+        self.llamadas = []
+
+    async def __call__(self, db, tx, clave=None):
+        self.llamadas.append(clave)
+        await asyncio.sleep(self.demora)
+        if self.fallar:
+            self.fallar -= 1
+            raise RuntimeError("falla del motor")
+        return {"trnx_db_id": len(self.llamadas)}
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    """Tabla ctransactions_replay simulada: {clave: veredicto}."""
+    tabla = {}
+
+    async def buscar_veredicto(db, clave):
+        return tabla.get(clave)
+
+    monkeypatch.setattr(modulo, "buscar_veredicto", buscar_veredicto)
+    return tabla
+
+
+def _tx(secuencia: int = 1, **cambios) -> ISO8583Rapido:
+    return ISO8583Rapido({**mensaje_0100(secuencia), **cambios})
+
+
+def _idempotencia() -> Idempotencia:
+    return Idempotencia(VeredictosRecientes(max_items=100, ttl_seconds=60))
+
+
+def test_retransmision_devuelve_el_veredicto_en_cache(replay):
+    motor = _Motor()
+    idem = _idempotencia()
+
+    async def caso():
+        tx = _tx()
+        return await idem.procesar(None, tx, motor), await idem.procesar(None, tx, motor)
+
+    primero, segundo = asyncio.run(caso())
+    assert primero == segundo == {"trnx_db_id": 1}
+    assert len(motor.llamadas) == 1
+
+
+def test_retransmisiones_simultaneas_esperan_el_original(replay):
+    motor = _Motor(demora=0.01)
+    idem = _idempotencia()
+
+    async def caso():
+        tx = _tx()
+        return await asyncio.gather(*(idem.procesar(None, tx, motor) for _ in range(5)))
+
+    assert asyncio.run(caso()) == [{"trnx_db_id": 1}] * 5
+    assert len(motor.llamadas) == 1
+
+
+def test_veredicto_de_otro_worker(replay):
+    motor = _Motor()
+    tx = _tx()
+    replay[modulo.clave_mensaje(tx)] = {"trnx_db_id": 42}
+
+    assert asyncio.run(_idempotencia().procesar(None, tx, motor)) == {"trnx_db_id": 42}
+    assert motor.llamadas == []
+
+
+def test_mensajes_distintos_se_analizan_cada_uno(replay):
+    motor = _Motor()
+    idem = _idempotencia()
+
+    async def caso():
+        return [
+            await idem.procesar(None, _tx(1), motor),
+            await idem.procesar(None, _tx(2), motor),
+            await idem.procesar(None, _tx(1, i_0041_card_acceptor_tid="OTROTID1"), motor),
+        ]
+
+    assert [r["trnx_db_id"] for r in asyncio.run(caso())] == [1, 2, 3]
+
+
+def test_sin_clave_no_hay_idempotencia(replay):
+    motor = _Motor()
+    idem = _idempotencia()
+    tx = _tx(i_0007_transmission_datetime=None)
+
+    async def caso():
+        await idem.procesar(None, tx, motor)
+        await idem.procesar(None, tx, motor)
+
+    asyncio.run(caso())
+    assert motor.llamadas == [None, None]
+
+
+def test_si_el_original_falla_el_duplicado_se_analiza(replay):
+    motor = _Motor(demora=0.01, fallar=1)
+    idem = _idempotencia()
+
+    async def caso():
+        tx = _tx()
+        return await asyncio.gather(
+            idem.procesar(None, tx, motor), idem.procesar(None, tx, motor), return_exceptions=True
+        )
+
+    original, duplicado = asyncio.run(caso())
+    assert isinstance(original, RuntimeError)
+    assert duplicado == {"trnx_db_id": 2}
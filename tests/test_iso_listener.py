@@ -0,0 +1,210 @@
+# tests/test_iso_listener.py
+"""
+Encuadre por largo y listener ISO 8583 sobre un socket de loopback, con
+el análisis reemplazado por un stub (sin base de datos ni modelo).
+"""
+import asyncio
+
+import pytest
+
+from app.api.tcp import iso_listener as modulo
+from app.api.tcp.encuadre import enmarcar, leer_trama
+from app.api.tcp.iso_listener import ListenerIso
+from app.api.tcp.simulador import ClienteIso, mensaje_0100
+from app.core.config import settings
+from app.infra.detectors.iso_parser import MensajeIsoInvalido, codificar
+
+
+def _lector(datos: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(datos)
+    reader.feed_eof()
+    return reader
+
+
+# ==========================================================
+#  ENCUADRE
+# ==========================================================
+
+@pytest.mark.parametrize("prefijo", [2, 4])
+def test_tramas_seguidas(prefijo):
+    async def caso():
+        reader = _lector(enmarcar(b"uno", prefijo) + enmarcar(b"", prefijo) + enmarcar(b"tres", prefijo))
+        return [await leer_trama(reader, prefijo, 100) for _ in range(4)]
+
+    assert asyncio.run(caso()) == [b"uno", b"", b"tres", None]
+
+
+def test_trama_truncada():
+    async def caso():
+        await leer_trama(_lector(enmarcar(b"mensaje", 2)[:-1]), 2, 100)
+
+    with pytest.raises(asyncio.IncompleteReadError):
+        asyncio.run(caso())
+
+
+def test_prefijo_truncado():
+    async def caso():
+        await leer_trama(_lector(b"\x00"), 2, 100)
+
+    with pytest.raises(asyncio.IncompleteReadError):
+        asyncio.run(caso())
+
+
+def test_trama_mas_larga_que_el_maximo():
+    async def caso():
+        await leer_trama(_lector(enmarcar(b"x" * 101, 2)), 2, 100)
+
+    with pytest.raises(MensajeIsoInvalido):
+        asyncio.run(caso())
+
+
+# ==========================================================
+#  LISTENER
+# ==========================================================
+
+class _Sesion:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Motor:
+    """Stub de idempotencia.procesar: el STAN decide la demora y el veredicto."""
+
+    def __init__(self, max_en_vuelo: int):
+        self.max_en_vuelo = max_en_vuelo
+        self.en_vuelo = 0
+        self.pico = 0
+        self.analizados = []
+
+    async def procesar(self, db, tx, procesar):
+        self.en_vuelo += 1
+        self.pico = max(self.pico, self.en_vuelo)
+        try:
+            assert self.en_vuelo <= self.max_en_vuelo
+            secuencia = int(tx.i_0011_stan)
+            if secuencia == 13:
+                raise RuntimeError("falla del motor")
+            # Los primeros mensajes tardan más: las respuestas salen desordenadas
+            await asyncio.sleep(0.002 * (10 - secuencia % 10))
+            self.analizados.append(tx.i_0011_stan)
+            return {"risk": {"is_fraud": secuencia % 5 == 0, "risk_level": "BAJO", "fraud_prob": 0.25}}
+        finally:
+            self.en_vuelo -= 1
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    motor = _Motor(max_en_vuelo=4)
+    monkeypatch.setattr(modulo, "idempotencia", motor)
+    monkeypatch.setattr(modulo, "AsyncSessionLocal", _Sesion)
+    monkeypatch.setattr(settings, "ISO_TCP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "ISO_TCP_PORT", 0)
+    monkeypatch.setattr(settings, "ISO_TCP_MAX_INFLIGHT", motor.max_en_vuelo)
+    monkeypatch.setattr(settings, "ISO_TCP_BITMAP_BINARY", True)
+    return motor
+
+
+async def _con_listener(prefijo, caso):
+    listener = ListenerIso()
+    await listener.start()
+    port = listener._server.sockets[0].getsockname()[1]
+    cliente = ClienteIso(prefijo, bitmap_binario=True)
+    await cliente.conectar("127.0.0.1", port)
+    try:
+        return await caso(cliente)
+    finally:
+        await cliente.cerrar()
+        await listener.stop()
+
+
+@pytest.mark.parametrize("prefijo", [2, 4])
+def test_pipelining_respuestas_por_stan(motor, monkeypatch, prefijo):
+    monkeypatch.setattr(settings, "ISO_TCP_LENGTH_PREFIX_BYTES", prefijo)
+
+    async def caso(cliente):
+        mensajes = [mensaje_0100(i) for i in range(1, 21)]
+        respuestas = await asyncio.gather(*(cliente.enviar(m) for m in mensajes))
+        return mensajes, respuestas, list(cliente.recibidas)
+
+    mensajes, respuestas, recibidas = asyncio.run(_con_listener(prefijo, caso))
+
+    for m, r in zip(mensajes, respuestas):
+        assert r["mti"] == "0110"
+        assert r["i_0011_stan"] == m["i_0011_stan"]
+        assert r["i_0004_amount_transaction"] == m["i_0004_amount_transaction"]
+    codigos = {r["i_0011_stan"]: r["i_0039_response_code"] for r in respuestas}
+    assert codigos["000005"] == modulo.SOSPECHA_FRAUDE
+    assert codigos["000001"] == modulo.APROBADA
+    assert codigos["000013"] == modulo.ERROR_SISTEMA
+    assert respuestas[0]["i_0044_additional_response_data"] == "BAJO|0.2500"
+    # Varios en vuelo, nunca más que el máximo, y las respuestas desordenadas
+    assert 1 < motor.pico <= motor.max_en_vuelo
+    assert recibidas != [m["i_0011_stan"] for m in mensajes]
+
+
+def test_gestion_de_red_y_errores_de_formato(motor, monkeypatch):
+    monkeypatch.setattr(settings, "ISO_TCP_LENGTH_PREFIX_BYTES", 2)
+
+    async def caso(cliente):
+        eco = await cliente.enviar({
+            "mti": "0800",
+            "i_0007_transmission_datetime": "1019120000",
+            "i_0011_stan": "000900",
+            "i_0070_network_management_info_code": "301",
+        })
+        sin_tid = await cliente.enviar({**mensaje_0100(901), "i_0041_card_acceptor_tid": None})
+        # Una respuesta (función impar) no es un requerimiento
+        respuesta = await cliente.enviar({**mensaje_0100(902), "mti": "0190"})
+        return eco, sin_tid, respuesta
+
+    eco, sin_tid, respuesta = asyncio.run(_con_listener(2, caso))
+
+    assert eco["mti"] == "0810"
+    assert eco["i_0039_response_code"] == modulo.APROBADA
+    assert eco["i_0070_network_management_info_code"] == "301"
+    assert sin_tid["i_0039_response_code"] == modulo.ERROR_FORMATO
+    assert respuesta["mti"] == "0190"
+    assert respuesta["i_0039_response_code"] == modulo.ERROR_FORMATO
+    assert motor.analizados == []
+
+
+def test_trama_ilegible_no_corta_la_conexion(motor, monkeypatch):
+    monkeypatch.setattr(settings, "ISO_TCP_LENGTH_PREFIX_BYTES", 2)
+
+    async def caso(cliente):
+        cliente._writer.write(enmarcar(b"01", 2))
+        return await cliente.enviar(mensaje_0100(3))
+
+    assert asyncio.run(_con_listener(2, caso))["i_0039_response_code"] == modulo.APROBADA
+
+
+def test_stop_deja_de_leer_y_termina_lo_que_esta_en_vuelo(motor, monkeypatch):
+    monkeypatch.setattr(settings, "ISO_TCP_LENGTH_PREFIX_BYTES", 2)
+    errores = []
+
+    async def caso():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: errores.append(ctx))
+        listener = ListenerIso()
+        await listener.start()
+        port = listener._server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(enmarcar(codificar(mensaje_0100(1)), 2))
+        await writer.drain()
+        while not motor.en_vuelo:
+            await asyncio.sleep(0.001)
+
+        parada = asyncio.create_task(listener.stop())
+        await asyncio.sleep(0)
+        # Lo que llega después del shutdown no se lee ni rompe el reader
+        writer.write(enmarcar(codificar(mensaje_0100(2)), 2) * 50)
+        await writer.drain()
+        await parada
+        writer.close()
+
+    asyncio.run(caso())
+    assert motor.analizados == ["000001"]
+    assert errores == []
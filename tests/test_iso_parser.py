@@ -0,0 +1,80 @@
+# tests/test_iso_parser.py
+"""Ida y vuelta parsear/codificar y rechazo de mensajes mal formados."""
+import pytest
+
+from app.api.tcp.simulador import mensaje_0100
+from app.infra.detectors.iso_parser import MensajeIsoInvalido, codificar, parsear
+
+
+def _sin_bitmap(campos):
+    return {k: v for k, v in campos.items() if k != "bitmap"}
+
+
+@pytest.mark.parametrize("bitmap_binario", [True, False])
+def test_ida_y_vuelta_bitmap_primario(bitmap_binario):
+    campos = mensaje_0100(1234)
+    crudo = codificar(campos, bitmap_binario)
+
+    assert _sin_bitmap(parsear(crudo, bitmap_binario)) == campos
+    assert codificar(parsear(crudo, bitmap_binario), bitmap_binario) == crudo
+
+
+@pytest.mark.parametrize("bitmap_binario", [True, False])
+def test_ida_y_vuelta_bitmap_secundario(bitmap_binario):
+    campos = {
+        "mti": "0800",
+        "i_0007_transmission_datetime": "1019120000",
+        "i_0011_stan": "000001",
+        "i_0070_network_management_info_code": "301",
+    }
+    crudo = codificar(campos, bitmap_binario)
+    parseado = parsear(crudo, bitmap_binario)
+
+    assert len(parseado["bitmap"]) == 32
+    assert _sin_bitmap(parseado) == campos
+
+
+def test_variables_y_binarios():
+    campos = {
+        **mensaje_0100(7),
+        "i_0032_acquiring_inst_id": "123456",
+        "i_0044_additional_response_data": "",
+        "i_0052_pin_data": "0123456789ABCDEF",
+    }
+    parseado = parsear(codificar(campos))
+
+    assert parseado["i_0032_acquiring_inst_id"] == "123456"
+    assert parseado["i_0044_additional_response_data"] == ""
+    assert parseado["i_0052_pin_data"] == "0123456789ABCDEF"
+
+
+def test_mensaje_truncado():
+    crudo = codificar(mensaje_0100(1))
+    for corte in (2, 10, len(crudo) - 1):
+        with pytest.raises(MensajeIsoInvalido):
+            parsear(crudo[:corte])
+
+
+def test_bytes_sobrantes():
+    with pytest.raises(MensajeIsoInvalido, match="sobrantes"):
+        parsear(codificar(mensaje_0100(1)) + b"X")
+
+
+def test_llvar_mas_largo_que_el_maximo():
+    crudo = codificar(mensaje_0100(1))
+    # DE2 es el primer DE: LLVAR de máximo 19
+    alterado = crudo[:12] + b"20" + b"4" * 20 + crudo[12 + 2 + 16:]
+    with pytest.raises(MensajeIsoInvalido) as e:
+        parsear(alterado)
+    assert e.value.de == 2
+
+
+def test_codificar_rechaza_largo_fijo_incorrecto():
+    with pytest.raises(MensajeIsoInvalido) as e:
+        codificar({**mensaje_0100(1), "i_0041_card_acceptor_tid": "CORTO"})
+    assert e.value.de == 41
+
+
+def test_bitmap_hex_invalido():
+    with pytest.raises(MensajeIsoInvalido, match="bitmap hex"):
+        parsear(b"0100" + b"ZZ" * 8, bitmap_binario=False)
@@ -0,0 +1,207 @@
+# tests/test_ofac_fuentes.py
+"""
+Replay de archivos fixture (tests/fixtures/ofac) por el mismo pipeline del
+sync OFAC, sin red ni base de datos: fuentes locales, .gz, zip!miembro y
+HTTP por chunks; parsers; hash de la fuente y diff por huella.
+"""
+import gzip
+import hashlib
+import random
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from app.aml import list_parsers
+from app.aml.list_parsers import (
+    cargar_listas_adicionales,
+    parse_add,
+    parse_alt,
+    parse_eu_csv,
+    parse_sdn,
+    parse_un_xml,
+)
+from app.core.config import settings
+from app.infra.feeds import stream_source
+from app.infra.feeds.stream_source import hashear_fuente, leer_csv
+from app.jobs.ofac_update import calcular_cambios, combinar_hashes, huella_entidad
+
+FIXTURES = Path(__file__).parent / "fixtures" / "ofac"
+
+
+def _sdn(spec: str) -> dict:
+    return parse_sdn(leer_csv(spec))
+
+
+def _huellas(sdn: str, add: str, alt: str) -> dict:
+    entidades = parse_sdn(leer_csv(sdn))
+    direcciones = parse_add(leer_csv(add))
+    aliases = parse_alt(leer_csv(alt))
+    return {
+        e: huella_entidad(ent, aliases.get(e, []), direcciones.get(e, []))
+        for e, ent in entidades.items()
+    }
+
+
+# ==========================================================
+#  FUENTES
+# ==========================================================
+
+def test_parsers_sobre_fixtures():
+    entidades = _sdn(str(FIXTURES / "sdn.csv"))
+    direcciones = parse_add(leer_csv(str(FIXTURES / "add.csv")))
+    aliases = parse_alt(leer_csv(str(FIXTURES / "alt.csv")))
+
+    assert sorted(entidades) == [36, 173, 306, 2674]
+    assert entidades[306]["sdn_name"] == "PEREZ GOMEZ, Juan Carlos"
+    assert entidades[306]["is_individual"] is True
+    assert entidades[36]["is_individual"] is False
+    assert [d["city"] for d in direcciones[306]] == ["Santo Domingo", "Bogota"]
+    assert [a["alt_name"] for a in aliases[306]] == ["PEREZ, Juanca", "GOMEZ, Juan C."]
+
+
+def test_gz_zip_y_file_url_leen_lo_mismo(tmp_path):
+    crudo = (FIXTURES / "sdn.csv").read_bytes()
+    gz = tmp_path / "sdn.csv.gz"
+    gz.write_bytes(gzip.compress(crudo))
+    paquete = tmp_path / "sdn.zip"
+    with zipfile.ZipFile(paquete, "w") as zf:
+        zf.writestr("sdn.csv", crudo)
+
+    esperado = _sdn(str(FIXTURES / "sdn.csv"))
+    assert _sdn(str(gz)) == esperado
+    assert _sdn(f"{paquete}!sdn.csv") == esperado
+    assert _sdn(f"file://{FIXTURES / 'sdn.csv'}") == esperado
+
+
+class _RespuestaHttp:
+    def __init__(self, cuerpo: bytes):
+        self.cuerpo = cuerpo
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        # Chunks chicos: filas partidas entre chunks
+        for i in range(0, len(self.cuerpo), 7):
+            yield self.cuerpo[i:i + 7]
+
+
+def test_http_por_chunks_y_digest(monkeypatch):
+    crudo = (FIXTURES / "sdn.csv").read_bytes()
+    monkeypatch.setattr(stream_source.requests, "get", lambda *a, **kw: _RespuestaHttp(crudo))
+
+    digest = hashlib.sha256()
+    entidades = parse_sdn(leer_csv("https://listas.example/sdn.csv", digest=digest))
+
+    assert entidades == _sdn(str(FIXTURES / "sdn.csv"))
+    assert digest.digest() == hashlib.sha256(crudo).digest()
+
+
+def test_hashear_fuente():
+    digest = hashlib.sha256()
+    hashear_fuente(str(FIXTURES / "un.xml"), digest, chunk_size=16)
+    assert digest.digest() == hashlib.sha256((FIXTURES / "un.xml").read_bytes()).digest()
+
+
+def test_un_xml_y_eu_csv():
+    un = list(parse_un_xml(str(FIXTURES / "un.xml")))
+    eu = list(parse_eu_csv(str(FIXTURES / "eu.csv")))
+
+    assert [(e.ref, e.nombre, e.es_individuo) for e in un] == [
+        (6908001, "AHMED ALI HASSAN", True),
+        (110001, "AL-EXAMPLE TRADING COMPANY", False),
+    ]
+    assert un[0].aliases == ["Abu Hassan"]
+    assert un[0].paises == ["Yemen", "Yemen"]
+    assert un[0].ciudades == ["Sanaa"]
+
+    petrov, naviera = eu
+    assert (petrov.ref, petrov.nombre, petrov.es_individuo) == (13, "Ivan PETROV", True)
+    assert petrov.aliases == ["Ivan Ivanovich PETROV"]
+    assert petrov.paises == ["RU"]
+    assert petrov.ciudades == ["Moscow", "Sochi"]
+    assert naviera.es_individuo is False
+
+
+def test_listas_adicionales_configuradas(monkeypatch):
+    monkeypatch.setattr(settings, "SANCTIONS_CONS_PRIM_SOURCE", str(FIXTURES / "sdn.csv"))
+    monkeypatch.setattr(settings, "SANCTIONS_CONS_ALT_SOURCE", str(FIXTURES / "alt.csv"))
+    monkeypatch.setattr(settings, "SANCTIONS_CONS_ADD_SOURCE", None)
+    monkeypatch.setattr(settings, "SANCTIONS_UN_SOURCE", str(FIXTURES / "un.xml"))
+    monkeypatch.setattr(settings, "SANCTIONS_EU_SOURCE", str(FIXTURES / "eu.csv"))
+
+    assert list_parsers.fuentes_adicionales() == [
+        str(FIXTURES / "sdn.csv"),
+        str(FIXTURES / "alt.csv"),
+        str(FIXTURES / "un.xml"),
+        str(FIXTURES / "eu.csv"),
+    ]
+    entidades = cargar_listas_adicionales()
+    assert sorted((e.lista, e.ref) for e in entidades) == [
+        ("CONS", 306), ("CONS", 2674), ("EU", 13), ("UN", 6908001),
+    ]
+
+
+# ==========================================================
+#  REPLAY: MISMOS ARCHIVOS → SIN CAMBIOS
+# ==========================================================
+
+def _mismo_contenido_desordenado(origen: Path, destino: Path) -> None:
+    filas = origen.read_bytes().splitlines(keepends=True)
+    random.Random(7).shuffle(filas)
+    destino.write_bytes(b"".join(filas))
+
+
+def test_replay_de_los_mismos_archivos_no_produce_cambios(tmp_path):
+    sdn, add, alt = (str(FIXTURES / n) for n in ("sdn.csv", "add.csv", "alt.csv"))
+    publicadas = _huellas(sdn, add, alt)
+
+    # Mismas filas en otro orden: las huellas no cambian
+    for nombre in ("add.csv", "alt.csv"):
+        _mismo_contenido_desordenado(FIXTURES / nombre, tmp_path / nombre)
+    assert _huellas(sdn, str(tmp_path / "add.csv"), str(tmp_path / "alt.csv")) == publicadas
+
+    assert calcular_cambios(publicadas, dict(publicadas), "h").vacio
+
+
+def test_diff_por_entidad(tmp_path):
+    sdn, add, alt = (str(FIXTURES / n) for n in ("sdn.csv", "add.csv", "alt.csv"))
+    actual = _huellas(sdn, add, alt)
+
+    filas = (FIXTURES / "alt.csv").read_bytes() + b'2674,"aka","RAMIREZ, Malena",-0- \r\n'
+    (tmp_path / "alt.csv").write_bytes(filas)
+    filas = b"".join(
+        linea for linea in (FIXTURES / "sdn.csv").read_bytes().splitlines(keepends=True)
+        if not linea.startswith(b"173,")
+    ) + b'9999,"NUEVO, Sancionado","individual","SDNTK",-0- ,-0- ,-0- ,-0- ,-0- ,-0- ,-0- ,-0- \r\n'
+    (tmp_path / "sdn.csv").write_bytes(filas)
+
+    cambios = calcular_cambios(_huellas(str(tmp_path / "sdn.csv"), add, str(tmp_path / "alt.csv")), actual, "h")
+
+    assert cambios.inserted == [9999]
+    assert cambios.updated == [2674]
+    assert cambios.deleted == [173]
+
+
+@pytest.mark.parametrize("lista", ["un.xml", "eu.csv"])
+def test_hash_de_fuente_incluye_listas_adicionales(tmp_path, lista):
+    base = [hashlib.sha256((FIXTURES / n).read_bytes()).digest() for n in ("sdn.csv", "add.csv", "alt.csv")]
+
+    def extra(ruta: Path) -> bytes:
+        digest = hashlib.sha256()
+        hashear_fuente(str(ruta), digest)
+        return digest.digest()
+
+    editada = tmp_path / lista
+    editada.write_bytes((FIXTURES / lista).read_bytes().replace(b"PETROV", b"PETROFF").replace(b"HASSAN", b"HASAN"))
+
+    original = combinar_hashes(*base, extra(FIXTURES / lista))
+    assert combinar_hashes(*base, extra(FIXTURES / lista)) == original
+    assert combinar_hashes(*base, extra(editada)) != original
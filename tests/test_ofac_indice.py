@@ -0,0 +1,98 @@
+# tests/test_ofac_indice.py
+"""
+Refresco del índice OFAC del proceso: UN / EU / CONS se recargan sólo
+cuando cambia lists_hash en ofac_change_log, y se leen sin tener el lock.
+"""
+import asyncio
+
+import pytest
+
+from app.aml import ofac_index as modulo
+from app.aml.list_parsers import SanctionEntity
+from app.aml.ofac_index import OfacIndex
+from app.core.config import settings
+
+
+class _Entorno:
+    """ofac_change_log y lectura de listas simulados."""
+
+    def __init__(self, monkeypatch):
+        self.logs = []              # [(id, lists_hash)]
+        self.lecturas = 0
+        self.lock_durante_lectura = []
+        self.fallar = False
+        monkeypatch.setattr(modulo, "_aplicar_change_log", self.aplicar_change_log)
+        monkeypatch.setattr(modulo, "_leer_listas_adicionales", self.leer_listas)
+
+    def sync(self, lists_hash):
+        self.logs.append((len(self.logs) + 1, lists_hash))
+
+    async def aplicar_change_log(self, db, indice, desde_id):
+        nuevos = [log for log in self.logs if log[0] > desde_id]
+        return nuevos[-1] if nuevos else (desde_id, None)
+
+    async def leer_listas(self, db):
+        self.lecturas += 1
+        self.lock_durante_lectura.append(modulo._lock.locked())
+        await asyncio.sleep(0)
+        if self.fallar:
+            raise OSError("fuente UN caída")
+        return [SanctionEntity("UN", 1, "AHMED ALI HASSAN", es_individuo=True)], {}
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    monkeypatch.setattr(settings, "OFAC_SNAPSHOT_DIR", None)
+    indice = OfacIndex.desde_filas([(306, "PEREZ GOMEZ, Juan Carlos")])
+    monkeypatch.setattr(modulo, "_INDICE_CACHE", {
+        "indice": indice,
+        "change_log_id": 0,
+        "lists_hash": "a",
+        "verificado": None,
+        "refresh_seconds": 60,
+    })
+    return _Entorno(monkeypatch)
+
+
+def _refrescar():
+    modulo._INDICE_CACHE["verificado"] = None
+    return asyncio.run(modulo.obtener_indice(None))
+
+
+def test_sync_sdn_sin_cambio_de_listas_no_recarga(entorno):
+    entorno.sync("a")
+    entorno.sync("a")
+    _refrescar()
+
+    assert entorno.lecturas == 0
+    assert modulo._INDICE_CACHE["change_log_id"] == 2
+
+
+def test_cambio_de_lists_hash_recarga_fuera_del_lock(entorno):
+    entorno.sync("b")
+    indice = _refrescar()
+
+    assert entorno.lecturas == 1
+    assert entorno.lock_durante_lectura == [False]
+    assert modulo._INDICE_CACHE["lists_hash"] == "b"
+    assert "UN" in indice.codigos
+
+    # Mismo hash en el sync siguiente: no se vuelve a leer
+    entorno.sync("b")
+    _refrescar()
+    assert entorno.lecturas == 1
+
+
+def test_si_la_lectura_falla_se_reintenta(entorno):
+    entorno.fallar = True
+    entorno.sync("b")
+    _refrescar()
+
+    assert entorno.lecturas == 1
+    assert modulo._INDICE_CACHE["lists_hash"] == "a"
+
+    entorno.fallar = False
+    entorno.sync("b")
+    _refrescar()
+    assert entorno.lecturas == 2
+    assert modulo._INDICE_CACHE["lists_hash"] == "b"